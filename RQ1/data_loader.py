@@ -1,5 +1,14 @@
 import os
+import sys
+import copy
 import json
+import time
+import threading
+
+PACK_SUFFIX = ".gpcorpus"
+
+# Cached records are re-validated against file mtimes at most this often per case
+MTIME_CHECK_INTERVAL_SEC = 5.0
 
 
 class DataLoader:
@@ -10,24 +19,48 @@ class DataLoader:
             KeyFacts(json)
             SOAP-examples (txt)
             Transcripts(txt)
+
+        Cases are read once and kept in an in-memory index; callers get their
+        own copy of a record, so they may change it. A record is re-read when
+        one of its files changes on disk.
+
+        base_path may also point to a packed corpus (see corpus_pack.py),
+        e.g. "../examples_gp_consultation/NL.gpcorpus". The pack stays
+        memory-mapped and a case is decoded the first time it is asked for;
+        a rebuilt pack (new mtime) is re-opened.
         """
         self.base_path = base_path
+        self.packed = str(base_path).endswith(PACK_SUFFIX)
         self.keyfacts_dir = os.path.join(base_path, "KeyFacts")
         self.soap_refs_dir = os.path.join(base_path, "SOAP-examples")
         self.transcripts_dir = os.path.join(base_path, "Transcripts")
+        self._cache = {}  # case_id -> [mtimes, checked_at, record]
+        self._indexed = False
+        self._lock = threading.Lock()
+        self._corpus = None  # Open PackedCorpus
+        self._corpus_mtime = None
 
-    def get_all_case_ids(self):
-        if not os.path.exists(self.transcripts_dir):
-            return []
-        files = [f for f in os.listdir(
-            self.transcripts_dir) if f.endswith('.txt')]
-        return [os.path.splitext(f)[0] for f in files]
+    def _paths(self, case_id):
+        return (os.path.join(self.keyfacts_dir, f"{case_id}.json"),
+                os.path.join(self.soap_refs_dir, f"{case_id}.txt"),
+                os.path.join(self.transcripts_dir, f"{case_id}.txt"))
 
-    def load_case_data(self, case_id):
+    @staticmethod
+    def _mtimes(paths):
+        mtimes = []
+        for path in paths:
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    @staticmethod
+    def _read_case(case_id, paths):
+        kf_path, soap_path, tran_path = paths
         data = {"id": case_id}
 
         # Key Facts
-        kf_path = os.path.join(self.keyfacts_dir, f"{case_id}.json")
         if os.path.exists(kf_path):
             with open(kf_path, 'r', encoding='utf-8') as f:
                 data["key_facts"] = json.load(f)
@@ -35,7 +68,6 @@ class DataLoader:
             data["key_facts"] = {}
 
         # Reference SOAP
-        soap_path = os.path.join(self.soap_refs_dir, f"{case_id}.txt")
         if os.path.exists(soap_path):
             with open(soap_path, 'r', encoding='utf-8') as f:
                 data["ref_soap"] = f.read()
@@ -43,7 +75,6 @@ class DataLoader:
             data["ref_soap"] = ""
 
         # Transcript
-        tran_path = os.path.join(self.transcripts_dir, f"{case_id}.txt")
         if os.path.exists(tran_path):
             with open(tran_path, 'r', encoding='utf-8') as f:
                 data["transcript"] = f.read()
@@ -51,3 +82,108 @@ class DataLoader:
             data["transcript"] = ""
 
         return data
+
+    def _packed_mtime(self):
+        try:
+            return os.stat(self.base_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _packed_corpus(self):
+        # Caller holds self._lock. Re-opens the pack (and drops decoded cases) when it was rebuilt.
+        mtime = self._packed_mtime()
+        if self._corpus is None or mtime != self._corpus_mtime:
+            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            if project_root not in sys.path:
+                sys.path.append(project_root)
+            from corpus_pack import PackedCorpus
+
+            if self._corpus is not None:
+                self._corpus.close()
+            self._corpus = PackedCorpus(self.base_path)
+            self._corpus_mtime = mtime
+            self._cache = {}
+        return self._corpus
+
+    def _load_packed_case(self, corpus, case_id, now):
+        # Caller holds self._lock and got corpus from _packed_corpus()
+        entry = self._cache.get(case_id)
+        if entry is None:
+            if case_id in corpus:
+                record = corpus.load_case(case_id)
+            else:
+                record = {"id": case_id, "key_facts": {}, "ref_soap": "", "transcript": ""}
+            entry = self._cache[case_id] = [(None, None, self._corpus_mtime), now, record]
+        entry[1] = now
+        return entry[2]
+
+    def close(self):
+        with self._lock:
+            if self._corpus is not None:
+                self._corpus.close()
+                self._corpus = None
+
+    def get_all_case_ids(self):
+        if self.packed:
+            with self._lock:
+                return self._packed_corpus().case_ids()
+        if self._indexed:
+            # Only cases that have a transcript on disk
+            return [cid for cid, entry in self._cache.items() if entry[0][2] is not None]
+        if not os.path.exists(self.transcripts_dir):
+            return []
+        files = [f for f in os.listdir(
+            self.transcripts_dir) if f.endswith('.txt')]
+        return [os.path.splitext(f)[0] for f in files]
+
+    def load_all(self):
+        """
+        Read every case of this language in one pass and index it.
+        Returns {case_id: record}.
+        """
+        now = time.time()
+        if self.packed:
+            with self._lock:
+                corpus = self._packed_corpus()
+                return {cid: copy.deepcopy(self._load_packed_case(corpus, cid, now)) for cid in corpus.case_ids()}
+        records = {}
+        for case_id in self.get_all_case_ids():
+            paths = self._paths(case_id)
+            records[case_id] = [self._mtimes(paths), now, self._read_case(case_id, paths)]
+        with self._lock:
+            self._cache = records
+            self._indexed = True
+        return {case_id: copy.deepcopy(entry[2]) for case_id, entry in records.items()}
+
+    def load_case_data(self, case_id):
+        # A copy: the cached record stays as read from disk whatever the caller does with it
+        return copy.deepcopy(self._cached_case(case_id))
+
+    def _cached_case(self, case_id):
+        now = time.time()
+        if self.packed:
+            with self._lock:
+                entry = self._cache.get(case_id)
+                if entry and now - entry[1] < MTIME_CHECK_INTERVAL_SEC:
+                    return entry[2]
+                # The whole pack is one file: an unknown case is cached as empty until it is rebuilt
+                return self._load_packed_case(self._packed_corpus(), case_id, now)
+
+        if not self._indexed:
+            self.load_all()
+
+        with self._lock:
+            entry = self._cache.get(case_id)
+            if entry and now - entry[1] < MTIME_CHECK_INTERVAL_SEC:
+                return entry[2]
+
+        paths = self._paths(case_id)
+        mtimes = self._mtimes(paths)
+        if entry and entry[0] == mtimes:
+            entry[1] = now
+            return entry[2]
+
+        record = self._read_case(case_id, paths)
+        with self._lock:
+            self._cache[case_id] = [mtimes, now, record]
+        return record
@@ -1,34 +1,55 @@
-import os
 import json
 import re
-from openai import OpenAI
+import threading
 from soap_parser import parse_soap_sections
 from dotenv import load_dotenv
 load_dotenv()
+import judges
 
+# Verdict labels, checked in this order against the judge's reply
+PRESENCE_LABELS = ("PRESENT", "ABSENT")
+CLAIM_CHECK_LABELS = ("SUPPORTED", "NOT-FOUND")
+CLAIM_PRESENCE_LABELS = ("SUPPORTED", "CONTRADICTED", "NOT-FOUND")
 
-class FineSurEEvaluator:
 
-    def __init__(self, model="deepseek-ai/DeepSeek-V3.2"):
-        api_key = os.environ.get("DEEPINFRA_API_KEY")
-        base_url = "https://api.deepinfra.com/v1/openai"
-        if not api_key:
-            api_key = os.environ.get("DEEPSEEK_API_KEY")
-            base_url = "https://api.deepseek.com"
-            
-        if not api_key:
-            raise ValueError("error: No API_KEY found (checked DEEPINFRA_API_KEY and DEEPSEEK_API_KEY)") 
-            
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url=base_url
-        )
-        self.model = model
+class FineSurEEvaluator:
 
-    def _key_fact_presence(self, soap_fragment, key_fact):
-        if not soap_fragment or not isinstance(soap_fragment, str) or not soap_fragment.strip():
-            return False
+    def __init__(self, model="deepseek-ai/DeepSeek-V3.2", prefilter=None, judge=None):
+        """
+        judge: backend that serves the verdicts (judges.py), e.g. judges.local_judge() for a
+        llama.cpp server. Defaults to the hosted DeepInfra/DeepSeek judge for `model`.
+        prefilter: optional local first stage for key-fact presence (prefilter.LexicalPrefilter).
+        Pairs it resolves never reach the judge; prefilter_stats counts local vs remote decisions.
+        """
+        self.judge = judge or judges.remote_judge(model)
+        self.model = self.judge.model
+        self.prefilter = prefilter
+        self.prefilter_stats = {"local": 0, "remote": 0}
+        self._stats_lock = threading.Lock()
+
+    def judge_id(self, metric=None):
+        # Identifies who produced a metric's verdicts (stored alongside them in the result store).
+        # The prefilter only takes part in fact_alignment.
+        if self.prefilter is None or metric not in (None, "fact_alignment"):
+            return self.judge.name
+        return f"{self.judge.name}+{self.prefilter.name}"
+
+    def _judge_batch(self, requests, labels, positive):
+        """
+        Send a batch of verdict requests to the judge; True where it answered `positive`,
+        None where the call failed (counted as negative, reported as judge_errors).
+        """
+        verdicts = []
+        for outcome in self.judge.classify_batch(requests, labels):
+            if isinstance(outcome, Exception):
+                print(f"Error calling judge API ({self.judge.name}): {outcome}")
+                verdicts.append(None)
+            else:
+                verdicts.append(outcome == positive)
+        return verdicts
 
+    @staticmethod
+    def _presence_messages(soap_fragment, key_fact):
         prompt = f"""
         You are an expert bilingual medical evaluator (Dutch/English).
         
@@ -51,27 +72,35 @@ class FineSurEEvaluator:
         
         Reply ONLY with "PRESENT" or "ABSENT". Do not explain.
         """
+        return [
+            {"role": "system", "content": "You are an expert bilingual medical evaluator (Dutch/English)."},
+            {"role": "user", "content": prompt}
+        ]
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are an expert bilingual medical evaluator (Dutch/English)."},
-                    {"role": "user", "content": prompt}
-                ],
-                stream=False,
-                temperature=0.0)
-            result = response.choices[0].message.content.strip().upper()
-            result = result.replace('"', '').replace("'", "").replace(".", "").strip()
-            
-            if "PRESENT" in result:
-                return True
-            if "ABSENT" in result:
-                return False
-            return False
-        except Exception as e:
-            print(f"Error calling DeepSeek API: {e}")
-            return False
+    def _key_fact_presence(self, soap_fragment, key_fact):
+        return self._facts_presence(soap_fragment, [key_fact])[0]
+
+    def _facts_presence(self, soap_fragment, key_facts):
+        """
+        PRESENT/ABSENT for every key fact against one SOAP section, in one judge batch.
+        """
+        if not soap_fragment or not isinstance(soap_fragment, str) or not soap_fragment.strip():
+            return [False] * len(key_facts)
+
+        verdicts = [None] * len(key_facts)
+        if self.prefilter is not None:
+            verdicts = [self.prefilter.presence(soap_fragment, fact) for fact in key_facts]
+            resolved = sum(v is not None for v in verdicts)
+            with self._stats_lock:
+                self.prefilter_stats["local"] += resolved
+                self.prefilter_stats["remote"] += len(key_facts) - resolved
+
+        pending = [i for i, v in enumerate(verdicts) if v is None]
+        judged = self._judge_batch([self._presence_messages(soap_fragment, key_facts[i]) for i in pending],
+                                   PRESENCE_LABELS, "PRESENT")
+        for i, verdict in zip(pending, judged):
+            verdicts[i] = verdict
+        return verdicts
 
     def fact_alignment(self, generated_content, key_facts_dict):
         if isinstance(generated_content, dict):
@@ -82,7 +111,8 @@ class FineSurEEvaluator:
         results = {
             "breakdown": {},
             "scores": {},   
-            "overall_score": 0
+            "overall_score": 0,
+            "judge_errors": 0
         }
         total_facts = 0
         found_facts = 0
@@ -105,9 +135,9 @@ class FineSurEEvaluator:
                 results["scores"][cat] = "N/A"
                 results["breakdown"][cat] = []
                 continue
-            for fact in facts:
-                is_present = self._key_fact_presence(soap_section_content, fact)
-                cat_results.append({"fact": fact, "present": is_present})
+            for fact, is_present in zip(facts, self._facts_presence(soap_section_content, facts)):
+                results["judge_errors"] += is_present is None
+                cat_results.append({"fact": fact, "present": bool(is_present)})
                 if is_present:
                     cat_found += 1
 
@@ -126,10 +156,8 @@ class FineSurEEvaluator:
         
         return results
 
-    def _claim_check(self, claim, transcript):
-        if (not claim or not claim.strip()) and not transcript:
-            return False
-
+    @staticmethod
+    def _claim_check_messages(claim, transcript):
         prompt = f"""
         You are a clinical fact-checking agent with a strong medical background.
 
@@ -151,21 +179,25 @@ class FineSurEEvaluator:
 
         Reply ONLY with SUPPORTED or NOT-FOUND. Do not explain.
         """
+        return [
+            {"role": "system", "content": "You are a medical/clinical fact-checking agent."},
+            {"role": "user", "content": prompt}
+        ]
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a medical/clinical fact-checking agent."},
-                    {"role": "user", "content": prompt}
-                ],
-                stream=False,
-                temperature=0.0)
-            reply = response.choices[0].message.content.strip().upper()
-            return "SUPPORTED" in reply
-        except Exception as e:
-            print(f"Error calling DeepSeek API: {e}")
-            return False
+    def _claim_check(self, claim, transcript):
+        return self._claims_check([claim], transcript)[0]
+
+    def _claims_check(self, claims, transcript):
+        """
+        SUPPORTED/NOT-FOUND for every claim against the transcript, in one judge batch.
+        """
+        verdicts = [False] * len(claims)
+        pending = [i for i, claim in enumerate(claims) if (claim and claim.strip()) or transcript]
+        judged = self._judge_batch([self._claim_check_messages(claims[i], transcript) for i in pending],
+                                   CLAIM_CHECK_LABELS, "SUPPORTED")
+        for i, verdict in zip(pending, judged):
+            verdicts[i] = verdict
+        return verdicts
 
     def _extract_claims(self, soap_fragment):
         if not soap_fragment or not isinstance(soap_fragment, str) or not soap_fragment.strip():
@@ -198,15 +230,10 @@ class FineSurEEvaluator:
         """
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a clinical claim extraction system."},
-                    {"role": "user", "content": prompt}
-                ],
-                stream=False,
-                temperature=0.0)
-            raw = response.choices[0].message.content.strip()
+            raw = self.judge.complete([
+                {"role": "system", "content": "You are a clinical claim extraction system."},
+                {"role": "user", "content": prompt}
+            ]).strip()
 
             if "```" in raw:
                 match = re.search(r"```(?:json)?(.*?)```", raw, re.DOTALL)
@@ -217,7 +244,7 @@ class FineSurEEvaluator:
             claims = [item["text"] for item in file["claims"]]
             return claims
         except Exception as e:
-            print(f"Error calling DeepSeek API or Parsing JSON: {e}")
+            print(f"Error calling judge API ({self.judge.name}) or Parsing JSON: {e}")
             return None
 
     def fact_checking(self, generated_content, transcript):
@@ -229,7 +256,8 @@ class FineSurEEvaluator:
         results = {
             "breakdown": {},
             "scores": {},
-            "overall_score": 0
+            "overall_score": 0,
+            "judge_errors": 0
         }
         total_facts = 0
         correct_facts = 0
@@ -246,14 +274,16 @@ class FineSurEEvaluator:
                  soap_section_content = str(soap_section_content)
 
             claims = self._extract_claims(soap_section_content)
+            # None: the extraction call failed, the section was not actually scored
+            results["judge_errors"] += claims is None
 
             if not claims:
                 results["scores"][cat] = "N/A"
                 results["breakdown"][cat] = []
                 continue
-            for claim in claims:
-                verified = self._claim_check(claim, transcript)
-                cat_results.append({"claim": claim, "factual": verified})
+            for claim, verified in zip(claims, self._claims_check(claims, transcript)):
+                results["judge_errors"] += verified is None
+                cat_results.append({"claim": claim, "factual": bool(verified)})
                 if verified:
                     cat_found += 1
             
@@ -272,10 +302,8 @@ class FineSurEEvaluator:
 
         return results
 
-    def _claim_presence(self, claim, keys_facts):
-        if (not claim or not claim.strip()) and not keys_facts:
-            return False
-
+    @staticmethod
+    def _claim_presence_messages(claim, keys_facts):
         prompt = f"""
         You are a clinical fact-checking agent with a strong medical background.
 
@@ -293,21 +321,25 @@ class FineSurEEvaluator:
         
         Reply ONLY with SUPPORTED, CONTRADICTED or NOT-FOUND. Do not explain.
         """
+        return [
+            {"role": "system", "content": "You are a medical/clinical fact-checking agent."},
+            {"role": "user", "content": prompt}
+        ]
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a medical/clinical fact-checking agent."},
-                    {"role": "user", "content": prompt}
-                ],
-                stream=False,
-                temperature=0.0)
-            reply = response.choices[0].message.content.strip().upper()
-            return "SUPPORTED" in reply
-        except Exception as e:
-            print(f"Error calling DeepSeek API: {e}")
-            return False
+    def _claim_presence(self, claim, keys_facts):
+        return self._claims_presence([claim], keys_facts)[0]
+
+    def _claims_presence(self, claims, keys_facts):
+        """
+        SUPPORTED/CONTRADICTED/NOT-FOUND for every claim against the key facts, in one judge batch.
+        """
+        verdicts = [False] * len(claims)
+        pending = [i for i, claim in enumerate(claims) if (claim and claim.strip()) or keys_facts]
+        judged = self._judge_batch([self._claim_presence_messages(claims[i], keys_facts) for i in pending],
+                                   CLAIM_PRESENCE_LABELS, "SUPPORTED")
+        for i, verdict in zip(pending, judged):
+            verdicts[i] = verdict
+        return verdicts
 
     def conciseness(self, generated_content, key_facts_dict):
         if isinstance(generated_content, dict):
@@ -318,7 +350,8 @@ class FineSurEEvaluator:
         results = {
             "breakdown": {},
             "scores": {},
-            "overall_score": 0
+            "overall_score": 0,
+            "judge_errors": 0
         }
         total_facts = 0
         correct_facts = 0
@@ -335,14 +368,17 @@ class FineSurEEvaluator:
                 soap_section_content = str(soap_section_content)
 
             claims = self._extract_claims(soap_section_content)
+            # None: the extraction call failed, the section was not actually scored
+            results["judge_errors"] += claims is None
 
             if not claims:
                 results["scores"][cat] = "N/A"
                 results["breakdown"][cat] = []
                 continue
-            for claim in claims:
-                verified = self._claim_presence(claim, key_facts_dict[cat])
-                cat_results.append({"claim": claim, "factual": verified})
+            verdicts = self._claims_presence(claims, key_facts_dict[cat])
+            for claim, verified in zip(claims, verdicts):
+                results["judge_errors"] += verified is None
+                cat_results.append({"claim": claim, "factual": bool(verified)})
                 if verified:
                     cat_found += 1
 
@@ -0,0 +1,139 @@
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import argparse
+
+from data_loader import DataLoader
+from evaluator import FineSurEEvaluator, PRESENCE_LABELS, CLAIM_CHECK_LABELS
+from soap_parser import normalize_soap_keys
+import judges
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+GENERATED_RESULTS_DIR = os.path.join(PROJECT_ROOT, "RQ3_output")
+BASE_DATA_PATH = os.path.join(PROJECT_ROOT, "examples_gp_consultation")
+SECTIONS = ["Subjective", "Objective", "Assessment", "Plan"]
+
+
+def _section_text(value):
+    if isinstance(value, list):
+        return "\n".join(str(item) for item in value)
+    return value if isinstance(value, str) else str(value)
+
+
+def build_requests(lang, strategy, models, task, max_pairs):
+    '''
+    Verdict requests built from the generated notes in RQ3_output, with the
+    evaluator's own prompts. "presence": every (section, key fact) pair.
+    "claim_check": every sentence of a section as a claim against the transcript
+    (no extraction call, so both judges see exactly the same claims).
+    A deterministic sample of max_pairs is kept.
+    '''
+    records = DataLoader(os.path.join(BASE_DATA_PATH, lang)).load_all()
+    gen_dir = os.path.join(GENERATED_RESULTS_DIR, lang)
+    models = models or sorted(d for d in os.listdir(gen_dir) if os.path.isdir(os.path.join(gen_dir, d)))
+
+    keyed = []
+    for model in models:
+        for case_id, record in records.items():
+            path = os.path.join(gen_dir, model, f"{case_id.replace(' ', '_')}_{strategy}.json")
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                soap = normalize_soap_keys(json.load(f))
+            for section in SECTIONS:
+                text = _section_text(soap.get(section, ""))
+                if not text.strip():
+                    continue
+                if task == "presence":
+                    items = record["key_facts"].get(section, [])
+                    make = lambda item: FineSurEEvaluator._presence_messages(text, item)
+                else:
+                    items = [c.strip() for c in re.split(r"(?<=[.;])\s+|\n", text) if len(c.strip()) > 3]
+                    make = lambda item: FineSurEEvaluator._claim_check_messages(item, record["transcript"])
+                for item in items:
+                    key = f"{model}|{case_id}|{section}|{item}"
+                    keyed.append((zlib.crc32(key.encode("utf-8")), make(item)))
+    keyed.sort(key=lambda pair: pair[0])
+    return [messages for _, messages in keyed[:max_pairs]]
+
+
+def run_judge(judge, requests, labels):
+    start = time.time()
+    outcomes = judge.classify_batch(requests, labels)
+    elapsed = time.time() - start
+    errors = sum(isinstance(o, Exception) for o in outcomes)
+    verdicts = [None if isinstance(o, Exception) else o for o in outcomes]
+    return verdicts, {
+        "judge": judge.name,
+        "requests": len(requests),
+        "errors": errors,
+        "wall_sec": round(elapsed, 2),
+        "verdicts_per_sec": round(len(requests) / elapsed, 2) if elapsed > 0 else None,
+        "labels": {label: verdicts.count(label) for label in list(labels) + [None]},
+    }
+
+
+def agreement(reference, candidate, positive):
+    '''
+    Raw agreement and Cohen's kappa on the positive/negative decision, over pairs both judges answered.
+    '''
+    pairs = [(r == positive, c == positive) for r, c in zip(reference, candidate) if r is not None and c is not None]
+    if not pairs:
+        return {"pairs": 0, "agreement_pct": None, "kappa": None}
+    n = len(pairs)
+    observed = sum(r == c for r, c in pairs) / n
+    p_ref = sum(r for r, _ in pairs) / n
+    p_cand = sum(c for _, c in pairs) / n
+    expected = p_ref * p_cand + (1 - p_ref) * (1 - p_cand)
+    kappa = (observed - expected) / (1 - expected) if expected < 1 else 1.0
+    return {"pairs": n, "agreement_pct": round(observed * 100, 2), "kappa": round(kappa, 3)}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Throughput and agreement of a local judge vs the remote judge.")
+    parser.add_argument("--lang", default="NL")
+    parser.add_argument("--strategy", default="few_shot")
+    parser.add_argument("--models", nargs="*", help="Generator model folders in RQ3_output (default: all).")
+    parser.add_argument("--task", choices=["presence", "claim_check"], default="presence")
+    parser.add_argument("--max-pairs", type=int, default=200)
+    parser.add_argument("--remote-model", default="deepseek-ai/DeepSeek-V3.2")
+    parser.add_argument("--local-model", default=judges.LOCAL_JUDGE_MODEL)
+    parser.add_argument("--local-url", default=judges.LOCAL_JUDGE_URL)
+    parser.add_argument("--local-slots", type=int, default=judges.LOCAL_JUDGE_SLOTS)
+    parser.add_argument("--skip-remote", action="store_true", help="Only measure local throughput.")
+    parser.add_argument("--output", help="Also write the report to this JSON file.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    labels, positive = (PRESENCE_LABELS, "PRESENT") if args.task == "presence" else (CLAIM_CHECK_LABELS, "SUPPORTED")
+    requests = build_requests(args.lang, args.strategy, args.models, args.task, args.max_pairs)
+    print(f"[Bench] {len(requests)} {args.task} requests from RQ3_output/{args.lang} ({args.strategy})")
+
+    local = judges.local_judge(args.local_model, args.local_url, args.local_slots)
+    local_verdicts, local_report = run_judge(local, requests, labels)
+    report = {"task": args.task, "lang": args.lang, "strategy": args.strategy, "local": local_report}
+    print(f"[Local] {local_report}")
+
+    if not args.skip_remote:
+        remote = judges.remote_judge(args.remote_model)
+        remote_verdicts, remote_report = run_judge(remote, requests, labels)
+        report["remote"] = remote_report
+        report["agreement"] = agreement(remote_verdicts, local_verdicts, positive)
+        print(f"[Remote] {remote_report}")
+        print(f"[Agreement] {report['agreement']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[Saved] {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
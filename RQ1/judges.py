@@ -0,0 +1,251 @@
+import os
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+import clients
+
+# Requests one judge sends concurrently for a batch (shared by all evaluation threads)
+REMOTE_BATCH_CONCURRENCY = 16
+# llama.cpp server: start it with the same number of slots, e.g. `llama-server -m judge.gguf -np 4 --port 8080`
+LOCAL_JUDGE_URL = os.environ.get("LOCAL_JUDGE_URL", "http://127.0.0.1:8080/v1")
+LOCAL_JUDGE_MODEL = os.environ.get("LOCAL_JUDGE_MODEL", "local-judge")
+LOCAL_JUDGE_SLOTS = 4
+LOCAL_JUDGE_TIMEOUT_SEC = 600
+# Verdict replies are one word; keep generation short on CPU
+CLASSIFY_MAX_TOKENS = 8
+# Ensemble: "quorum" asks a majority first and the others only on a split; "all" asks every judge at once
+ENSEMBLE_FANOUT = "quorum"
+ENSEMBLE_BATCH_CONCURRENCY = 16
+
+
+def match_label(reply, labels):
+    '''
+    First label (in the given order) contained in the reply, or None.
+    '''
+    reply = reply.strip().upper().replace('"', '').replace("'", "").replace(".", "").strip()
+    return next((label for label in labels if label in reply), None)
+
+
+class OpenAICompatibleJudge:
+    '''
+    Judge backend behind any OpenAI-compatible chat endpoint.
+
+    complete(messages) returns the reply text; classify(messages, labels) maps the
+    reply onto one of the labels (None if it matches none). classify_batch() sends
+    a list of requests concurrently, bounded per judge so a server with N slots
+    never sees more than N requests at once.
+    '''
+
+    def __init__(self, name, model, client, concurrency, classify_max_tokens=None):
+        self.name = name
+        self.model = model
+        self.client = client
+        self.concurrency = concurrency
+        self.classify_max_tokens = classify_max_tokens
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency,
+                                                    thread_name_prefix=f"judge-{self.name}")
+            return self._executor
+
+    def complete(self, messages, max_tokens=None, **kwargs):
+        params = {"model": self.model, "messages": messages, "stream": False, "temperature": 0.0}
+        if max_tokens:
+            params["max_tokens"] = max_tokens
+        params.update(kwargs)
+        response = self.client.chat.completions.create(**params)
+        return response.choices[0].message.content or ""
+
+    def classify(self, messages, labels):
+        return match_label(self.complete(messages, max_tokens=self.classify_max_tokens), labels)
+
+    def classify_batch(self, requests, labels):
+        '''
+        requests: list of message lists. Returns one label (or an Exception) per request, in order.
+        '''
+        if len(requests) <= 1:
+            return [self._classify_safe(messages, labels) for messages in requests]
+        return list(self._pool().map(lambda messages: self._classify_safe(messages, labels), requests))
+
+    def _classify_safe(self, messages, labels):
+        try:
+            return self.classify(messages, labels)
+        except Exception as e:
+            return e
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+class EnsembleJudge(OpenAICompatibleJudge):
+    '''
+    Majority vote over K judges, returned as soon as one label has a majority.
+
+    With fanout="all" every judge is asked concurrently; once a majority is in,
+    queued calls are cancelled and calls already on the wire are abandoned (the
+    synchronous client cannot abort them, their replies are ignored). With
+    fanout="quorum" only a majority of judges is asked first and the rest only
+    if they split, so unanimous verdicts cost K//2 + 1 calls. Ties go to the
+    first judge's label. A failed member call abstains; if every call failed,
+    classify() raises, so the batch reports a judge error. complete() (claim
+    extraction) uses the first judge only, so every member votes on the same claims.
+
+    stats: {(member, task): Counter(asked, agreed, disagreed, abstained, skipped)}
+    where task is the label set, e.g. "PRESENT/ABSENT", agreed/disagreed is with
+    the final verdict and skipped counts votes not needed (never asked, cancelled
+    or abandoned after the majority).
+    '''
+
+    def __init__(self, members, fanout=None, concurrency=ENSEMBLE_BATCH_CONCURRENCY):
+        if len(members) < 2:
+            raise ValueError("An ensemble needs at least two judges")
+        names = [m.name for m in members]
+        super().__init__(f"ensemble({'+'.join(names)})", "+".join(m.model for m in members), None, concurrency)
+        self.members = members
+        self.fanout = fanout or ENSEMBLE_FANOUT
+        self.stats = {}
+        self.decisions = 0
+        self.member_calls = 0
+        self._stats_lock = threading.Lock()
+
+    def complete(self, messages, max_tokens=None, **kwargs):
+        return self.members[0].complete(messages, max_tokens=max_tokens, **kwargs)
+
+    def _vote(self, member, messages, labels):
+        try:
+            return member.classify(messages, labels)
+        except Exception as e:
+            return e  # Abstain
+
+    def classify(self, messages, labels):
+        k = len(self.members)
+        majority = k // 2 + 1
+        first_wave = self.members[:majority] if self.fanout == "quorum" else self.members
+        futures = {m._pool().submit(self._vote, m, messages, labels): m for m in first_wave}
+        waiting = set(futures)
+        votes = {}
+        winner = None
+        while waiting:
+            done, waiting = wait(waiting, return_when=FIRST_COMPLETED)
+            for future in done:
+                votes[futures[future].name] = future.result()
+            tally = Counter(v for v in votes.values() if isinstance(v, str))
+            top = tally.most_common(1)
+            if top and top[0][1] >= majority:
+                winner = top[0][0]
+                break
+            if not waiting and len(futures) < k:
+                # Split (or abstentions) in the first wave: ask the remaining judges
+                for m in self.members[len(futures):]:
+                    future = m._pool().submit(self._vote, m, messages, labels)
+                    futures[future] = m
+                    waiting.add(future)
+        for future in waiting:
+            future.cancel()
+
+        if winner is None:
+            tally = Counter(v for v in votes.values() if isinstance(v, str))
+            if tally:
+                best = max(tally.values())
+                tied = [label for label, n in tally.items() if n == best]
+                primary = votes.get(self.members[0].name)
+                winner = primary if primary in tied else tied[0]
+
+        task = "/".join(labels)
+        with self._stats_lock:
+            self.decisions += 1
+            self.member_calls += len(futures) - sum(f.cancelled() for f in futures)
+            for m in self.members:
+                counter = self.stats.setdefault((m.name, task), Counter())
+                if m.name not in votes:
+                    counter["skipped"] += 1
+                    continue
+                counter["asked"] += 1
+                vote = votes[m.name]
+                if not isinstance(vote, str):
+                    counter["abstained"] += 1
+                elif vote == winner:
+                    counter["agreed"] += 1
+                else:
+                    counter["disagreed"] += 1
+        errors = [v for v in votes.values() if isinstance(v, Exception)]
+        if winner is None and len(errors) == len(votes):
+            raise RuntimeError(f"Every judge of {self.name} failed: {errors[-1]}")
+        return winner
+
+    def take_stats(self):
+        '''
+        Return and reset the per-member counters (for persisting them incrementally).
+        '''
+        with self._stats_lock:
+            stats, self.stats = self.stats, {}
+            return stats
+
+    def summary(self):
+        with self._stats_lock:
+            ceiling = self.decisions * len(self.members)
+            return {"decisions": self.decisions, "member_calls": self.member_calls,
+                    "cost_vs_all_judges_pct": round(self.member_calls / ceiling * 100, 2) if ceiling else None}
+
+    def close(self):
+        super().close()
+        for m in self.members:
+            m.close()
+
+
+def remote_judge(model="deepseek-ai/DeepSeek-V3.2"):
+    '''
+    The hosted judge: DeepInfra if DEEPINFRA_API_KEY is set, else DeepSeek.
+    Its name is the bare model string, as stored with earlier verdicts.
+    '''
+    api_key = os.environ.get("DEEPINFRA_API_KEY")
+    base_url = "https://api.deepinfra.com/v1/openai"
+    if not api_key:
+        api_key = os.environ.get("DEEPSEEK_API_KEY")
+        base_url = "https://api.deepseek.com"
+
+    if not api_key:
+        raise ValueError("error: No API_KEY found (checked DEEPINFRA_API_KEY and DEEPSEEK_API_KEY)")
+
+    # One pooled keep-alive client shared by all evaluation threads
+    provider = "deepinfra" if "deepinfra" in base_url else "deepseek"
+    client = clients.get_client(provider, base_url, api_key)
+    return OpenAICompatibleJudge(model, model, client, REMOTE_BATCH_CONCURRENCY)
+
+
+def local_judge(model=LOCAL_JUDGE_MODEL, base_url=LOCAL_JUDGE_URL, slots=LOCAL_JUDGE_SLOTS):
+    '''
+    A judge served on this machine by llama.cpp's llama-server (or any local
+    OpenAI-compatible server: vLLM on CPU, Ollama's /v1, ...). No API key, no network.
+    '''
+    client = clients.get_client("local-judge", base_url, "not-needed",
+                                timeout_sec=LOCAL_JUDGE_TIMEOUT_SEC, max_connections=slots,
+                                max_keepalive_connections=slots)
+    return OpenAICompatibleJudge(f"local:{model}", model, client, slots, classify_max_tokens=CLASSIFY_MAX_TOKENS)
+
+
+def make_judge(backend="remote", model=None):
+    '''
+    backend "remote" or "local"; "ensemble" takes a list of models, each "<model>"
+    (remote) or "local:<model>".
+    '''
+    if backend == "remote":
+        return remote_judge(model or "deepseek-ai/DeepSeek-V3.2")
+    if backend == "local":
+        return local_judge(model or LOCAL_JUDGE_MODEL)
+    if backend == "ensemble":
+        members = [local_judge(m[len("local:"):]) if m.startswith("local:") else remote_judge(m) for m in model]
+        return EnsembleJudge(members)
+    raise ValueError(f"Unknown judge backend '{backend}' (expected 'remote', 'local' or 'ensemble')")
@@ -0,0 +1,236 @@
+import os
+import re
+import sys
+import json
+import argparse
+import unicodedata
+
+from soap_parser import normalize_soap_keys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+GENERATED_RESULTS_DIR = os.path.join(PROJECT_ROOT, "RQ3_output")
+
+# Share of a key fact's content words that must appear in the SOAP section to call it PRESENT locally
+PRESENT_THRESHOLD = 0.9
+# Facts with fewer content words than this always go to the judge
+MIN_FACT_TOKENS = 2
+# Prefix length used to match inflected / compound forms (pijnlijk ~ pijn, rechterbeen ~ beenpijn)
+STEM_PREFIX = 5
+
+STOPWORDS = {
+    # EN
+    "a", "an", "the", "and", "or", "of", "in", "on", "at", "to", "for", "with", "by", "from", "is", "are", "was",
+    "were", "be", "been", "has", "have", "had", "does", "do", "did", "this", "that", "it", "its", "as", "he",
+    "she", "they", "his", "her", "their", "patient", "pt", "which", "there", "since", "some", "about", "per",
+    # NL
+    "de", "het", "een", "en", "of", "van", "in", "op", "aan", "te", "voor", "met", "door", "uit", "is", "zijn",
+    "was", "waren", "wordt", "worden", "werd", "heeft", "hebben", "had", "die", "dat", "dit", "deze", "er", "hij",
+    "zij", "ze", "zich", "haar", "hem", "patient", "patiente", "bij", "als", "om", "tot", "naar", "sinds", "ook",
+    "wel", "nog", "al", "over", "dan", "wat",
+}
+# Never dropped: a fact and a section that disagree on these are not "obviously" the same
+NEGATIONS = {"no", "not", "none", "without", "denies", "never", "negative", "geen", "niet", "zonder", "nooit",
+             "ontkent", "negatief"}
+# A negation covers the content words up to this many after it ("no persistent high fever") and the one
+# before it ("koorts negatief"), within its sentence; wider is only more conservative (more pairs go to the judge)
+NEGATION_SCOPE = 4
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_CLAUSE_RE = re.compile(r"[.;:!?\n]+")
+
+
+def normalize(text):
+    '''
+    Lowercase, fold accents (patiënt -> patient) and split into word tokens.
+    '''
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _TOKEN_RE.findall(text)
+
+
+def content_tokens(text):
+    return [t for t in normalize(text) if t not in STOPWORDS]
+
+
+def negated_tokens(text, scope=NEGATION_SCOPE):
+    '''
+    [(content token, whether a negation in its sentence covers it)].
+    '''
+    result = []
+    for clause in _CLAUSE_RE.split(str(text)):
+        tokens = content_tokens(clause)
+        flags = [False] * len(tokens)
+        for i, token in enumerate(tokens):
+            if token in NEGATIONS:
+                for j in range(max(0, i - 1), min(len(tokens), i + scope + 1)):
+                    flags[j] = flags[j] or tokens[j] not in NEGATIONS
+        result += zip(tokens, flags)
+    return result
+
+
+class LexicalPrefilter:
+    '''
+    CPU-only first stage for key-fact presence.
+
+    presence() returns True when (nearly) every content word of the fact is in
+    the section, False when the section is empty, and None when the pair is
+    ambiguous and must go to the LLM judge. It never decides ABSENT for a
+    non-empty section: paraphrases and EN notes vs NL facts are left to the judge.
+    '''
+
+    def __init__(self, threshold=PRESENT_THRESHOLD, min_fact_tokens=MIN_FACT_TOKENS):
+        self.threshold = threshold
+        self.min_fact_tokens = min_fact_tokens
+
+    @property
+    def name(self):
+        return f"lexical@{self.threshold:g}"
+
+    @staticmethod
+    def _section_index(section_text):
+        tokens = content_tokens(section_text)
+        return set(tokens), {t[:STEM_PREFIX] for t in tokens if len(t) >= STEM_PREFIX}, " ".join(tokens)
+
+    @staticmethod
+    def _matches(token, index):
+        words, prefixes, joined = index
+        if token in words:
+            return True
+        if len(token) >= STEM_PREFIX:
+            # Inflections and Dutch compounds (onderbeen in rechteronderbeen)
+            return token[:STEM_PREFIX] in prefixes or token in joined
+        return False
+
+    @staticmethod
+    def _same_word(fact_token, section_token):
+        # Token-level version of _matches, to locate where a fact word occurs in the section
+        if fact_token == section_token:
+            return True
+        return len(fact_token) >= STEM_PREFIX and (
+            fact_token[:STEM_PREFIX] == section_token[:STEM_PREFIX] or fact_token in section_token)
+
+    def _negation_differs(self, fact, section_text):
+        '''
+        True when a fact word and any of its occurrences in the section disagree on
+        negation ("persistent high fever" vs "no persistent high fever", either way).
+        '''
+        section = negated_tokens(section_text)
+        for token, negated in negated_tokens(fact):
+            if token in NEGATIONS:
+                continue
+            if any(flag != negated for other, flag in section if self._same_word(token, other)):
+                return True
+        return False
+
+    def score(self, section_text, fact):
+        '''
+        Share of the fact's content words found in the section (0..1).
+        '''
+        fact_tokens = content_tokens(fact)
+        if not fact_tokens:
+            return 0.0
+        index = self._section_index(section_text)
+        return sum(self._matches(t, index) for t in fact_tokens) / len(fact_tokens)
+
+    def presence(self, section_text, fact):
+        if not section_text or not str(section_text).strip():
+            return False
+        fact_tokens = content_tokens(fact)
+        if len(fact_tokens) < self.min_fact_tokens:
+            return None
+        index = self._section_index(section_text)
+        matched = sum(self._matches(t, index) for t in fact_tokens)
+        if matched / len(fact_tokens) < self.threshold:
+            return None
+        # A negation on one side only is a contradiction the word overlap cannot see
+        if self._negation_differs(fact, section_text):
+            return None
+        return True
+
+
+def _load_soap(lang, model, case_id, strategy, cache):
+    key = (lang, model, case_id, strategy)
+    if key not in cache:
+        path = os.path.join(GENERATED_RESULTS_DIR, lang, model, f"{case_id.replace(' ', '_')}_{strategy}.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                soap = normalize_soap_keys(json.load(f))
+        except (OSError, ValueError):
+            soap = None
+        cache[key] = soap
+    return cache[key]
+
+
+def _section_text(value):
+    if isinstance(value, list):
+        return "\n".join(str(item) for item in value)
+    return value if isinstance(value, str) else str(value)
+
+
+def agreement_report(store, judge, thresholds, languages=None):
+    '''
+    Replay stored fact_alignment verdicts of the full-LLM `judge` through the
+    prefilter at each threshold. Reports how many judge calls would be saved and
+    how often the final verdicts (local where resolved, LLM otherwise) agree.
+    '''
+    rows = store.verdicts("fact_alignment", judge=judge)
+    if languages:
+        rows = [r for r in rows if r["lang"] in languages]
+    soaps = {}
+    pairs = []
+    for row in rows:
+        soap = _load_soap(row["lang"], row["model"], row["case_id"], row["strategy"], soaps)
+        if soap is None:
+            continue
+        pairs.append((_section_text(soap.get(row["section"], "")), row["item"], bool(row["verdict"])))
+
+    report = {"judge": judge, "pairs": len(pairs), "thresholds": []}
+    for threshold in thresholds:
+        prefilter = LexicalPrefilter(threshold=threshold)
+        resolved = agree = 0
+        for section_text, fact, llm_verdict in pairs:
+            local = prefilter.presence(section_text, fact)
+            if local is None:
+                continue
+            resolved += 1
+            agree += local == llm_verdict
+        report["thresholds"].append({
+            "threshold": threshold,
+            "resolved_locally": resolved,
+            "judge_calls_saved_pct": round(resolved / len(pairs) * 100, 2) if pairs else 0.0,
+            "agreement_on_resolved_pct": round(agree / resolved * 100, 2) if resolved else None,
+            # Unresolved pairs still go to the judge, so they agree by construction
+            "overall_agreement_pct": round((len(pairs) - resolved + agree) / len(pairs) * 100, 2) if pairs else None,
+        })
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Agreement of the lexical key-fact prefilter with stored LLM verdicts.")
+    parser.add_argument("--judge", default="deepseek-ai/DeepSeek-V3.2", help="Full-LLM baseline judge in the result store.")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.7, 0.8, 0.9, 1.0])
+    parser.add_argument("--languages", nargs="*", help="Restrict to these languages (default: all).")
+    parser.add_argument("--store", help="Path of the judge result store (default: rq3_evaluation_results/judge_results.sqlite).")
+    parser.add_argument("--output", help="Also write the report to this JSON file.")
+    return parser.parse_args()
+
+
+def main():
+    from result_store import ResultStore, DEFAULT_STORE_PATH
+
+    args = parse_args()
+    store = ResultStore(args.store or DEFAULT_STORE_PATH)
+    report = agreement_report(store, args.judge, args.thresholds, args.languages)
+    if not report["pairs"]:
+        print(f"[Warning] No fact_alignment verdicts from '{args.judge}' in {store.path}. "
+              f"Run test_rq3.py with USE_PREFILTER = False first.")
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+import os
+import time
+import sqlite3
+import threading
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_PATH = os.path.join(SCRIPT_DIR, "rq3_evaluation_results", "judge_results.sqlite")
+SECTIONS = ["Subjective", "Objective", "Assessment", "Plan"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS evaluations (
+    lang TEXT NOT NULL,
+    model TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    case_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    judge TEXT,
+    soap_hash TEXT,
+    evaluated_at REAL NOT NULL,
+    PRIMARY KEY (lang, model, strategy, case_id, metric)
+);
+CREATE TABLE IF NOT EXISTS sections (
+    lang TEXT NOT NULL,
+    model TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    case_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    section TEXT NOT NULL,
+    n_items INTEGER NOT NULL,
+    n_positive INTEGER NOT NULL,
+    PRIMARY KEY (lang, model, strategy, case_id, metric, section)
+);
+CREATE TABLE IF NOT EXISTS verdicts (
+    lang TEXT NOT NULL,
+    model TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    case_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    section TEXT NOT NULL,
+    item_idx INTEGER NOT NULL,
+    item TEXT NOT NULL,
+    verdict INTEGER NOT NULL,
+    PRIMARY KEY (lang, model, strategy, case_id, metric, section, item_idx)
+);
+CREATE TABLE IF NOT EXISTS judge_agreement (
+    ensemble TEXT NOT NULL,
+    member TEXT NOT NULL,
+    task TEXT NOT NULL,
+    asked INTEGER NOT NULL DEFAULT 0,
+    agreed INTEGER NOT NULL DEFAULT 0,
+    disagreed INTEGER NOT NULL DEFAULT 0,
+    abstained INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (ensemble, member, task)
+);
+CREATE INDEX IF NOT EXISTS verdicts_by_metric ON verdicts (metric, lang, model, strategy, section);
+"""
+
+
+def _item_text_and_verdict(item):
+    # fact_alignment items are {"fact", "present"}; fact_checking/conciseness are {"claim", "factual"}
+    text = item.get("fact", item.get("claim", ""))
+    verdict = item.get("present", item.get("factual", False))
+    return str(text), 1 if verdict else 0
+
+
+class ResultStore:
+    '''
+    Per-fact / per-claim judge verdicts, keyed by lang/model/strategy/case/metric/section.
+
+    A section with no facts or claims is stored with n_items = 0 and scores as "N/A",
+    exactly like FineSurEEvaluator's reports, so case scores and the aggregate
+    CSVs can be rebuilt from the store without any judge calls.
+    '''
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def save_report(self, lang, model, strategy, case_id, metric, report, judge=None, soap_hash=None):
+        '''
+        Replace everything stored for this key with the breakdown of `report`.
+        '''
+        key = (lang, model, strategy, case_id, metric)
+        breakdown = report.get("breakdown", {})
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in ("evaluations", "sections", "verdicts"):
+                conn.execute(f"DELETE FROM {table} WHERE lang=? AND model=? AND strategy=? AND case_id=? AND metric=?",
+                             key)
+            conn.execute("INSERT INTO evaluations VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         key + (judge, soap_hash, time.time()))
+            for section in SECTIONS:
+                items = [_item_text_and_verdict(item) for item in breakdown.get(section, [])]
+                conn.execute("INSERT INTO sections VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             key + (section, len(items), sum(v for _, v in items)))
+                conn.executemany("INSERT INTO verdicts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                 [key + (section, idx, text, verdict) for idx, (text, verdict) in enumerate(items)])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_report(self, lang, model, strategy, case_id, metric, judge=None, soap_hash=None):
+        '''
+        Rebuild the evaluator report for this key, or None if it is not stored
+        (or was produced by another judge / for a different SOAP).
+        '''
+        key = (lang, model, strategy, case_id, metric)
+        conn = self._conn()
+        row = conn.execute("SELECT judge, soap_hash FROM evaluations WHERE lang=? AND model=? AND strategy=? "
+                           "AND case_id=? AND metric=?", key).fetchone()
+        if row is None:
+            return None
+        if (judge is not None and row[0] != judge) or (soap_hash is not None and row[1] != soap_hash):
+            return None
+
+        item_key = "fact" if metric == "fact_alignment" else "claim"
+        verdict_key = "present" if metric == "fact_alignment" else "factual"
+        report = {"breakdown": {s: [] for s in SECTIONS}, "scores": {}, "overall_score": 0}
+        for section, item, verdict in conn.execute(
+                "SELECT section, item, verdict FROM verdicts WHERE lang=? AND model=? AND strategy=? AND case_id=? "
+                "AND metric=? ORDER BY section, item_idx", key):
+            report["breakdown"][section].append({item_key: item, verdict_key: bool(verdict)})
+
+        total = positive = 0
+        for section, n_items, n_positive in conn.execute(
+                "SELECT section, n_items, n_positive FROM sections WHERE lang=? AND model=? AND strategy=? "
+                "AND case_id=? AND metric=?", key):
+            if n_items == 0:
+                report["scores"][section] = "N/A"
+                continue
+            report["scores"][section] = round(n_positive / n_items * 100, 2)
+            total += n_items
+            positive += n_positive
+        if total > 0:
+            report["overall_score"] = round(positive / total * 100, 2)
+        return report
+
+    def keys(self, metric=None):
+        '''
+        Distinct (lang, model, strategy, metric) combinations in the store.
+        '''
+        sql = "SELECT DISTINCT lang, model, strategy, metric FROM evaluations"
+        params = ()
+        if metric:
+            sql += " WHERE metric=?"
+            params = (metric,)
+        return self._conn().execute(sql + " ORDER BY 1, 2, 3, 4", params).fetchall()
+
+    def case_rows(self, lang, model, strategy, metric):
+        '''
+        One row per case in the layout of the rq3_evaluation_results CSVs, computed by query.
+        '''
+        rows = {}
+        for case_id, section, n_items, n_positive in self._conn().execute(
+                "SELECT case_id, section, n_items, n_positive FROM sections WHERE lang=? AND model=? "
+                "AND strategy=? AND metric=? ORDER BY case_id", (lang, model, strategy, metric)):
+            row = rows.setdefault(case_id, {"Case_ID": case_id, "Overall_Score": 0, "_n": 0, "_p": 0})
+            if n_items == 0:
+                row[section] = "N/A"
+            else:
+                row[section] = round(n_positive / n_items * 100, 2)
+                row["_n"] += n_items
+                row["_p"] += n_positive
+        for row in rows.values():
+            n, p = row.pop("_n"), row.pop("_p")
+            if n > 0:
+                row["Overall_Score"] = round(p / n * 100, 2)
+        return [{k: row.get(k, 0) for k in ["Case_ID", "Overall_Score"] + SECTIONS} for row in rows.values()]
+
+    def verdicts(self, metric, lang=None, model=None, strategy=None, case_id=None, section=None, judge=None):
+        '''
+        Drill-down: individual verdict rows matching the given filters.
+        '''
+        filters = {"metric": metric, "lang": lang, "model": model, "strategy": strategy,
+                   "case_id": case_id, "section": section}
+        where = " AND ".join(f"v.{k}=?" for k, v in filters.items() if v is not None)
+        params = [v for v in filters.values() if v is not None]
+        if judge is not None:
+            where += " AND e.judge=?"
+            params.append(judge)
+        cursor = self._conn().execute(
+            "SELECT v.lang, v.model, v.strategy, v.case_id, v.metric, v.section, v.item_idx, v.item, v.verdict, e.judge "
+            "FROM verdicts v JOIN evaluations e USING (lang, model, strategy, case_id, metric) WHERE "
+            + where + " ORDER BY v.lang, v.model, v.strategy, v.case_id, v.section, v.item_idx", params)
+        columns = [c[0] for c in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def add_judge_stats(self, ensemble, stats):
+        '''
+        Add an EnsembleJudge's per-member counters ({(member, task): Counter}) to the running totals.
+        '''
+        now = time.time()
+        self._conn().executemany(
+            "INSERT INTO judge_agreement VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(ensemble, member, task) DO UPDATE SET asked=asked+excluded.asked, "
+            "agreed=agreed+excluded.agreed, disagreed=disagreed+excluded.disagreed, "
+            "abstained=abstained+excluded.abstained, skipped=skipped+excluded.skipped, updated_at=excluded.updated_at",
+            [(ensemble, member, task, c["asked"], c["agreed"], c["disagreed"], c["abstained"], c["skipped"], now)
+             for (member, task), c in stats.items()])
+
+    def judge_stats(self, ensemble=None):
+        '''
+        Per-member agreement with the ensemble verdict, with agreement_pct over the votes cast.
+        '''
+        sql = "SELECT ensemble, member, task, asked, agreed, disagreed, abstained, skipped FROM judge_agreement"
+        params = ()
+        if ensemble:
+            sql += " WHERE ensemble=?"
+            params = (ensemble,)
+        cursor = self._conn().execute(sql + " ORDER BY ensemble, task, member", params)
+        columns = [c[0] for c in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for row in rows:
+            voted = row["agreed"] + row["disagreed"]
+            row["agreement_pct"] = round(row["agreed"] / voted * 100, 2) if voted else None
+        return rows
@@ -1,101 +1,108 @@
-import pandas as pd
-from tqdm import tqdm
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from data_loader import DataLoader
 from evaluator import FineSurEEvaluator
-
-loader = DataLoader(base_path="../examples_gp_consultation/EN")
-evaluator = FineSurEEvaluator(model="deepseek-chat")
-case_ids = loader.get_all_case_ids()
-print(f"Found {len(case_ids)} cases to evaluate.")
-fact_checking = []
-fact_alignment = []
-concise = []
-
-
-def main(generated_soap: pd.DataFrame = None) -> None:
-
-    model_ids = model_ids = ['reference'] if generated_soap == None else list(
+from result_store import ResultStore
+from soap_parser import parse_soap_sections
+from test_rq3 import evaluate_soap
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+from stats import StatsBook, AGGREGATES_FILE_NAME
+
+LANGUAGE = "EN"
+BASE_PATH = f"../examples_gp_consultation/{LANGUAGE}"
+OUTPUT_DIR = "sanity_check"
+JUDGE_MODEL = "deepseek-chat"
+METRICS = ["fact_checking", "fact_alignment", "conciseness"]
+MAX_WORKERS = 10
+# Verdicts are stored / reused like test_rq3.py, under this strategy name, in a store of their own
+# so `test_rq3.py --export` never picks them up
+SANITY_STRATEGY = "sanity_check"
+USE_RESULT_STORE = True
+STORE_PATH = os.path.join(OUTPUT_DIR, "judge_results.sqlite")
+
+
+def evaluate_pair(case_id, model_id, soap, record, evaluator, store):
+    """
+    Worker: score one (case, model) SOAP on every metric. Returns {metric: row} or None.
+    """
+    key_facts = record.get('key_facts', {})
+    transcript = record.get('transcript', "")
+    if not soap or not key_facts or not transcript:
+        print(f"Skipping {case_id} ({model_id}): missing data.")
+        return None
+
+    generated_soap = soap if isinstance(soap, dict) else parse_soap_sections(soap)
+    results = evaluate_soap(case_id, generated_soap, key_facts, transcript, evaluator, METRICS,
+                            store=store, lang=LANGUAGE, model_name=model_id, strategy=SANITY_STRATEGY)
+    if not results:
+        return None
+    return {metric: {"Case_ID": case_id, "Model_ID": model_id,
+                     **{k: v for k, v in row.items() if k != "Case_ID"}}
+            for metric, row in results.items()}
+
+
+def main(generated_soap=None) -> None:
+    """
+    generated_soap: optional {case_id: {model_id: soap}} (SOAP text or section dict).
+    Without it, the reference SOAPs of the corpus are evaluated as model 'reference'.
+    """
+    import pandas as pd
+    from tqdm import tqdm
+    loader = DataLoader(base_path=BASE_PATH)
+    evaluator = FineSurEEvaluator(model=JUDGE_MODEL)
+    store = ResultStore(STORE_PATH) if USE_RESULT_STORE else None
+    # Every case is read once up front
+    records = loader.load_all()
+    case_ids = loader.get_all_case_ids()
+    print(f"Found {len(case_ids)} cases to evaluate.")
+
+    model_ids = ['reference'] if generated_soap is None else list(
         generated_soap[list(generated_soap)[0]].keys())
     print(model_ids)
-    print(case_ids)
-    for case_id in tqdm(case_ids, desc="Processing"):
-        for model_id in tqdm(model_ids, desc="Processing model results"):
-            data = loader.load_case_data(case_id)
-            key_facts = data.get('key_facts', {})
-            transcript = data.get('transcript', "")
-            reference_soap = data.get(
-                'ref_soap', "") if generated_soap == None else generated_soap[case_id][model_id]
-
-            if not reference_soap or not key_facts or not transcript:
-                print(f"Skipping {case_id}: missing data.")
-                continue
-
-            print(f"Case_ID: {case_id}\n\
-                    Model_ID: {model_id}\n\
-                    reference: {reference_soap}\n\
-                    key_facts: {key_facts}\n\n\n")
-
-            checking_report = evaluator.fact_checking(
-                reference_soap, transcript)
-
-            fact_checking.append({
-                "Case_ID": case_id,
-                "Model_ID": model_id,
-                "Overall_Score": checking_report['overall_score'],
-                "Subjective": checking_report['scores']['Subjective'],
-                "Objective": checking_report['scores']['Objective'],
-                "Assessment": checking_report['scores']['Assessment'],
-                "Plan": checking_report['scores']['Plan']
-            })
-
-            alignment_report = evaluator.fact_alignment(
-                reference_soap, key_facts)
-
-            fact_alignment.append({
-                "Case_ID": case_id,
-                "Model_ID": model_id,
-                "Overall_Score": alignment_report['overall_score'],
-                "Subjective": alignment_report['scores']['Subjective'],
-                "Objective": alignment_report['scores']['Objective'],
-                "Assessment": alignment_report['scores']['Assessment'],
-                "Plan": alignment_report['scores']['Plan']
-            })
-
-            concise_report = evaluator.conciseness(
-                reference_soap, key_facts)
-
-            concise.append({
-                "Case_ID": case_id,
-                "Model_ID": model_id,
-                "Overall_Score": concise_report['overall_score'],
-                "Subjective": concise_report['scores']['Subjective'],
-                "Objective": concise_report['scores']['Objective'],
-                "Assessment": concise_report['scores']['Assessment'],
-                "Plan": concise_report['scores']['Plan']
-            })
-
-        check_df = pd.DataFrame(fact_checking).replace("N/A", pd.NA)
-        check_avg = check_df.mean(numeric_only=True)
-        check_avg['Case_ID'] = 'Average'
-        check_df.loc[len(check_df)] = check_avg
-        alignment_df = pd.DataFrame(fact_alignment).replace("N/A", pd.NA)
-        alignment_avg = alignment_df.mean(numeric_only=True)
-        alignment_avg['Case_ID'] = 'Average'
-        alignment_df.loc[len(alignment_df)] = alignment_avg
-        concise_df = pd.DataFrame(concise).replace("N/A", pd.NA)
-        concise_avg = concise_df.mean(numeric_only=True)
-        concise_avg['Case_ID'] = 'Average'
-        concise_df.loc[len(concise_df)] = concise_avg
 
-    print("======================= Fact Checking Report =======================")
-    print(check_df.to_string(index=False))
-    check_df.to_csv("sanity_check/fact_checking_EN.csv", index=False)
-    print("===================== Key-Fact Alignment Report ====================")
-    print(alignment_df.to_string(index=False))
-    alignment_df.to_csv("sanity_check/fact_alignment_EN.csv", index=False)
-    print("============+=========== Conciseness Report ===+====================")
-    print(concise_df.to_string(index=False))
-    concise_df.to_csv("sanity_check/conciseness_EN.csv", index=False)
+    tasks = []
+    for case_id in case_ids:
+        for model_id in model_ids:
+            if generated_soap is None:
+                soap = records[case_id].get('ref_soap', "")
+            else:
+                soap = generated_soap.get(case_id, {}).get(model_id)
+            tasks.append((case_id, model_id, soap))
+
+    rows = {metric: [] for metric in METRICS}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(evaluate_pair, case_id, model_id, soap, records[case_id], evaluator, store)
+                   for case_id, model_id, soap in tasks]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Processing"):
+            result = future.result()
+            if result:
+                for metric, row in result.items():
+                    rows[metric].append(row)
+
+    # Aggregate once, after all pairs are scored
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    stats_book = StatsBook(os.path.join(OUTPUT_DIR, AGGREGATES_FILE_NAME))
+    titles = {"fact_checking": "Fact Checking", "fact_alignment": "Key-Fact Alignment", "conciseness": "Conciseness"}
+    for metric in METRICS:
+        df = pd.DataFrame(rows[metric], columns=["Case_ID", "Model_ID", "Overall_Score", "Subjective",
+                                                 "Objective", "Assessment", "Plan"])
+        df = df.replace("N/A", pd.NA).sort_values(by=["Case_ID", "Model_ID"])
+        for model_id, model_rows in df.groupby("Model_ID"):
+            stats_book.add_rows(LANGUAGE, model_id, SANITY_STRATEGY, metric, model_rows.to_dict("records"))
+
+        print(f"======================= {titles[metric]} Report =======================")
+        print(df.to_string(index=False))
+        for model_id in model_ids:
+            mean = stats_book.mean(LANGUAGE, model_id, SANITY_STRATEGY, metric)
+            if mean is not None:
+                print(f"Average ({model_id}): {mean:.3f}")
+        df.to_csv(os.path.join(OUTPUT_DIR, f"{metric}_{LANGUAGE}.csv"), index=False)
+    stats_book.flush()
 
 
 if __name__ == "__main__":
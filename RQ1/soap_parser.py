@@ -74,3 +74,30 @@ def parse_soap_sections(input_data):
         sections[now_sec] = "\n".join(buffer).strip()
 
     return sections
+
+
+def normalize_soap_keys(raw_json):
+    '''
+    Map the keys of a generated SOAP JSON (any casing, markdown, EN/NL) onto
+    Subjective / Objective / Assessment / Plan.
+    '''
+    generated_soap = {"Subjective": "", "Objective": "", "Assessment": "", "Plan": ""}
+    raw_json_normalized = {
+        k.lower().strip().replace(":", "").replace("*", "").replace("#", ""): v 
+        for k, v in raw_json.items()
+    }
+    
+    mapping_rules = {
+        "Subjective": ["subjective", "subjectief"],
+        "Objective":  ["objective", "objectief"],
+        "Assessment": ["assessment"],
+        "Plan":       ["plan"]
+    }
+
+    for standard_key, aliases in mapping_rules.items():
+        for alias in aliases:
+            match = next((k for k in raw_json_normalized if alias in k), None)
+            if match:
+                generated_soap[standard_key] = raw_json_normalized[match]
+                break
+    return generated_soap
@@ -1,28 +1,68 @@
-import pandas as pd
-from tqdm import tqdm
 from data_loader import DataLoader
 from evaluator import FineSurEEvaluator
+from result_store import ResultStore
+from soap_parser import normalize_soap_keys
+from prefilter import LexicalPrefilter
+import judges
 import json
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import sys
+import glob
+import re
+import time
+import argparse
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
 # --- Configuration ---
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__)) 
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)              
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+from sharding import SHARDS_DIR_NAME, parse_shard, in_shard, shard_tag, check_complete
+from job_queue import JobQueue
+from stats import StatsBook, AGGREGATES_FILE_NAME
+from metrics import RunMetrics
+
 GENERATED_RESULTS_DIR = os.path.join(PROJECT_ROOT, "RQ3_output")
 BASE_DATA_PATH = os.path.join(PROJECT_ROOT, "examples_gp_consultation")
 OUTPUT_DIR = os.path.join(SCRIPT_DIR, "rq3_evaluation_results")
 
+# "remote" (DeepInfra/DeepSeek), "local" (llama.cpp server, see judges.py) or "ensemble"
+JUDGE_BACKEND = "remote"
+REMOTE_JUDGE_MODEL = "deepseek-ai/DeepSeek-V3.2"
+# "ensemble": majority vote of these judges ("<model>" on the remote provider or "local:<model>")
+ENSEMBLE_JUDGE_MODELS = ["deepseek-ai/DeepSeek-V3.2", "Qwen/Qwen3-235B-A22B-Instruct-2507", "meta-llama/Llama-3.3-70B-Instruct"]
+
 # "fact_checking", "fact_alignment", "conciseness"
 EVALUATION_METRICS = ["fact_checking", "fact_alignment"]
 
 STRATEGIES = ["few_shot"]
 MAX_WORKERS = 20
 LANGUAGES = ["EN", "NL"]
+# Read inputs from examples_gp_consultation/<lang>.gpcorpus (python corpus_pack.py)
+USE_PACKED_CORPUS = False
+# --follow: evaluate SOAPs from the job queue while pipeline.py --publish runs
+FOLLOW_POLL_SEC = 2.0
+FOLLOW_IDLE_EXIT_SEC = 30.0  # Exit after the queue is drained and no producer has run for this long
+FOLLOW_SAVE_SEC = 30.0       # Rewrite the CSVs with new results at most this often
+# Persist per-fact/per-claim verdicts to rq3_evaluation_results/judge_results.sqlite
+USE_RESULT_STORE = True
+# Skip the judge for (case, model, strategy, metric) already stored for the same judge and SOAP content
+REUSE_STORED_VERDICTS = True
+# Resolve near-verbatim key facts locally (prefilter.py) and only send ambiguous ones to the judge.
+# Check `python prefilter.py` for its agreement with the full-LLM verdicts before enabling.
+USE_PREFILTER = False
+PREFILTER_THRESHOLD = 0.9
+# Live run status (metrics.py), rewritten every few seconds in OUTPUT_DIR;
+# --metrics-port also serves it as JSON at http://127.0.0.1:<port>/
+STATUS_FILE_NAME = "run_status.json"
+METRICS_PORT = None
 
-def process_case(case_id, model_json_dir, strategy, loader, evaluator, active_metrics):
+def process_case(case_id, model_json_dir, strategy, loader, evaluator, active_metrics, store=None, lang=None):
     """
     Worker function: Dynamically Process a single case based on active_metrics.
+    With a ResultStore, every fact/claim verdict is persisted (and reused if unchanged).
     """
     # 1. Load Data
     data = loader.load_case_data(case_id)
@@ -44,53 +84,50 @@ def process_case(case_id, model_json_dir, strategy, loader, evaluator, active_me
         return None
     
     # 3. Key Mapping (Normalization)
-    generated_soap = {"Subjective": "", "Objective": "", "Assessment": "", "Plan": ""}
-    raw_json_normalized = {
-        k.lower().strip().replace(":", "").replace("*", "").replace("#", ""): v 
-        for k, v in raw_json.items()
-    }
-    
-    mapping_rules = {
-        "Subjective": ["subjective", "subjectief"],
-        "Objective":  ["objective", "objectief"],
-        "Assessment": ["assessment"],
-        "Plan":       ["plan"]
-    }
-
-    for standard_key, aliases in mapping_rules.items():
-        for alias in aliases:
-            match = next((k for k in raw_json_normalized if alias in k), None)
-            if match:
-                generated_soap[standard_key] = raw_json_normalized[match]
-                break
+    generated_soap = normalize_soap_keys(raw_json)
 
     # 4. Evaluate Dynamically
-    # Stores results for requested metrics: {'metric_name': result_dict}
+    model_name = os.path.basename(os.path.normpath(model_json_dir))
+    return evaluate_soap(case_id, generated_soap, key_facts, transcript, evaluator, active_metrics,
+                         store=store, lang=lang, model_name=model_name, strategy=strategy)
+
+def evaluate_soap(case_id, generated_soap, key_facts, transcript, evaluator, active_metrics,
+                  store=None, lang=None, model_name=None, strategy=None):
+    """
+    Score one SOAP dict (Subjective/Objective/Assessment/Plan) on the active metrics.
+    Verdicts are reused from / saved to the ResultStore under (lang, model_name, strategy, case_id);
+    reports with failed judge calls are not saved, so the next run asks again.
+    Returns {'metric_name': row} or None on an unexpected error.
+    """
     case_results = {}
+    metric_calls = {
+        "fact_checking": lambda: evaluator.fact_checking(generated_soap, transcript),    # Hallucination
+        "fact_alignment": lambda: evaluator.fact_alignment(generated_soap, key_facts),   # Completeness
+        "conciseness": lambda: evaluator.conciseness(generated_soap, key_facts),
+    }
+    # What each metric is judged against besides the SOAP; a changed reference invalidates stored verdicts
+    metric_references = {"fact_checking": transcript, "fact_alignment": key_facts, "conciseness": key_facts}
 
     try:
-        # --- Fact Checking (Hallucination) ---
-        if "fact_checking" in active_metrics:
-            report = evaluator.fact_checking(generated_soap, transcript)
-            case_results["fact_checking"] = {
-                "Case_ID": case_id,
-                "Overall_Score": report.get('overall_score', 0),
-                **{k: report.get('scores', {}).get(k, 0) for k in ["Subjective", "Objective", "Assessment", "Plan"]}
-            }
-
-        # --- Fact Alignment (Completeness) ---
-        if "fact_alignment" in active_metrics:
-            report = evaluator.fact_alignment(generated_soap, key_facts)
-            case_results["fact_alignment"] = {
-                "Case_ID": case_id,
-                "Overall_Score": report.get('overall_score', 0),
-                **{k: report.get('scores', {}).get(k, 0) for k in ["Subjective", "Objective", "Assessment", "Plan"]}
-            }
-
-        # --- Conciseness ---
-        if "conciseness" in active_metrics:
-            report = evaluator.conciseness(generated_soap, key_facts)
-            case_results["conciseness"] = {
+        for metric_name, call in metric_calls.items():
+            if metric_name not in active_metrics:
+                continue
+            report = None
+            soap_hash = hashlib.sha1(json.dumps([generated_soap, metric_references[metric_name]], sort_keys=True,
+                                                ensure_ascii=False).encode("utf-8")).hexdigest()
+            if store is not None and REUSE_STORED_VERDICTS:
+                # Same judge, same SOAP and reference content: the stored verdicts are still valid
+                report = store.get_report(lang, model_name, strategy, case_id, metric_name,
+                                          judge=evaluator.judge_id(metric_name), soap_hash=soap_hash)
+            if report is None:
+                report = call()
+                if report.get("judge_errors"):
+                    print(f"[Warning] {case_id} ({strategy}) {metric_name}: {report['judge_errors']} failed judge "
+                          f"call(s), scored as negative and not stored")
+                elif store is not None:
+                    store.save_report(lang, model_name, strategy, case_id, metric_name, report,
+                                      judge=evaluator.judge_id(metric_name), soap_hash=soap_hash)
+            case_results[metric_name] = {
                 "Case_ID": case_id,
                 "Overall_Score": report.get('overall_score', 0),
                 **{k: report.get('scores', {}).get(k, 0) for k in ["Subjective", "Objective", "Assessment", "Plan"]}
@@ -102,31 +139,303 @@ def process_case(case_id, model_json_dir, strategy, loader, evaluator, active_me
     
     return case_results
 
+def save_metric_csv(results, output_file):
+    # Case rows only; averages, spread and CIs live in rq3_evaluation_results/aggregates.csv (stats.py)
+    import pandas as pd
+    df = pd.DataFrame(results).replace("N/A", pd.NA)
+    df.to_csv(output_file, index=False)
+
+
+def open_stats_book():
+    return StatsBook(os.path.join(OUTPUT_DIR, AGGREGATES_FILE_NAME))
+
+
+def open_live_metrics(judge_name, port=None, shard=None):
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    name = STATUS_FILE_NAME if shard is None else STATUS_FILE_NAME.replace(".json", f"_{shard_tag(shard)}.json")
+    live = RunMetrics(f"test_rq3 judge {judge_name}", status_file=os.path.join(OUTPUT_DIR, name), port=port).start()
+    print(f"[Config] Live status: {live.status_file}" + (f", http://127.0.0.1:{live.port}/" if live.port else ""))
+    return live
+
+
+def _metric_csv_path(lang, model_name, strategy, metric_name):
+    return os.path.join(OUTPUT_DIR, lang, f"{model_name}_{strategy}_{metric_name}.csv")
+
+
+def _read_metric_csv(path):
+    # Case rows written by an earlier run, {case_id: row}
+    import csv
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return {row["Case_ID"]: row for row in csv.DictReader(f) if row.get("Case_ID") != "Average"}
+
+
+def follow_queue(evaluator, job_queue, store=None, live=None):
+    """
+    Consume (case, model, strategy) jobs published by the generator and evaluate
+    them as they arrive. The per model/strategy/metric CSVs keep the cases of
+    earlier runs and are rewritten with the aggregates, and once more at exit.
+    """
+    loaders = {}
+    # (lang, model, strategy, metric) -> {case_id: row}, seeded from the existing CSV;
+    # a re-published case replaces its row
+    aggregator = {}
+    unsaved = set()
+    saved_at = time.time()
+    in_flight = {}
+    evaluated = 0
+    idle_since = None
+    stats_book = open_stats_book()
+    live = live or RunMetrics("test_rq3 --follow")
+    judge_label = f"judge:{evaluator.judge_id()}"
+
+    def rows_for(group):
+        if group not in aggregator:
+            aggregator[group] = _read_metric_csv(_metric_csv_path(*group))
+            # The first row of a group restarts its aggregates series: start it with the earlier cases
+            stats_book.add_rows(*group, list(aggregator[group].values()))
+        return aggregator[group]
+
+    def save_csvs():
+        nonlocal saved_at
+        for group in sorted(unsaved):
+            output_file = _metric_csv_path(*group)
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            save_metric_csv(list(aggregator[group].values()), output_file)
+            print(f"[Saved] {group[3]} -> {output_file}")
+        unsaved.clear()
+        stats_book.flush()
+        saved_at = time.time()
+
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            while True:
+                for job in job_queue.claim(MAX_WORKERS - len(in_flight), languages=LANGUAGES, strategies=STRATEGIES):
+                    lang = job["lang"]
+                    if lang not in loaders:
+                        data_path = os.path.join(BASE_DATA_PATH, lang) + (".gpcorpus" if USE_PACKED_CORPUS else "")
+                        loaders[lang] = DataLoader(base_path=data_path)
+                        if not loaders[lang].packed:  # A pack is decoded case by case on demand
+                            loaders[lang].load_all()
+                    # A job claimed again after a stalled attempt counts as a retry
+                    outcomes = lambda result, seconds, retries=job.get("attempts") or 0: [
+                        ("Success" if result else "Fail", seconds, retries, False)]
+                    live.submitted(judge_label)
+                    key = f"{lang} {job['model']} {job['case_id']} ({job['strategy']})"
+                    future = executor.submit(live.run, judge_label, key, process_case, job["case_id"],
+                                             os.path.dirname(job["path"]), job["strategy"], loaders[lang], evaluator,
+                                             EVALUATION_METRICS, store=store, lang=lang, outcomes=outcomes)
+                    in_flight[future] = job
+
+                if in_flight:
+                    idle_since = None
+                    done, _ = wait(in_flight, timeout=FOLLOW_POLL_SEC, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = in_flight.pop(future)
+                        result_dict = future.result()
+                        if not result_dict:
+                            job_queue.fail(job, "no evaluation result (missing or unreadable JSON)")
+                            continue
+                        if not job_queue.complete(job):
+                            # Re-published (or re-leased) while it was evaluated: the new version is queued
+                            print(f"[Follow] {job['lang']} {job['model']} {job['case_id']} ({job['strategy']}) "
+                                  f"changed during evaluation, result dropped")
+                            continue
+                        for metric_name, data in result_dict.items():
+                            group = (job["lang"], job["model"], job["strategy"], metric_name)
+                            rows_for(group)[job["case_id"]] = data
+                            stats_book.add(*group, job["case_id"], data)
+                            unsaved.add(group)
+                        evaluated += 1
+                        print(f"[Follow] {evaluated} evaluated | {job['lang']} {job['model']} "
+                              f"{job['case_id']} ({job['strategy']}) | queue {job_queue.counts(LANGUAGES, STRATEGIES)}")
+                    if time.time() - saved_at >= FOLLOW_SAVE_SEC:
+                        save_csvs()
+                    else:
+                        stats_book.maybe_flush()
+                    live.set_queue_depth(job_queue.counts(LANGUAGES, STRATEGIES).get("pending", 0))
+                    continue
+
+                if any(job_queue.producers_open(lang) for lang in LANGUAGES):
+                    idle_since = None
+                else:
+                    idle_since = idle_since or time.time()
+                    if time.time() - idle_since >= FOLLOW_IDLE_EXIT_SEC:
+                        break
+                time.sleep(FOLLOW_POLL_SEC)
+    finally:
+        # Also after a crash or Ctrl+C: keep what was evaluated so far
+        save_csvs()
+
+
+def split_result_name(file_name):
+    """
+    "<model>_<strategy>_<metric>.csv" -> (model, strategy, metric), or None
+    """
+    match = re.fullmatch(r"(.+)_(standard|few_shot|cot|refine)_(fact_checking|fact_alignment|conciseness)\.csv",
+                         file_name)
+    return match.groups() if match else None
+
+
+def merge_shards():
+    """
+    Combine shard CSVs (rq3_evaluation_results/<lang>/shards/shard<i>of<N>/) into
+    the single-process layout and aggregate them once over all cases.
+    """
+    import pandas as pd
+    stats_book = open_stats_book()
+    for lang in LANGUAGES:
+        shard_dirs = sorted(glob.glob(os.path.join(OUTPUT_DIR, lang, SHARDS_DIR_NAME, "shard*of*")))
+        if not shard_dirs:
+            continue
+        warning = check_complete([os.path.basename(d) for d in shard_dirs])
+        if warning:
+            print(f"[Warning] {lang}: incomplete shard set: {warning}")
+
+        by_file = {}
+        for shard_dir in shard_dirs:
+            for path in glob.glob(os.path.join(shard_dir, "*.csv")):
+                by_file.setdefault(os.path.basename(path), []).append(path)
+
+        for file_name, paths in sorted(by_file.items()):
+            df = pd.concat([pd.read_csv(p) for p in paths], ignore_index=True)
+            # Shards written before stats.py may still carry an Average row
+            df = df[df['Case_ID'] != 'Average'].sort_values(by="Case_ID")
+            output_file = os.path.join(OUTPUT_DIR, lang, file_name)
+            rows = df.to_dict("records")
+            save_metric_csv(rows, output_file)
+            name_parts = split_result_name(file_name)
+            if name_parts:
+                stats_book.add_rows(lang, *name_parts, rows)
+            print(f"[Merged] {lang}: {len(paths)} shards -> {output_file}")
+    stats_book.flush()
+
+
+def export_from_store(store):
+    """
+    Rebuild the per model/strategy/metric CSVs from the stored verdicts (no judge calls).
+    """
+    stats_book = open_stats_book()
+    for lang, model_name, strategy, metric_name in store.keys():
+        if lang not in LANGUAGES:
+            continue
+        rows = store.case_rows(lang, model_name, strategy, metric_name)
+        current_output_dir = os.path.join(OUTPUT_DIR, lang)
+        os.makedirs(current_output_dir, exist_ok=True)
+        output_file = os.path.join(current_output_dir, f"{model_name}_{strategy}_{metric_name}.csv")
+        save_metric_csv(rows, output_file)
+        stats_book.add_rows(lang, model_name, strategy, metric_name, rows)
+        print(f"[Exported] {metric_name}: {len(rows)} cases -> {output_file}")
+    stats_book.flush()
+
+
+def report_judges(evaluator, store):
+    """
+    Print prefilter / ensemble usage; per-judge agreement is added to the result store.
+    """
+    if evaluator.prefilter is not None:
+        stats = evaluator.prefilter_stats
+        total = stats["local"] + stats["remote"]
+        print(f"\n[Prefilter] {stats['local']}/{total} key-fact checks resolved locally, {stats['remote']} sent to the judge")
+    judge = evaluator.judge
+    if isinstance(judge, judges.EnsembleJudge):
+        print(f"\n[Ensemble] {judge.summary()}")
+        if store is not None:
+            store.add_judge_stats(judge.name, judge.take_stats())
+            for row in store.judge_stats(judge.name):
+                print(f"  {row['task']:<35} {row['member']:<45} agreement {row['agreement_pct']}% "
+                      f"(asked {row['asked']}, abstained {row['abstained']}, skipped {row['skipped']})")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evaluate generated SOAP notes (RQ3).")
+    parser.add_argument("--shard", help="Only evaluate shard i of N (0-based) of case x model x strategy x metric.")
+    parser.add_argument("--merge", action="store_true", help="Merge shard CSVs into the normal layout and exit.")
+    parser.add_argument("--follow", action="store_true",
+                        help="Evaluate SOAPs from the job queue as pipeline.py --publish generates them.")
+    parser.add_argument("--export", action="store_true",
+                        help="Rewrite the CSVs from the judge result store and exit.")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Also serve the live run status as JSON on http://127.0.0.1:<port>/.")
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
+    from tqdm import tqdm
+    if args.merge:
+        merge_shards()
+        return
+    store = ResultStore() if USE_RESULT_STORE or args.export else None
+    if args.export:
+        export_from_store(store)
+        return
+    shard = parse_shard(args.shard)
+
     print(f"[Init] Root: {PROJECT_ROOT}")
     print(f"[Config] Metrics to run: {EVALUATION_METRICS}")
+    if shard is not None:
+        print(f"[Config] Shard: {shard[0]}/{shard[1]}")
+    if store is not None:
+        print(f"[Config] Judge result store: {store.path} (reuse stored verdicts: {REUSE_STORED_VERDICTS})")
     
-    evaluator = FineSurEEvaluator(model="deepseek-ai/DeepSeek-V3.2")
+    prefilter = LexicalPrefilter(threshold=PREFILTER_THRESHOLD) if USE_PREFILTER else None
+    judge_models = {"remote": REMOTE_JUDGE_MODEL, "ensemble": ENSEMBLE_JUDGE_MODELS}
+    judge = judges.make_judge(JUDGE_BACKEND, judge_models.get(JUDGE_BACKEND))
+    print(f"[Config] Judge: {judge.name} ({JUDGE_BACKEND})")
+    evaluator = FineSurEEvaluator(prefilter=prefilter, judge=judge)
+    live = open_live_metrics(judge.name, port=args.metrics_port, shard=shard)
+    judge_label = f"judge:{evaluator.judge_id()}"
+
+    if args.follow:
+        job_queue = JobQueue()
+        print(f"[Follow] Consuming {LANGUAGES} x {STRATEGIES} from {job_queue.path}")
+        try:
+            follow_queue(evaluator, job_queue, store=store, live=live)
+        finally:
+            live.close()
+        report_judges(evaluator, store)
+        print("\n[Done] Job queue drained.")
+        return
     
+    # Shards only write case rows; --merge aggregates them
+    stats_book = open_stats_book() if shard is None else None
+
     for lang in LANGUAGES:
         print(f"\n{'='*40}")
         print(f"Processing Language: {lang}")
         print(f"{'='*40}")
 
         current_data_path = os.path.join(BASE_DATA_PATH, lang)
+        if USE_PACKED_CORPUS:
+            current_data_path += ".gpcorpus"
         current_gen_path = os.path.join(GENERATED_RESULTS_DIR, lang)
         current_output_dir = os.path.join(OUTPUT_DIR, lang)
+        if shard is not None:
+            current_output_dir = os.path.join(current_output_dir, SHARDS_DIR_NAME, shard_tag(shard))
 
         if not os.path.exists(current_data_path) or not os.path.exists(current_gen_path):
             print(f"[Skip] Path not found for {lang}")
             continue
 
         loader = DataLoader(base_path=current_data_path)
-        case_ids = loader.get_all_case_ids()
-        model_dirs = [d for d in os.listdir(current_gen_path) if os.path.isdir(os.path.join(current_gen_path, d))]
+        # Preload every case once; workers are then served from memory (a pack is decoded on demand)
+        case_ids = loader.get_all_case_ids() if loader.packed else list(loader.load_all())
+        model_dirs = [d for d in os.listdir(current_gen_path)
+                      if os.path.isdir(os.path.join(current_gen_path, d)) and d != SHARDS_DIR_NAME]
         
         for model_name in model_dirs:
             for strategy in STRATEGIES:
+                # Metrics of each case that belong to this shard
+                case_metrics = {
+                    cid: [m for m in EVALUATION_METRICS if in_shard(shard, lang, cid, model_name, strategy, m)]
+                    for cid in case_ids
+                }
+                case_metrics = {cid: metrics for cid, metrics in case_metrics.items() if metrics}
+                if not case_metrics:
+                    continue
+
                 print(f'\n>> Model: {model_name} | Strategy: {strategy} [{lang}]')
                 
                 model_json_dir = os.path.join(current_gen_path, model_name)
@@ -134,35 +443,44 @@ def main():
                 # Initialize result containers for active metrics
                 aggregator = {metric: [] for metric in EVALUATION_METRICS}
                 
+                live.add_total(len(case_metrics))
+                live.submitted(judge_label, len(case_metrics))
                 with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                    # Pass EVALUATION_METRICS to the worker
+                    # Pass this case's metrics to the worker
                     future_to_case = {
-                        executor.submit(process_case, cid, model_json_dir, strategy, loader, evaluator, EVALUATION_METRICS): cid 
-                        for cid in case_ids
+                        executor.submit(live.run, judge_label, f"{lang} {model_name} {cid} ({strategy})",
+                                        process_case, cid, model_json_dir, strategy, loader, evaluator, metrics,
+                                        store=store, lang=lang): cid
+                        for cid, metrics in case_metrics.items()
                     }
                     
-                    for future in tqdm(as_completed(future_to_case), total=len(case_ids), desc=f"Evaluating"):
+                    for future in tqdm(as_completed(future_to_case), total=len(future_to_case), desc=f"Evaluating"):
                         result_dict = future.result()
                         if result_dict:
                             # Distribute results to appropriate lists
                             for metric_name, data in result_dict.items():
                                 if metric_name in aggregator:
                                     aggregator[metric_name].append(data)
+                                    if stats_book is not None:
+                                        stats_book.add(lang, model_name, strategy, metric_name, data["Case_ID"], data)
+                            if stats_book is not None:
+                                stats_book.maybe_flush()
 
                 # Save Results for each metric
                 os.makedirs(current_output_dir, exist_ok=True)
                 
                 for metric_name, results in aggregator.items():
                     if results:
-                        df = pd.DataFrame(results).replace("N/A", pd.NA)
-                        avg = df.mean(numeric_only=True)
-                        avg['Case_ID'] = 'Average'
-                        df.loc[len(df)] = avg
-                        
                         output_file = os.path.join(current_output_dir, f"{model_name}_{strategy}_{metric_name}.csv")
-                        df.to_csv(output_file, index=False)
+                        save_metric_csv(results, output_file)
                         print(f"[Saved] {metric_name} -> {output_file}")
 
+    live.close()
+    if stats_book is not None:
+        stats_book.flush()
+        print(f"[Saved] aggregates -> {stats_book.path}")
+
+    report_judges(evaluator, store)
     print("\n[Done] All requested evaluations completed.")
 
 if __name__ == "__main__":
@@ -0,0 +1,43 @@
+import re
+
+CHUNK_MAX_CHARS = 4000     # Target chunk size (~1k tokens); a single longer turn becomes its own chunk
+CHUNK_OVERLAP_TURNS = 2    # Turns repeated at the start of the next chunk, so a question keeps its answer
+
+_TURN_SPLIT_RE = re.compile(r"\n\s*\n")
+
+
+def split_turns(text):
+    '''
+    Speaker turns of a transcript. The corpus puts one turn per paragraph
+    (blank-line separated, no speaker labels); a transcript without blank
+    lines falls back to one turn per line.
+    '''
+    text = text.lstrip("\ufeff").strip()
+    turns = [t.strip() for t in _TURN_SPLIT_RE.split(text)]
+    if len(turns) == 1:
+        turns = [t.strip() for t in text.splitlines()]
+    return [t for t in turns if t]
+
+
+def chunk_transcript(text, max_chars=CHUNK_MAX_CHARS, overlap_turns=CHUNK_OVERLAP_TURNS):
+    '''
+    Split a transcript into chunks of whole turns of at most max_chars (unless
+    one turn is longer). Each chunk after the first starts with the last
+    overlap_turns turns of the previous one. Returns a list of strings.
+    '''
+    turns = split_turns(text)
+    chunks = []
+    current = []
+    carried = 0  # Overlap turns at the start of current
+    size = 0
+    for turn in turns:
+        if len(current) > carried and size + len(turn) + 2 > max_chars:
+            chunks.append(current)
+            current = current[-overlap_turns:] if overlap_turns else []
+            carried = len(current)
+            size = sum(len(t) + 2 for t in current)
+        current.append(turn)
+        size += len(turn) + 2
+    if len(current) > carried:
+        chunks.append(current)
+    return ["\n\n".join(chunk) for chunk in chunks]
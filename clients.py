@@ -0,0 +1,126 @@
+import os
+import threading
+
+# Defaults for every provider; override per provider in models.json with
+# "timeout_sec", "connect_timeout_sec", "max_connections", "max_keepalive_connections".
+DEFAULT_TIMEOUT_SEC = 180.0
+DEFAULT_CONNECT_TIMEOUT_SEC = 10.0
+DEFAULT_MAX_CONNECTIONS = 64
+DEFAULT_MAX_KEEPALIVE = 32
+KEEPALIVE_EXPIRY_SEC = 60.0
+
+_clients = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+# httpx / openai (and h2) are imported on the first get_client() call, so
+# entry points that never send a request start without them.
+HTTP2_ENABLED = None
+
+
+def _http2_available():
+    global HTTP2_ENABLED
+    if HTTP2_ENABLED is None:
+        try:
+            import h2  # noqa: F401
+            HTTP2_ENABLED = True
+        except ImportError:
+            HTTP2_ENABLED = False
+    return HTTP2_ENABLED
+
+
+def _make_hooks(name):
+    counters = _stats.setdefault(name, {"requests": 0, "responses": 0})
+
+    def on_request(request):
+        with _lock:
+            counters["requests"] += 1
+
+    def on_response(response):
+        with _lock:
+            counters["responses"] += 1
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def get_client(name, base_url, api_key, timeout_sec=None, connect_timeout_sec=None,
+               max_connections=None, max_keepalive_connections=None):
+    '''
+    Return a process-wide OpenAI client for (name, base_url, api_key), backed by
+    one pooled keep-alive httpx client. Safe to share across worker threads.
+    '''
+    key = (name, base_url, api_key)
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            return client
+
+        import httpx
+        from openai import OpenAI
+
+        max_connections = max_connections or DEFAULT_MAX_CONNECTIONS
+        http_client = httpx.Client(
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=min(max_keepalive_connections or DEFAULT_MAX_KEEPALIVE, max_connections),
+                keepalive_expiry=KEEPALIVE_EXPIRY_SEC,
+            ),
+            timeout=httpx.Timeout(timeout_sec or DEFAULT_TIMEOUT_SEC,
+                                  connect=connect_timeout_sec or DEFAULT_CONNECT_TIMEOUT_SEC),
+            event_hooks=_make_hooks(name),
+        )
+        client = OpenAI(base_url=base_url, api_key=api_key, http_client=http_client,
+                        timeout=timeout_sec or DEFAULT_TIMEOUT_SEC)
+        _clients[key] = client
+        return client
+
+
+def get_provider_client(provider_name, provider_config, api_key=None):
+    '''
+    Shared client for a provider entry from models.json.
+    '''
+    if api_key is None:
+        api_key = os.getenv(provider_config["env_key"])
+    return get_client(
+        provider_name,
+        provider_config.get("base_url"),
+        api_key,
+        timeout_sec=provider_config.get("timeout_sec"),
+        connect_timeout_sec=provider_config.get("connect_timeout_sec"),
+        max_connections=provider_config.get("max_connections"),
+        max_keepalive_connections=provider_config.get("max_keepalive_connections"),
+    )
+
+
+def pool_stats():
+    '''
+    Snapshot of pool usage per provider: open/idle connections, requests sent
+    and responses received. Connection counts come from httpcore internals and
+    are reported as None if those are unavailable.
+    '''
+    snapshot = {}
+    with _lock:
+        items = list(_clients.items())
+        counters = {name: dict(c) for name, c in _stats.items()}
+    for (name, _, _), client in items:
+        entry = snapshot.setdefault(name, {"clients": 0, "open_connections": 0, "idle_connections": 0,
+                                           "http2": _http2_available(), **counters.get(name, {})})
+        entry["clients"] += 1
+        pool = getattr(getattr(client._client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            entry["open_connections"] = entry["idle_connections"] = None
+            continue
+        if entry["open_connections"] is not None:
+            entry["open_connections"] += len(connections)
+            entry["idle_connections"] += sum(1 for c in connections if c.is_idle())
+    return snapshot
+
+
+def close_all():
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
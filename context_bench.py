@@ -0,0 +1,155 @@
+import os
+import csv
+import sys
+import glob
+import math
+import argparse
+
+import prompts
+import pipeline
+from planner import chars_per_token
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+SUMMARY_GLOB = os.path.join(PROJECT_ROOT, "RQ3_output", "*", "**", "RQ3_Summary_*.csv")
+# Automatic prefix caching only starts at this many prompt tokens (OpenAI, Gemini 2.5 Flash;
+# Gemini 2.5 Pro needs 2048), in blocks of CACHE_BLOCK_TOKENS
+CACHE_MIN_PREFIX_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+CACHED_INPUT_PRICE_FACTOR = 0.25  # Cached input tokens cost ~1/4 of fresh ones (Gemini 2.5 implicit caching)
+FAMILIES = ["Llama", "Gemini"]
+
+
+def _prompt_text(messages):
+    # What the provider sees as the prompt, in order (chat template tokens left out)
+    return "\n".join(m["content"] for m in messages)
+
+
+def cacheable_chars(texts):
+    '''
+    Per prompt, in call order: characters of its longest common prefix with an
+    earlier prompt, i.e. what a prefix cache could have served.
+    '''
+    cached = []
+    for i, text in enumerate(texts):
+        cached.append(max((len(os.path.commonprefix([text, earlier])) for earlier in texts[:i]), default=0))
+    return cached
+
+
+def _cache_tokens(prefix_chars, cpt):
+    tokens = prefix_chars / cpt
+    if tokens < CACHE_MIN_PREFIX_TOKENS:
+        return 0
+    return int(tokens // CACHE_BLOCK_TOKENS * CACHE_BLOCK_TOKENS)
+
+
+def estimate_layouts(transcripts, strategies, language):
+    '''
+    Offline input tokens per model family for the default layout (one independent
+    call per strategy) and the shared-context layout, and how many of them a
+    prefix cache could serve when the strategies of a transcript run back to back.
+    '''
+    layouts = {"default": prompts.construct_messages, "shared": prompts.construct_shared_context_messages}
+    report = {}
+    for t_data in transcripts:
+        for layout, build in layouts.items():
+            texts = [_prompt_text(build(s, t_data["content"], language=language)) for s in strategies]
+            prefixes = cacheable_chars(texts)
+            for family in FAMILIES:
+                cpt = chars_per_token(family, language)
+                row = report.setdefault((family, layout), {"Calls": 0, "Input_Tokens": 0, "Cacheable_Tokens": 0})
+                row["Calls"] += len(texts)
+                row["Input_Tokens"] += sum(math.ceil(len(text) / cpt) for text in texts)
+                row["Cacheable_Tokens"] += sum(_cache_tokens(chars, cpt) for chars in prefixes)
+    for row in report.values():
+        row["Cacheable_Pct"] = round(row["Cacheable_Tokens"] / row["Input_Tokens"] * 100, 1) if row["Input_Tokens"] else 0.0
+        row["Billed_Equivalent_Tokens"] = round(row["Input_Tokens"] - row["Cacheable_Tokens"]
+                                                * (1 - CACHED_INPUT_PRICE_FACTOR))
+    return report
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def load_measured(pattern=SUMMARY_GLOB):
+    '''
+    Rows of pipeline.py summaries that recorded prompt usage, grouped by
+    (model, "shared" / "default" layout).
+    '''
+    csv.field_size_limit(2**31 - 1)
+    groups = {}
+    for path in sorted(glob.glob(pattern, recursive=True)):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                if row.get("Status") == "API_Fail" or "Shared_Context" not in row:
+                    continue
+                layout = "shared" if row["Shared_Context"] == "True" else "default"
+                groups.setdefault((row["Model_Name"], layout), []).append(row)
+    return groups
+
+
+def measured_report(groups):
+    report = {}
+    for key, rows in groups.items():
+        with_usage = [r for r in rows if _number(r.get("Input_Tokens")) is not None]
+        input_tokens = sum(_number(r["Input_Tokens"]) for r in with_usage)
+        cached = sum(_number(r.get("Cached_Input_Tokens")) or 0 for r in with_usage)
+        report[key] = {
+            "Calls": len(rows),
+            "Calls_With_Usage": len(with_usage),
+            "Input_Tokens_Mean": _mean([_number(r["Input_Tokens"]) for r in with_usage]),
+            "Cached_Pct": round(cached / input_tokens * 100, 1) if input_tokens else None,
+            "Duration_Mean_Sec": _mean([_number(r.get("Duration_Sec")) for r in rows]),
+            "TTFT_Mean_Sec": _mean([_number(r.get("TTFT_Sec")) for r in rows]),
+        }
+    return report
+
+
+def _fmt(value, spec):
+    return "-" if value is None else format(value, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Input-token and latency savings of the shared-context layout "
+                                                 "(pipeline.py --shared-context) vs one independent call per strategy.")
+    parser.add_argument("--pattern", default=SUMMARY_GLOB, help="Summary CSVs with measured usage.")
+    parser.add_argument("--strategies", nargs="+", default=pipeline.ACTIVE_STRATEGIES)
+    args = parser.parse_args()
+
+    transcripts = list(pipeline.iter_transcripts())
+    print(f"[Offline] {len(transcripts)} {pipeline.LANGUAGE_DIR} transcripts x {args.strategies} "
+          f"(cache from {CACHE_MIN_PREFIX_TOKENS} tokens, cached input at {CACHED_INPUT_PRICE_FACTOR:.0%} price)")
+    print(f"{'Family':<8}{'Layout':<9}{'Calls':>7}{'In tok':>12}{'Cacheable':>12}{'%':>7}{'Billed eq.':>12}")
+    offline = estimate_layouts(transcripts, args.strategies, pipeline.LANGUAGE_DIR)
+    for (family, layout), row in sorted(offline.items()):
+        print(f"{family:<8}{layout:<9}{row['Calls']:>7}{row['Input_Tokens']:>12,}{row['Cacheable_Tokens']:>12,}"
+              f"{row['Cacheable_Pct']:>7}{row['Billed_Equivalent_Tokens']:>12,}")
+
+    measured = measured_report(load_measured(args.pattern))
+    if not measured:
+        print("\n[Measured] No summaries with usage columns yet: run pipeline.py with and without --shared-context.")
+        return 0
+    print(f"\n[Measured] from {args.pattern}")
+    print(f"{'Model':<26}{'Layout':<9}{'Calls':>7}{'Usage':>7}{'In tok':>9}{'Cached %':>10}{'Dur s':>8}{'TTFT s':>8}")
+    for (model, layout), row in sorted(measured.items()):
+        print(f"{model:<26}{layout:<9}{row['Calls']:>7}{row['Calls_With_Usage']:>7}"
+              f"{_fmt(row['Input_Tokens_Mean'], '.0f'):>9}{_fmt(row['Cached_Pct'], '.1f'):>10}"
+              f"{_fmt(row['Duration_Mean_Sec'], '.2f'):>8}{_fmt(row['TTFT_Mean_Sec'], '.2f'):>8}")
+    for model in sorted({model for model, _ in measured}):
+        base, shared = measured.get((model, "default")), measured.get((model, "shared"))
+        if base and shared and base["Duration_Mean_Sec"] and shared["Duration_Mean_Sec"] is not None:
+            change = (shared["Duration_Mean_Sec"] / base["Duration_Mean_Sec"] - 1) * 100
+            print(f"  {model}: mean duration {change:+.1f}% with the shared context")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import argparse
+from pathlib import Path
+
+# File layout:
+#   MAGIC | uint64 (little endian) index length | index JSON | blob area
+# The index maps case_id -> {field: [offset, length]} with offsets relative to
+# the start of the blob area. Every blob is UTF-8 text (key facts as JSON text).
+MAGIC = b"GPCORPUS1\n"
+PACK_SUFFIX = ".gpcorpus"
+FIELDS = {
+    "transcript": ("Transcripts", ".txt"),
+    "key_facts": ("KeyFacts", ".json"),
+    "ref_soap": ("SOAP-examples", ".txt"),
+}
+
+script_dir = Path(__file__).parent.absolute()
+BASE_DIR = script_dir / "examples_gp_consultation"
+
+
+def default_pack_path(lang_dir):
+    return str(lang_dir).rstrip("/\\") + PACK_SUFFIX
+
+
+def pack_corpus(lang_dir, out_path=None):
+    '''
+    Pack <lang_dir>/{Transcripts,KeyFacts,SOAP-examples} into a single indexed file.
+    Cases are the transcripts; missing key facts / references are simply absent.
+    '''
+    out_path = out_path or default_pack_path(lang_dir)
+    transcripts_dir = os.path.join(lang_dir, "Transcripts")
+    case_ids = sorted(os.path.splitext(f)[0] for f in os.listdir(transcripts_dir) if f.endswith(".txt"))
+
+    index = {}
+    blobs = []
+    offset = 0
+    for case_id in case_ids:
+        entry = {}
+        for field, (sub_dir, ext) in FIELDS.items():
+            path = os.path.join(lang_dir, sub_dir, case_id + ext)
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            if field == "key_facts":
+                # Validate once at pack time, store compact
+                text = json.dumps(json.loads(text), ensure_ascii=False)
+            data = text.encode("utf-8")
+            entry[field] = [offset, len(data)]
+            blobs.append(data)
+            offset += len(data)
+        index[case_id] = entry
+
+    header = json.dumps({"language": os.path.basename(str(lang_dir).rstrip("/\\")), "cases": index},
+                        ensure_ascii=False).encode("utf-8")
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for data in blobs:
+            f.write(data)
+    os.replace(tmp_path, out_path)
+    return out_path, len(case_ids)
+
+
+class PackedCorpus:
+    '''
+    Read-only, memory-mapped view of a packed corpus with O(1) case lookup.
+    '''
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a packed corpus")
+        (header_len,) = struct.unpack_from("<Q", self._mm, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = json.loads(self._mm[header_start:header_start + header_len].decode("utf-8"))
+        self.language = header.get("language")
+        self._index = header["cases"]
+        self._blob_start = header_start + header_len
+
+    def case_ids(self):
+        return list(self._index)
+
+    def __contains__(self, case_id):
+        return case_id in self._index
+
+    def text_length(self, case_id, field="transcript"):
+        '''
+        Size in bytes of a stored field without decoding it, or None.
+        '''
+        span = self._index.get(case_id, {}).get(field)
+        return span[1] if span else None
+
+    def get_text(self, case_id, field, default=""):
+        span = self._index.get(case_id, {}).get(field)
+        if span is None:
+            return default
+        start = self._blob_start + span[0]
+        return self._mm[start:start + span[1]].decode("utf-8")
+
+    def load_case(self, case_id):
+        '''
+        Same shape as DataLoader.load_case_data.
+        '''
+        key_facts = self.get_text(case_id, "key_facts", default=None)
+        return {
+            "id": case_id,
+            "key_facts": json.loads(key_facts) if key_facts else {},
+            "ref_soap": self.get_text(case_id, "ref_soap"),
+            "transcript": self.get_text(case_id, "transcript"),
+        }
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack a language corpus into a single indexed file.")
+    parser.add_argument("languages", nargs="*", default=["EN", "NL"], help="Language folders under examples_gp_consultation.")
+    parser.add_argument("--base-dir", default=str(BASE_DIR))
+    args = parser.parse_args()
+
+    for lang in args.languages:
+        lang_dir = os.path.join(args.base_dir, lang)
+        if not os.path.isdir(lang_dir):
+            print(f"[Skip] {lang_dir} not found")
+            continue
+        out_path, n_cases = pack_corpus(lang_dir)
+        print(f"[Packed] {lang}: {n_cases} cases -> {out_path} ({os.path.getsize(out_path)} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
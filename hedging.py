@@ -0,0 +1,142 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+HEDGE_PERCENTILE = 95
+HEDGE_WINDOW = 200          # Latest durations kept per (model, strategy)
+HEDGE_MIN_SAMPLES = 20      # No hedging for a (model, strategy) with fewer samples
+HEDGE_MIN_DELAY_SEC = 10.0  # Never hedge a call younger than this, whatever the percentile
+HEDGE_MAX_RATE = 0.05       # At most this fraction of calls gets a duplicate (caps the extra cost)
+
+
+class LatencyTracker:
+    '''
+    Rolling window of call durations per key, for percentile thresholds.
+    '''
+
+    def __init__(self, window=HEDGE_WINDOW, min_samples=HEDGE_MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, seconds):
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, key, q):
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))]
+
+
+class HedgePolicy:
+    '''
+    Speculative duplicate requests for stragglers.
+
+    run(key, call) starts call(stats) and, if it is still running after the
+    key's rolling p95 latency (at least HEDGE_MIN_DELAY_SEC), starts a second,
+    identical call. The first successful result wins. The loser is told to stop
+    through stats["cancel"]: a streamed call closes its stream at the next chunk,
+    a non-streamed one cannot be aborted and its reply is dropped. At most
+    max_rate of all calls are hedged.
+    '''
+
+    def __init__(self, max_workers, percentile=HEDGE_PERCENTILE, max_rate=HEDGE_MAX_RATE,
+                 min_delay_sec=HEDGE_MIN_DELAY_SEC, tracker=None):
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_delay_sec = min_delay_sec
+        self.tracker = tracker or LatencyTracker()
+        # Every attempt runs here so the caller can wait on it with a timeout; room for the duplicates too
+        self._executor = ThreadPoolExecutor(max_workers=max_workers * 2, thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_won = 0
+        self.losers_stopped = 0
+        self.extra_output_tokens = 0
+
+    def seed(self, history):
+        '''
+        history: {key: [seconds, ...]} from earlier runs, oldest first.
+        '''
+        for key, durations in history.items():
+            for seconds in durations[-self.tracker.window:]:
+                self.tracker.add(key, seconds)
+
+    def threshold(self, key):
+        p = self.tracker.percentile(key, self.percentile)
+        return None if p is None else max(p, self.min_delay_sec)
+
+    def _take_hedge_slot(self):
+        with self._lock:
+            if self.hedged + 1 > self.max_rate * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def _loser_done(self, future, stats):
+        with self._lock:
+            self.losers_stopped += bool(stats.get("cancelled"))
+            self.extra_output_tokens += stats.get("output_tokens") or 0
+
+    def run(self, key, call, failed=lambda result: False):
+        '''
+        Returns (result, stats, hedge) where hedge is None (not hedged), "primary" or "hedge" (the winner).
+        '''
+        start = time.time()
+        with self._lock:
+            self.calls += 1
+        attempts = {}
+
+        def launch(role):
+            stats = {"cancel": threading.Event()}
+            attempts[self._executor.submit(call, stats)] = (role, stats)
+
+        launch("primary")
+        done, _ = wait(attempts, timeout=self.threshold(key))
+        if not done and self._take_hedge_slot():
+            launch("hedge")
+
+        waiting = set(attempts)
+        winner = None
+        while waiting:
+            done, waiting = wait(waiting, return_when=FIRST_COMPLETED)
+            ok = [f for f in done if f.exception() is None and not failed(f.result())]
+            winner = ok[0] if ok else next(iter(done))
+            if ok:
+                break
+
+        for future in waiting:
+            _, stats = attempts[future]
+            stats["cancel"].set()
+            future.add_done_callback(lambda f, stats=stats: self._loser_done(f, stats))
+
+        role, stats = attempts[winner]
+        hedge = role if len(attempts) > 1 else None
+        if hedge == "hedge":
+            with self._lock:
+                self.hedge_won += 1
+        result = winner.result()
+        if not failed(result):
+            self.tracker.add(key, time.time() - start)
+        return result, stats, hedge
+
+    def summary(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_rate_pct": round(self.hedged / self.calls * 100, 2) if self.calls else 0.0,
+                "max_rate_pct": round(self.max_rate * 100, 2),
+                "hedge_won": self.hedge_won,
+                "losers_stopped_early": self.losers_stopped,
+                "extra_output_tokens": self.extra_output_tokens,
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,191 @@
+import os
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+script_dir = Path(__file__).parent.absolute()
+DEFAULT_QUEUE_PATH = script_dir / "RQ3_output" / "jobs.sqlite"
+
+# A claimed job that is not completed within this time is handed out again
+LEASE_SEC = 15 * 60
+# A producer that has not published or heartbeated for this long counts as gone
+PRODUCER_TIMEOUT_SEC = 10 * 60
+# An open producer refreshes its heartbeat this often, even while no note is saved
+PRODUCER_HEARTBEAT_SEC = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lang TEXT NOT NULL,
+    case_id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    claimed_at REAL,
+    finished_at REAL,
+    error TEXT,
+    UNIQUE (lang, case_id, model, strategy)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lang, strategy);
+CREATE TABLE IF NOT EXISTS producers (
+    name TEXT PRIMARY KEY,
+    lang TEXT,
+    opened_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    closed_at REAL
+);
+"""
+
+
+class JobQueue:
+    '''
+    Durable local queue of generated SOAP notes waiting for evaluation.
+
+    The generator publish()es every saved (lang, case, model, strategy) note;
+    evaluation workers claim() batches, then complete() or fail() them with the
+    claimed job. A
+    re-published note (regenerated) goes back to pending. Safe to use from
+    several threads and processes on one machine.
+    '''
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, lease_sec=LEASE_SEC):
+        self.path = str(path)
+        self.lease_sec = lease_sec
+        self.producer = None
+        self._local = threading.local()
+        self._heartbeat_stop = None
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    # --- Producer side ---
+
+    def open_producer(self, name, lang=None, heartbeat_sec=PRODUCER_HEARTBEAT_SEC):
+        '''
+        Register a producer and keep it alive from a background thread until
+        close_producer(), so long tasks or a run of failures do not time it out.
+        '''
+        self.producer = name
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO producers (name, lang, opened_at, heartbeat_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET lang=excluded.lang, opened_at=excluded.opened_at, "
+            "heartbeat_at=excluded.heartbeat_at, closed_at=NULL",
+            (name, lang, now, now))
+        if heartbeat_sec:
+            stop = threading.Event()
+            threading.Thread(target=self._heartbeat_loop, args=(name, stop, heartbeat_sec),
+                             name="job-queue-heartbeat", daemon=True).start()
+            self._heartbeat_stop = stop
+
+    def _heartbeat_loop(self, name, stop, interval_sec):
+        while not stop.wait(interval_sec):
+            try:
+                self.heartbeat(name)
+            except sqlite3.Error as e:
+                print(f"  [Warning] Job queue heartbeat failed: {e}")
+
+    def heartbeat(self, name=None):
+        name = name or self.producer
+        if name:
+            self._conn().execute("UPDATE producers SET heartbeat_at=? WHERE name=?", (time.time(), name))
+
+    def close_producer(self, name):
+        if self._heartbeat_stop is not None:
+            self._heartbeat_stop.set()
+            self._heartbeat_stop = None
+        self._conn().execute("UPDATE producers SET closed_at=? WHERE name=?", (time.time(), name))
+
+    def publish(self, lang, case_id, model, strategy, path, producer=None):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO jobs (lang, case_id, model, strategy, path, enqueued_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(lang, case_id, model, strategy) DO UPDATE SET path=excluded.path, "
+            "status='pending', attempts=0, enqueued_at=excluded.enqueued_at, claimed_at=NULL, "
+            "finished_at=NULL, error=NULL",
+            (lang, case_id, model, strategy, str(path), now))
+        self.heartbeat(producer)
+
+    def producers_open(self, lang=None):
+        cutoff = time.time() - PRODUCER_TIMEOUT_SEC
+        sql = "SELECT COUNT(*) FROM producers WHERE closed_at IS NULL AND heartbeat_at >= ?"
+        params = [cutoff]
+        if lang is not None:
+            sql += " AND (lang IS NULL OR lang = ?)"
+            params.append(lang)
+        return self._conn().execute(sql, params).fetchone()[0] > 0
+
+    # --- Consumer side ---
+
+    @staticmethod
+    def _filters(languages, strategies):
+        sql, params = "", []
+        if languages:
+            sql += f" AND lang IN ({','.join('?' * len(languages))})"
+            params += list(languages)
+        if strategies:
+            sql += f" AND strategy IN ({','.join('?' * len(strategies))})"
+            params += list(strategies)
+        return sql, params
+
+    def claim(self, limit=1, languages=None, strategies=None):
+        '''
+        Atomically lease up to `limit` pending (or lease-expired) jobs. `attempts`
+        in the returned jobs counts the earlier attempts.
+        '''
+        if limit <= 0:
+            return []
+        now = time.time()
+        where, params = self._filters(languages, strategies)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE (status='pending' OR (status='claimed' AND claimed_at < ?))"
+                + where + " ORDER BY enqueued_at LIMIT ?",
+                [now - self.lease_sec] + params + [limit]).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status='claimed', claimed_at=?, attempts=attempts+1 WHERE id=?",
+                [(now, row["id"]) for row in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [dict(row, status="claimed", claimed_at=now) for row in rows]
+
+    # complete() / fail() only apply to the lease they were given: a note re-published
+    # (back to pending) or re-claimed after an expired lease while it was being
+    # evaluated stays queued. Both return False in that case.
+
+    def complete(self, job):
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status='done', finished_at=? WHERE id=? AND status='claimed' AND claimed_at=?",
+            (time.time(), job["id"], job["claimed_at"]))
+        return cursor.rowcount > 0
+
+    def fail(self, job, error):
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status='failed', finished_at=?, error=? WHERE id=? AND status='claimed' AND claimed_at=?",
+            (time.time(), str(error)[:500], job["id"], job["claimed_at"]))
+        return cursor.rowcount > 0
+
+    def counts(self, languages=None, strategies=None):
+        where, params = self._filters(languages, strategies)
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs WHERE 1=1" + where + " GROUP BY status",
+                                    params).fetchall()
+        return {status: n for status, n in rows}
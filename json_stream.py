@@ -0,0 +1,95 @@
+import re
+import json
+
+_SPECIAL_CHARS = re.compile(r'[{}"\\]')
+
+
+class JsonObjectScanner:
+    '''
+    Incremental brace tracker for model output that arrives in chunks.
+
+    Only braces outside of JSON strings count, and quotes are only tracked
+    inside an object, so prose like 'Patient said "no fever"' before the JSON
+    does not confuse the balance. Completed top-level objects are recorded as
+    (start, end) offsets into the concatenated stream.
+    '''
+
+    def __init__(self):
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.first_start = -1
+        self.objects = []
+        self._start = -1
+        self._skip_until = 0
+
+    def feed(self, chunk):
+        '''
+        Consume the next chunk. Returns True if a top-level object closed in it.
+        '''
+        closed = False
+        base = self.pos
+        for match in _SPECIAL_CHARS.finditer(chunk):
+            i = base + match.start()
+            if i < self._skip_until:
+                continue
+            ch = match.group()
+
+            if self.depth == 0:
+                if ch == "{":
+                    self.depth = 1
+                    self._start = i
+                    if self.first_start == -1:
+                        self.first_start = i
+                continue
+
+            if self.in_string:
+                if ch == "\\":
+                    self._skip_until = i + 2
+                elif ch == '"':
+                    self.in_string = False
+                continue
+
+            if ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.objects.append((self._start, i + 1))
+                    closed = True
+
+        self.pos += len(chunk)
+        return closed
+
+
+def last_json_object(text, scanner=None):
+    '''
+    (start, end, data) of the last complete top-level JSON object in text that
+    parses to a dict, or None. A scanner that was fed exactly this text (e.g.
+    while streaming) is reused instead of scanning again; one fed anything else
+    (its position does not match) is ignored. An unclosed "{" in
+    prose would swallow everything after it, so scanning restarts behind it.
+    '''
+    spans = []
+    offset = 0
+    if scanner is None or scanner.pos != len(text):
+        scanner = JsonObjectScanner()
+        scanner.feed(text)
+    while True:
+        spans.extend((offset + start, offset + end) for start, end in scanner.objects)
+        if scanner.depth == 0:
+            break
+        offset += scanner._start + 1
+        scanner = JsonObjectScanner()
+        scanner.feed(text[offset:])
+
+    for start, end in reversed(spans):
+        try:
+            data = json.loads(text[start:end])
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return start, end, data
+    return None
@@ -0,0 +1,184 @@
+import os
+import sys
+import csv
+import json
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import pipeline
+from chunking import chunk_transcript, split_turns, CHUNK_MAX_CHARS
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+RQ1_DIR = os.path.join(PROJECT_ROOT, "RQ1")
+if RQ1_DIR not in sys.path:
+    sys.path.append(RQ1_DIR)
+
+BENCH_DIR = os.path.join(PROJECT_ROOT, "RQ3_output", "long_bench")
+DEFAULT_MODELS = ["Llama-3.1-8B"]
+DEFAULT_STRATEGIES = ["standard"]
+# The corpus has no transcript over ~15k chars, so by default every transcript is chunked
+DEFAULT_THRESHOLD = 0
+
+
+def load_key_facts(language, case_id):
+    path = pipeline.BASE_DIR / language / "KeyFacts" / f"{case_id}.json"
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def key_fact_coverage(generated_json, key_facts, prefilter):
+    '''
+    Lexical proxy for quality, no judge calls: mean share of each key fact's
+    content words found in the matching section of the note, and the share of
+    facts the prefilter would call PRESENT. (None, None) without a note.
+    '''
+    from soap_parser import normalize_soap_keys
+    from prefilter import _section_text
+    try:
+        soap = normalize_soap_keys(json.loads(generated_json))
+    except (TypeError, ValueError, AttributeError):
+        return None, None
+    scores, present = [], 0
+    for section, facts in key_facts.items():
+        text = _section_text(soap.get(section, ""))
+        for fact in facts:
+            score = prefilter.score(text, fact)
+            scores.append(score)
+            present += score >= prefilter.threshold
+    if not scores:
+        return None, None
+    return statistics.mean(scores), present / len(scores)
+
+
+def print_chunk_stats(language, transcripts, threshold):
+    long_ones = [t for t in transcripts if len(t["content"]) > threshold]
+    print(f"[{language}] {len(transcripts)} transcripts, {len(long_ones)} over {threshold} chars "
+          f"(chunks of <= {CHUNK_MAX_CHARS} chars at speaker turns)")
+    for t in long_ones:
+        chunks = chunk_transcript(t["content"])
+        print(f"  {t['id']:<16}{len(t['content']):>7} chars {len(split_turns(t['content'])):>5} turns -> "
+              f"{len(chunks)} chunks {[len(c) for c in chunks]}")
+
+
+def run_mode(language, transcripts, models, strategies, providers, threshold, workers):
+    '''
+    Every (transcript, model, strategy) in one mode: threshold None = single-shot.
+    '''
+    mode = "single_shot" if threshold is None else "map_reduce"
+    output_dir = os.path.join(BENCH_DIR, language, mode)
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(t, m, s) for t in transcripts for m in models for s in strategies]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda task: pipeline.execute_task(task[0], task[1], providers, task[2],
+                                                                       output_dir, language,
+                                                                       long_threshold=threshold), tasks))
+    for result in results:
+        result["Mode"] = mode
+        result["Language"] = language
+    return results
+
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return statistics.mean(values) if values else None
+
+
+def _round(value, ndigits):
+    return None if value is None else round(value, ndigits)
+
+
+def summarize(results, prefilter):
+    cells = {}
+    for r in results:
+        if r["Status"] == "Success":
+            key_facts = load_key_facts(r["Language"], r["Case_ID"])
+            r["Fact_Score"], r["Fact_Present"] = key_fact_coverage(r["Generated_JSON"], key_facts, prefilter)
+        cells.setdefault((r["Language"], r["Model_Name"], r["Strategy"], r["Mode"]), []).append(r)
+
+    rows = []
+    for (language, model, strategy, mode), group in sorted(cells.items()):
+        ok = [r for r in group if r["Status"] == "Success"]
+        durations = [r["Duration_Sec"] for r in ok]
+        present = _mean([r.get("Fact_Present") for r in ok])
+        rows.append({
+            "Language": language, "Model": model, "Strategy": strategy, "Mode": mode,
+            "Tasks": len(group), "Success": len(ok),
+            "Duration_Mean_Sec": _round(_mean(durations), 2),
+            "Duration_Max_Sec": max(durations) if durations else None,
+            "Map_Mean_Sec": _round(_mean([r["Map_Sec"] for r in ok]), 2),
+            "Fact_Score": _round(_mean([r.get("Fact_Score") for r in ok]), 3),
+            "Fact_Present_Pct": _round(present * 100 if present is not None else None, 1),
+        })
+    return rows
+
+
+def _fmt(value, spec=""):
+    return "-" if value is None else format(value, spec)
+
+
+def print_rows(rows):
+    print(f"{'Lang':<5}{'Model':<22}{'Strategy':<10}{'Mode':<12}{'OK':>6}{'Dur s':>8}{'Max s':>8}{'Map s':>7}"
+          f"{'Fact sc.':>10}{'Present %':>11}")
+    for r in rows:
+        print(f"{r['Language']:<5}{r['Model']:<22}{r['Strategy']:<10}{r['Mode']:<12}"
+              f"{str(r['Success']) + '/' + str(r['Tasks']):>6}{_fmt(r['Duration_Mean_Sec'], '.2f'):>8}"
+              f"{_fmt(r['Duration_Max_Sec'], '.2f'):>8}{_fmt(r['Map_Mean_Sec'], '.2f'):>7}"
+              f"{_fmt(r['Fact_Score'], '.3f'):>10}{_fmt(r['Fact_Present_Pct'], '.1f'):>11}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Latency and key-fact coverage of map-reduce (long-transcript mode) "
+                                                 "vs single-shot generation on the EN/NL corpus.")
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS)
+    parser.add_argument("--strategies", nargs="+", default=DEFAULT_STRATEGIES)
+    parser.add_argument("--languages", nargs="+", default=["EN", "NL"])
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help="Map-reduce transcripts longer than this many chars.")
+    parser.add_argument("--workers", type=int, default=pipeline.MAX_WORKERS)
+    parser.add_argument("--chunks-only", action="store_true", help="Only print how transcripts would be chunked.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = pipeline.load_config()
+    models = [m for m in config["models"] if m["name"] in args.models]
+    corpora = {lang: list(pipeline.iter_transcripts(pipeline.BASE_DIR / lang / "Transcripts"))
+               for lang in args.languages}
+    for language, transcripts in corpora.items():
+        print_chunk_stats(language, transcripts, args.threshold)
+    if args.chunks_only:
+        return 0
+    if not models:
+        print(f"No model named {args.models} in models.json")
+        return 1
+
+    from prefilter import LexicalPrefilter
+    prefilter = LexicalPrefilter()
+    results = []
+    for language, transcripts in corpora.items():
+        long_ones = [t for t in transcripts if len(t["content"]) > args.threshold]
+        for threshold in (None, args.threshold):
+            print(f"[{language}] {'single-shot' if threshold is None else 'map-reduce'}: "
+                  f"{len(long_ones) * len(models) * len(args.strategies)} tasks")
+            results += run_mode(language, long_ones, models, args.strategies, config["providers"], threshold,
+                                args.workers)
+
+    rows = summarize(results, prefilter)
+    print_rows(rows)
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    output_csv = os.path.join(BENCH_DIR, "long_bench.csv")
+    with open(output_csv, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"[Saved] {output_csv} (notes under {BENCH_DIR}/<lang>/<mode>/)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
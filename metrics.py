@@ -0,0 +1,310 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import Counter, deque
+
+STATUS_INTERVAL_SEC = 5.0   # How often the status file is rewritten
+RATE_WINDOW_SEC = 60.0      # Completions/sec and ETA use this recent window
+LATENCY_BUCKETS_SEC = [1, 2, 5, 10, 20, 30, 60, 120, 300]
+LATENCY_WINDOW = 500        # Latest durations per provider kept for percentiles
+TOP_STRAGGLERS = 5
+OK_STATUSES = {"Success"}
+THROTTLE_MARKERS = ("429", "rate limit", "rate_limit", "too many requests", "resource_exhausted")
+
+
+def is_throttled(text):
+    text = str(text or "").lower()
+    return any(marker in text for marker in THROTTLE_MARKERS)
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))]
+
+
+def _histogram(counts):
+    labels = [f"<={bound}s" for bound in LATENCY_BUCKETS_SEC] + [f">{LATENCY_BUCKETS_SEC[-1]}s"]
+    return dict(zip(labels, counts))
+
+
+class _ProviderStats:
+
+    def __init__(self):
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled = 0
+        self.statuses = Counter()
+        self.histogram = [0] * (len(LATENCY_BUCKETS_SEC) + 1)  # Last bucket: over the largest bound
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.done_at = deque()  # Completion times within RATE_WINDOW_SEC
+
+    def record(self, status, seconds, retries, throttled, now):
+        self.completed += 1
+        self.errors += status not in OK_STATUSES
+        self.retries += retries
+        self.throttled += bool(throttled)
+        self.statuses[status] += 1
+        self.done_at.append(now)
+        if seconds is not None:
+            self.latencies.append(seconds)
+            bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_SEC) if seconds <= bound),
+                          len(LATENCY_BUCKETS_SEC))
+            self.histogram[bucket] += 1
+
+    def recent(self, now):
+        while self.done_at and self.done_at[0] < now - RATE_WINDOW_SEC:
+            self.done_at.popleft()
+        return len(self.done_at)
+
+
+class RunMetrics:
+    '''
+    Live counters of a running sweep, per provider: queued / running units,
+    completions, error / retry / throttle counts and a latency histogram.
+
+    Schedulers call submitted(provider) when a unit is queued, started() when a
+    worker picks it up and finished() with its outcomes. snapshot() is rewritten
+    to status_file every STATUS_INTERVAL_SEC and, with a port, served as JSON at
+    http://127.0.0.1:<port>/. `python metrics.py <status_file> --watch` shows it.
+    '''
+
+    def __init__(self, name, total=None, status_file=None, port=None, interval_sec=STATUS_INTERVAL_SEC):
+        self.name = name
+        self.total = total
+        self.status_file = status_file
+        self.port = port
+        self.interval_sec = interval_sec
+        self.queue_depth = None  # Set by schedulers with an external queue (job queue)
+        self.started_at = time.time()
+        self._providers = {}
+        self._running = {}  # token -> (provider, key, start time)
+        self._next_token = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._writer = None
+        self._server = None
+
+    def _provider(self, provider):
+        if provider not in self._providers:
+            self._providers[provider] = _ProviderStats()
+        return self._providers[provider]
+
+    def add_total(self, n):
+        with self._lock:
+            self.total = (self.total or 0) + n
+
+    def set_queue_depth(self, n):
+        self.queue_depth = n
+
+    def submitted(self, provider, n=1):
+        with self._lock:
+            self._provider(provider).queued += n
+
+    def started(self, provider, key=None, queued=True):
+        '''
+        Returns a token for finished(). queued=False for units that never went through submitted().
+        '''
+        with self._lock:
+            stats = self._provider(provider)
+            if queued:
+                stats.queued = max(0, stats.queued - 1)
+            stats.running += 1
+            self._next_token += 1
+            self._running[self._next_token] = (provider, key, time.time())
+            return self._next_token
+
+    def finished(self, token, outcomes):
+        '''
+        outcomes: [(status, seconds, retries, throttled)], one per completed task of
+        the unit (a shared-context group completes several). Empty = the unit raised.
+        '''
+        now = time.time()
+        with self._lock:
+            provider, _, start = self._running.pop(token)
+            stats = self._provider(provider)
+            stats.running -= 1
+            for status, seconds, retries, throttled in outcomes or [("Exception", now - start, 0, False)]:
+                stats.record(status, seconds, retries, throttled, now)
+
+    def run(self, provider, key, fn, *args, outcomes=None, queued=True, **kwargs):
+        '''
+        fn(*args, **kwargs) as one tracked unit; returns its result. outcomes(result,
+        seconds) gives the finished() outcomes; by default one "Success" outcome, or
+        "Fail" when the result is empty.
+        '''
+        token = self.started(provider, key, queued)
+        start = time.time()
+        done = []
+        try:
+            result = fn(*args, **kwargs)
+            seconds = time.time() - start
+            done = outcomes(result, seconds) if outcomes else [("Success" if result else "Fail", seconds, 0, False)]
+            return result
+        finally:
+            self.finished(token, done)
+
+    def snapshot(self):
+        now = time.time()
+        elapsed = now - self.started_at
+        window = min(RATE_WINDOW_SEC, elapsed) or 1.0
+        with self._lock:
+            providers = {}
+            for name, stats in sorted(self._providers.items()):
+                latencies = sorted(stats.latencies)
+                providers[name] = {
+                    "queued": stats.queued,
+                    "in_flight": stats.running,
+                    "completed": stats.completed,
+                    "completions_per_sec": round(stats.recent(now) / window, 3),
+                    "error_rate": round(stats.errors / stats.completed, 4) if stats.completed else 0.0,
+                    "retry_rate": round(stats.retries / stats.completed, 4) if stats.completed else 0.0,
+                    "throttled": stats.throttled,
+                    "statuses": dict(stats.statuses),
+                    "latency_sec": {"p50": _percentile(latencies, 50), "p95": _percentile(latencies, 95),
+                                    "max": latencies[-1] if latencies else None},
+                    "latency_histogram": _histogram(stats.histogram),
+                }
+            stragglers = sorted(self._running.values(), key=lambda item: item[2])[:TOP_STRAGGLERS]
+            completed = sum(p["completed"] for p in providers.values())
+            recent = sum(stats.recent(now) for stats in self._providers.values())
+
+        rate = recent / window
+        remaining = None if self.total is None else max(0, self.total - completed)
+        return {
+            "run": self.name,
+            "pid": os.getpid(),
+            "updated_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)),
+            "elapsed_sec": round(elapsed, 1),
+            "total": self.total,
+            "completed": completed,
+            "in_flight": sum(p["in_flight"] for p in providers.values()),
+            "queued": sum(p["queued"] for p in providers.values()),
+            "queue_depth": self.queue_depth,
+            "completions_per_sec": round(rate, 3),
+            "eta_sec": round(remaining / rate) if remaining is not None and rate > 0 else None,
+            "stragglers": [{"provider": p, "task": key, "running_sec": round(now - start, 1)}
+                           for p, key, start in stragglers],
+            "providers": providers,
+        }
+
+    def write_status(self):
+        if not self.status_file:
+            return
+        tmp_path = f"{self.status_file}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f, indent=2)
+            os.replace(tmp_path, self.status_file)
+        except OSError as e:
+            print(f"  [Warning] Could not write status file {self.status_file}: {e}")
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval_sec):
+            self.write_status()
+
+    def _serve(self):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(metrics.snapshot(), indent=2).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+
+    def start(self):
+        if self.status_file:
+            self.write_status()
+            self._writer = threading.Thread(target=self._write_loop, name="metrics-status", daemon=True)
+            self._writer.start()
+        if self.port:
+            try:
+                self._serve()
+            except OSError as e:
+                print(f"  [Warning] Metrics endpoint not started on port {self.port}: {e}")
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join()
+        self.write_status()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def format_status(status):
+    '''
+    Human-readable view of a snapshot.
+    '''
+    eta = "?" if status["eta_sec"] is None else f"{status['eta_sec'] / 60:.1f} min"
+    total = "?" if status["total"] is None else status["total"]
+    lines = [f"{status['run']} (pid {status['pid']}) at {status['updated_at']}, {status['elapsed_sec'] / 60:.1f} min: "
+             f"{status['completed']}/{total} done, {status['in_flight']} in flight, {status['queued']} queued"
+             + ("" if status["queue_depth"] is None else f", job queue {status['queue_depth']}")
+             + f", {status['completions_per_sec']:.2f}/s, ETA {eta}"]
+    lines.append(f"  {'Provider':<18}{'Queued':>7}{'Run':>5}{'Done':>7}{'/s':>7}{'Err %':>7}{'Retry %':>8}"
+                 f"{'429':>5}{'p50 s':>8}{'p95 s':>8}{'max s':>8}")
+    for name, p in status["providers"].items():
+        lat = p["latency_sec"]
+        fmt = lambda v: "-" if v is None else f"{v:.1f}"
+        lines.append(f"  {name:<18}{p['queued']:>7}{p['in_flight']:>5}{p['completed']:>7}"
+                     f"{p['completions_per_sec']:>7.2f}{p['error_rate'] * 100:>7.1f}{p['retry_rate'] * 100:>8.1f}"
+                     f"{p['throttled']:>5}{fmt(lat['p50']):>8}{fmt(lat['p95']):>8}{fmt(lat['max']):>8}")
+        histogram = "  ".join(f"{bucket} {n}" for bucket, n in p["latency_histogram"].items() if n)
+        if histogram:
+            lines.append(f"    latency: {histogram}")
+    for s in status["stragglers"]:
+        lines.append(f"  running {s['running_sec']:>7.1f}s  {s['provider']}: {s['task']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the live status of a running pipeline.py / test_rq3.py sweep.")
+    parser.add_argument("source", help="Status file (run_status.json) or http://127.0.0.1:<port>/")
+    parser.add_argument("--watch", action="store_true", help=f"Refresh every {STATUS_INTERVAL_SEC:g}s until Ctrl+C.")
+    args = parser.parse_args()
+
+    while True:
+        try:
+            if args.source.startswith("http"):
+                from urllib.request import urlopen
+                with urlopen(args.source, timeout=5) as response:
+                    status = json.load(response)
+            else:
+                with open(args.source, "r", encoding="utf-8") as f:
+                    status = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[Error] {args.source}: {e}")
+            if not args.watch:
+                return 1
+        else:
+            print(format_status(status))
+        if not args.watch:
+            return 0
+        try:
+            time.sleep(STATUS_INTERVAL_SEC)
+        except KeyboardInterrupt:
+            return 0
+        print()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
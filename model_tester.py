@@ -1,18 +1,26 @@
 import os
 import json
 import time
+import math
+import glob
+import argparse
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from openai import OpenAI, NotFoundError, AuthenticationError, BadRequestError
-import google.generativeai as genai
+import prompts
+import clients
 
 script_dir = Path(__file__).parent.absolute()
 env_path = script_dir / '.env'
-print(f"Loading environment from: {env_path}")
-load_dotenv(dotenv_path=env_path, override=True)
 
 MODELS_CONFIG_FILE = script_dir / "models.json"
+BASE_DIR = script_dir / "examples_gp_consultation"
+
+PROBE_WORKERS = 8
+BENCH_REQUESTS = 5       # Warm requests per model (after one cold request)
+BENCH_CONCURRENCY = 2    # Concurrent warm requests per model
+BENCH_MAX_TOKENS = 256
 
 def load_config():
     """
@@ -23,67 +31,222 @@ def load_config():
     with open(MODELS_CONFIG_FILE, "r") as f:
         return json.load(f)
 
-def test_model(model_conf, providers_conf):
+def is_reasoning_model(model_conf):
+    return "o1" in model_conf["model_id"] or "QwQ" in model_conf["model_id"]
+
+
+def send_request(model_conf, provider_config, api_key, messages, max_tokens=None):
+    '''
+    Send one chat request. Returns (duration_sec, completion_tokens, text).
+    completion_tokens is None when the provider does not report usage.
+    '''
+    start_time = time.time()
+
+    # --- Google Gemini Native ---
+    if provider_config["type"] == "gemini_native":
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        system = [m["content"] for m in messages if m["role"] == "system"]
+        user = "\n\n".join(m["content"] for m in messages if m["role"] != "system")
+        model = genai.GenerativeModel(model_conf["model_id"], system_instruction=system[0] if system else None)
+        response = model.generate_content(
+            user,
+            generation_config=genai.types.GenerationConfig(max_output_tokens=max_tokens)
+        )
+        usage = getattr(response, "usage_metadata", None)
+        tokens = getattr(usage, "candidates_token_count", None) if usage else None
+        return time.time() - start_time, tokens, response.text
+
+    # --- OpenAI Compatible ---
+    if provider_config["type"] == "openai_compatible":
+        client = clients.get_provider_client(model_conf["provider"], provider_config, api_key)
+
+        api_params = {
+            "model": model_conf["model_id"],
+            "messages": messages,
+        }
+
+        if is_reasoning_model(model_conf):
+            combined = "\n\n".join(m["content"] for m in messages)
+            api_params["messages"] = [{"role": "user", "content": combined}]
+        elif max_tokens:
+            api_params["max_tokens"] = max_tokens
+
+        response = client.chat.completions.create(**api_params)
+        tokens = response.usage.completion_tokens if response.usage else None
+        return time.time() - start_time, tokens, response.choices[0].message.content
+
+    raise ValueError(f"Unknown provider type {provider_config['type']}")
+
+
+def _resolve_provider(model_conf, providers_conf):
     provider_name = model_conf["provider"]
     if provider_name not in providers_conf:
-        return False, f"Provider {provider_name} not found"
-        
+        return None, None, f"Provider {provider_name} not found"
+
     provider_config = providers_conf[provider_name]
     api_key = os.getenv(provider_config["env_key"])
-    
+
     if not api_key:
-        return False, f"Missing API Key for {provider_name}"
+        return None, None, f"Missing API Key for {provider_name}"
+    return provider_config, api_key, None
+
+
+def _describe_error(e):
+    from openai import NotFoundError, AuthenticationError, BadRequestError
+    if isinstance(e, NotFoundError):
+        return "Model ID error"
+    if isinstance(e, BadRequestError):
+        return f"Bad Request: {str(e)[:50]}..."
+    if isinstance(e, AuthenticationError):
+        return "Auth Error: Invalid API Key"
+    return f"API Error: {str(e)[:100]}"
+
+
+def test_model(model_conf, providers_conf):
+    provider_config, api_key, error = _resolve_provider(model_conf, providers_conf)
+    if error:
+        return False, error
+
+    test_message = [{"role": "user", "content": "Hi"}]
 
-    test_message = "Hi"
-    
     try:
-        start_time = time.time()
-
-        # --- Google Gemini Native ---
-        if provider_config["type"] == "gemini_native":
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel(model_conf["model_id"])
-            response = model.generate_content(
-                test_message, 
-                generation_config=genai.types.GenerationConfig(max_output_tokens=5)
-            )
-            if response.text:
-                duration = round(time.time() - start_time, 2)
-                return True, f"{duration}s"
-            
-        # --- OpenAI Compatible ---
-        elif provider_config["type"] == "openai_compatible":
-            client = OpenAI(
-                base_url=provider_config.get("base_url"),
-                api_key=api_key
-            )
-            
-            is_reasoning_model = "o1" in model_conf["model_id"] or "QwQ" in model_conf["model_id"]
-            
-            api_params = {
-                "model": model_conf["model_id"],
-                "messages": [{"role": "user", "content": test_message}],
-            }
-            
-            if not is_reasoning_model:
-                api_params["max_tokens"] = 5
-            
-            client.chat.completions.create(**api_params)
-            duration = round(time.time() - start_time, 2)
-            return True, f"{duration}s"
-
-    except NotFoundError:
-        return False, "Model ID error"
-    except BadRequestError as e:
-        return False, f"Bad Request: {str(e)[:50]}..."
-    except AuthenticationError:
-        return False, "Auth Error: Invalid API Key"
+        duration, _, text = send_request(model_conf, provider_config, api_key, test_message, max_tokens=5)
+        if text or provider_config["type"] == "openai_compatible":
+            return True, f"{round(duration, 2)}s"
     except Exception as e:
-        return False, f"API Error: {str(e)[:100]}"
+        return False, _describe_error(e)
 
     return False, "Unknown Status"
 
+
+def probe_models(models, providers_conf, max_workers=PROBE_WORKERS):
+    '''
+    Run test_model for all models concurrently. Returns [(model, is_ok, msg)] in input order.
+    '''
+    if not models:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(models))) as executor:
+        results = list(executor.map(lambda m: test_model(m, providers_conf), models))
+    return [(m, ok, msg) for m, (ok, msg) in zip(models, results)]
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Nearest-rank percentile
+    idx = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return round(ordered[idx], 3)
+
+
+def build_bench_messages(prompt_size, language="EN"):
+    '''
+    "tiny" is a one-word ping; "transcript" is a real consultation rendered
+    through prompts.construct_messages exactly as the pipeline sends it.
+    '''
+    if prompt_size == "tiny":
+        return [{"role": "user", "content": "Hi"}]
+    files = sorted(glob.glob(str(BASE_DIR / language / "Transcripts" / "*.txt")))
+    if not files:
+        raise FileNotFoundError(f"No transcripts found for {language}")
+    with open(files[0], "r", encoding="utf-8") as f:
+        transcript = f.read()
+    return prompts.construct_messages("standard", transcript, language=language)
+
+
+def benchmark_model(model_conf, providers_conf, messages, n_requests=BENCH_REQUESTS,
+                    concurrency=BENCH_CONCURRENCY, max_tokens=BENCH_MAX_TOKENS):
+    '''
+    One cold request followed by n_requests warm requests at the given concurrency.
+    '''
+    report = {"model": model_conf["name"], "requests": n_requests, "concurrency": concurrency}
+    provider_config, api_key, error = _resolve_provider(model_conf, providers_conf)
+    if error:
+        report["error"] = error
+        return report
+
+    def one_call(_):
+        try:
+            duration, tokens, _ = send_request(model_conf, provider_config, api_key, messages, max_tokens)
+            return duration, tokens, None
+        except Exception as e:
+            return None, None, _describe_error(e)
+
+    cold, cold_tokens, cold_error = one_call(0)
+    report["cold_latency_sec"] = round(cold, 3) if cold is not None else None
+    if cold_error:
+        report["cold_error"] = cold_error
+
+    wall_start = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        warm = list(executor.map(one_call, range(n_requests)))
+    wall = time.time() - wall_start
+
+    latencies = [d for d, _, err in warm if err is None]
+    errors = [err for _, _, err in warm if err is not None]
+    tokens = [(d, t) for d, t, err in warm if err is None and t]
+
+    report.update({
+        "warm_p50_sec": _percentile(latencies, 50),
+        "warm_p95_sec": _percentile(latencies, 95),
+        "warm_mean_sec": round(sum(latencies) / len(latencies), 3) if latencies else None,
+        "error_rate": round(len(errors) / n_requests, 3) if n_requests else 0.0,
+        # Per-request decode rate and aggregate throughput across concurrent requests
+        "tokens_per_sec": round(sum(t for _, t in tokens) / sum(d for d, _ in tokens), 2) if tokens else None,
+        "throughput_tokens_per_sec": round(sum(t for _, t in tokens) / wall, 2) if tokens and wall > 0 else None,
+    })
+    if errors:
+        report["errors"] = sorted(set(errors))
+    return report
+
+
+def run_benchmark(models, providers, args):
+    if not models:
+        print(f"No models to benchmark (--models {args.models} matched nothing in models.json).")
+        return
+    reports = []
+    for prompt_size in args.prompt:
+        messages = build_bench_messages(prompt_size, language=args.language)
+        print(f"Benchmarking {len(models)} models with '{prompt_size}' prompt "
+              f"({args.requests} warm requests, concurrency {args.concurrency})...")
+        with ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(models))) as executor:
+            futures = [executor.submit(benchmark_model, m, providers, messages,
+                                       args.requests, args.concurrency, args.max_tokens)
+                       for m in models]
+            for future in futures:
+                report = future.result()
+                report["prompt"] = prompt_size
+                reports.append(report)
+
+    output = json.dumps({"time": datetime.now().isoformat(timespec="seconds"), "results": reports,
+                         "connection_pools": clients.pool_stats()}, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"Saved benchmark report to {args.output}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Health-check and benchmark the models in models.json.")
+    parser.add_argument("--parallel", action="store_true", help="Probe all models concurrently.")
+    parser.add_argument("--benchmark", action="store_true", help="Measure cold vs. warm latency and throughput.")
+    parser.add_argument("--requests", type=int, default=BENCH_REQUESTS, help="Warm requests per model.")
+    parser.add_argument("--concurrency", type=int, default=BENCH_CONCURRENCY, help="Concurrent warm requests per model.")
+    parser.add_argument("--max-tokens", type=int, default=BENCH_MAX_TOKENS)
+    parser.add_argument("--prompt", nargs="+", choices=["tiny", "transcript"], default=["tiny", "transcript"])
+    parser.add_argument("--language", default="EN", choices=["EN", "NL"])
+    parser.add_argument("--models", nargs="+", help="Only these model names.")
+    parser.add_argument("--output", help="Write the benchmark JSON report to this file.")
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
+    # Only when run as a script: pipeline.py imports this module for its preflight
+    print(f"Loading environment from: {env_path}")
+    load_dotenv(dotenv_path=env_path, override=True)
     print(f"Time: {datetime.now()}")
     
     try:
@@ -94,19 +257,35 @@ def main():
 
     providers = config["providers"]
     models = config["models"]
+    if args.models:
+        models = [m for m in models if m["name"] in args.models]
+
+    if args.benchmark:
+        run_benchmark(models, providers, args)
+        return
     
     print(f"Found {len(models)} models to test.\n")
     
     working_models = []
     broken_models = []
 
+    if args.parallel:
+        start = time.time()
+        results = probe_models(models, providers)
+        print(f"Probed {len(models)} models concurrently in {time.time() - start:.2f}s")
+    else:
+        results = None
+
     for idx, model in enumerate(models):
         model_name = model["name"]
         model_id = model["model_id"]
         
         print(f"[{idx+1}/{len(models)}] Testing {model_name:<25} ...", end=" ", flush=True)
         
-        is_ok, result_msg = test_model(model, providers)
+        if results is not None:
+            _, is_ok, result_msg = results[idx]
+        else:
+            is_ok, result_msg = test_model(model, providers)
         
         if is_ok:
             print(f"DONE ({result_msg}) [Success]")
@@ -0,0 +1,103 @@
+import os
+import csv
+import sys
+import glob
+import json
+import time
+import argparse
+
+from json_stream import JsonObjectScanner, last_json_object
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+SUMMARY_GLOB = os.path.join(PROJECT_ROOT, "RQ3_output", "*", "**", "RQ3_Summary_*.csv")
+STREAM_CHUNK_CHARS = 64  # Piece size when replaying outputs as a stream
+REPEATS = 3
+
+
+def legacy_slice(text):
+    # The extraction pipeline.parse_model_output used before: first "{" to last "}"
+    start, end = text.find("{"), text.rfind("}")
+    return text[start:end + 1] if start != -1 and end != -1 else None
+
+
+def _is_dict(json_str):
+    try:
+        return isinstance(json.loads(json_str), dict)
+    except (TypeError, ValueError):
+        return False
+
+
+def load_outputs(pattern=SUMMARY_GLOB):
+    csv.field_size_limit(2**31 - 1)
+    rows = []
+    for path in sorted(glob.glob(pattern, recursive=True)):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                if row.get("Raw_Output"):
+                    rows.append(row)
+    return rows
+
+
+def _best_time(fn, texts):
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _streamed(text):
+    scanner = JsonObjectScanner()
+    for i in range(0, len(text), STREAM_CHUNK_CHARS):
+        scanner.feed(text[i:i + STREAM_CHUNK_CHARS])
+    return last_json_object(text, scanner)
+
+
+def compare(rows):
+    '''
+    Outcome of the legacy slice vs the scanner per output, plus timings.
+    '''
+    texts = [row["Raw_Output"] for row in rows]
+    report = {"outputs": len(rows), "legacy_found": 0, "legacy_valid": 0, "scanner_found": 0,
+              "same_object": 0, "recovered": 0, "lost": 0, "legacy_invalid_marked_success": 0}
+    for row, text in zip(rows, texts):
+        old = legacy_slice(text)
+        old_valid = old is not None and _is_dict(old)
+        found = last_json_object(text)
+        report["legacy_found"] += old is not None
+        report["legacy_valid"] += old_valid
+        report["scanner_found"] += found is not None
+        if old_valid and found is not None and json.loads(old) == found[2]:
+            report["same_object"] += 1
+        report["recovered"] += found is not None and not old_valid
+        report["lost"] += found is None and old_valid
+        # Rows the old pipeline saved as Success although the slice was not JSON
+        report["legacy_invalid_marked_success"] += row.get("Status") == "Success" and not old_valid
+
+    n_chars = sum(len(t) for t in texts)
+    for name, fn in (("legacy_slice_and_parse", lambda t: _is_dict(legacy_slice(t))),
+                     ("scanner", last_json_object),
+                     ("scanner_streamed", _streamed)):
+        seconds = _best_time(fn, texts)
+        report[f"{name}_us_per_output"] = round(seconds / max(len(texts), 1) * 1e6, 1)
+        report[f"{name}_mb_per_sec"] = round(n_chars / seconds / 1e6, 1) if seconds else None
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Legacy find/rfind JSON slicing vs the JSON object scanner "
+                                                 "over the Raw_Output of every RQ3_Summary_*.csv.")
+    parser.add_argument("--pattern", default=SUMMARY_GLOB)
+    args = parser.parse_args()
+
+    rows = load_outputs(args.pattern)
+    print(f"[Bench] {len(rows)} outputs from {args.pattern}")
+    print(json.dumps(compare(rows), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,24 @@
 import os
+import csv
 import json
 import time
 import glob
 import re
-import pandas as pd
-from openai import OpenAI
-import google.generativeai as genai
+import hashlib
+import shutil
+import argparse
+import threading
+from collections import Counter, OrderedDict
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 import prompts
+import clients
+from chunking import chunk_transcript
+from json_stream import JsonObjectScanner, last_json_object
+from metrics import RunMetrics, is_throttled
+from sharding import SHARDS_DIR_NAME, parse_shard, in_shard, shard_tag, check_complete
 
 
 script_dir = Path(__file__).parent.absolute()
@@ -23,6 +30,13 @@ BASE_DIR = script_dir / "examples_gp_consultation"
 # Change this to EN or NL depending on the language you wish to check
 LANGUAGE_DIR = "EN"
 TRANSCRIPTS_DIR = BASE_DIR / LANGUAGE_DIR / "Transcripts"
+# Read transcripts from the packed corpus (python corpus_pack.py EN) instead of the folder
+USE_PACKED_CORPUS = False
+PACKED_CORPUS_FILE = BASE_DIR / f"{LANGUAGE_DIR}.gpcorpus"
+# Where transcripts are streamed from: None = TRANSCRIPTS_DIR (or PACKED_CORPUS_FILE
+# with USE_PACKED_CORPUS), or a path to a folder, a .gpcorpus pack or a .jsonl file
+# with one {"id": ..., "content": ...} object per line.
+TRANSCRIPT_SOURCE = None
 MODELS_CONFIG_FILE = script_dir / "models.json"
 OUTPUT_DIR = script_dir / "RQ3_output" / LANGUAGE_DIR
 
@@ -30,7 +44,87 @@ OUTPUT_DIR = script_dir / "RQ3_output" / LANGUAGE_DIR
 ACTIVE_STRATEGIES = ["standard", "few_shot", "cot", "refine"]
 MAX_WORKERS = 10  # Parallel workers count. Reduce if hitting API rate limits.
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+# Reasoning-heavy strategies are streamed so we can measure time-to-first-token
+# and stop reading once the SOAP JSON object has closed.
+STREAMING_STRATEGIES = ["cot", "refine"]
+STREAM_EARLY_STOP = True
+# Early stop only counts objects that start after one of these markers, so the
+# refine draft (STEP 1) is not mistaken for the final note. Empty = no marker needed.
+EARLY_STOP_MARKERS = {
+    "cot": (),
+    "refine": ("STEP 3", "FINAL OUTPUT"),
+}
+
+# Generation budget (max output tokens) per strategy. A model in models.json can
+# override it with "max_output_tokens": N or {"<strategy>": N, "default": N};
+# None means no limit. Thinking models spend their hidden reasoning from it too.
+# Outputs cut off by the budget get Status "Truncated" and are not saved as SOAPs.
+DEFAULT_MAX_OUTPUT_TOKENS = {"standard": 2048, "few_shot": 2048, "cot": 4096, "refine": 6144, "repair": 2048,
+                             "map": 1024}
+
+# Structured output (--structured): JSON-only calls (standard, few_shot and repairs)
+# are decoded against prompts.SOAP_JSON_SCHEMA where the provider supports it
+# ("json_schema": true in models.json, "gemini" for Gemini's schema subset; always
+# on the native Gemini path). Every
+# note is validated locally, and an invalid one gets up to STRUCTURED_MAX_REPAIRS
+# repair calls (its own output plus the violations, without the transcript) instead
+# of a full re-run. Notes still invalid after that get Status "Schema_Fail".
+STRUCTURED_OUTPUT = False
+SCHEMA_STRATEGIES = ["standard", "few_shot", "repair"]
+STRUCTURED_MAX_REPAIRS = 1
+
+# Shared context (--shared-context, experimental): prompts use
+# prompts.construct_shared_context_messages, whose system message (instructions +
+# transcript) is identical across strategies, and all strategies of a (transcript,
+# model) run back to back on one worker, so the calls after the first can hit the
+# provider's automatic prefix cache. The prompt layout differs from the default
+# one: compare its scores with a default-layout run before mixing the two.
+SHARED_CONTEXT = False
+
+# Long-transcript mode (--long-threshold CHARS): a transcript longer than the
+# threshold is split at speaker turns (chunking.py), the facts of every chunk are
+# extracted concurrently ("map" calls), and the strategy's prompt then runs on the
+# merged fact lists instead of the transcript (reduce). The map step runs once per
+# (transcript, model) and is shared by its strategies; if it fails, the task falls
+# back to single-shot generation.
+LONG_TRANSCRIPT_CHARS = None  # e.g. 12_000; None = always single-shot
+CHUNK_MAP_WORKERS = 4         # Concurrent map calls per transcript
+MAP_CACHE_MAX = 256           # Map results kept for the strategies still to come
+
+# Dispatch the slowest (model, strategy, transcript) cells first, interleaving
+# providers, using Duration_Sec from earlier RQ3_Summary_*.csv runs.
+SCHEDULE_LONGEST_FIRST = True
+DEFAULT_TASK_SEC = 30.0  # Used when no history exists for a model
+# Tasks are pulled lazily from the transcript stream: the scheduler orders one
+# window at a time and at most MAX_IN_FLIGHT tasks are submitted but unfinished.
+SCHEDULE_WINDOW = 512
+MAX_IN_FLIGHT = MAX_WORKERS * 2
+SORT_SUMMARY_MAX_ROWS = 100_000  # Larger summaries are left in completion order
+
+# Publish every saved SOAP to the local job queue (job_queue.py) so that
+# `python RQ1/test_rq3.py --follow` can evaluate while generation is running.
+PUBLISH_TO_QUEUE = False
+
+# Hedged requests (hedging.py): a call still running after its (model, strategy)'s
+# rolling p95 latency gets one duplicate; the first to succeed wins. Thresholds are
+# seeded from Duration_Sec of earlier summaries; hedging.HEDGE_MAX_RATE caps the extra calls.
+HEDGE_REQUESTS = False
+
+# Live run status (metrics.py): in-flight calls per provider, completions/sec, error
+# and retry rates, latency histograms and ETA, rewritten every few seconds to
+# <output dir>/run_status.json (`python metrics.py <file> --watch`). --metrics-port
+# also serves it as JSON at http://127.0.0.1:<port>/.
+STATUS_FILE_NAME = "run_status.json"
+METRICS_PORT = None
+
+# Probe every model before a sweep (--preflight) and drop the ones that fail, so a bad
+# model ID or missing key does not burn len(transcripts) x len(ACTIVE_STRATEGIES) task
+# slots. Off by default: a transient failure would silently shrink the sweep. A shard
+# run aborts instead of dropping models, so all shards cover the same model set.
+PREFLIGHT_ENABLED = False
+PREFLIGHT_CACHE_FILE = script_dir / ".preflight_cache.json"
+PREFLIGHT_CACHE_TTL_SEC = 30 * 60
+PREFLIGHT_FAIL_TTL_SEC = 60  # Failed probes are retried sooner: rate limits and outages clear up
 
 
 def load_config():
@@ -40,47 +134,466 @@ def load_config():
         return json.load(f)
 
 
+def _resolve_source(source=None):
+    if source is None:
+        source = TRANSCRIPT_SOURCE
+    if source is None:
+        return Path(PACKED_CORPUS_FILE if USE_PACKED_CORPUS else TRANSCRIPTS_DIR)
+    return Path(source)
+
+
+def iter_transcripts(source=None):
+    '''
+    Yield {"id", "content"} one transcript at a time from a folder of .txt files,
+    a packed corpus (.gpcorpus) or a JSONL stream, without loading the rest.
+    '''
+    source = _resolve_source(source)
+    suffix = source.suffix.lower()
+
+    if suffix == ".gpcorpus":
+        from corpus_pack import PackedCorpus
+        with PackedCorpus(source) as corpus:
+            for case_id in sorted(corpus.case_ids()):
+                yield {"id": case_id, "content": corpus.get_text(case_id, "transcript")}
+
+    elif suffix == ".jsonl":
+        with open(source, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"  [Warning] {source}:{line_no} is not valid JSON: {e}")
+                    continue
+                content = record.get("content", record.get("transcript"))
+                if record.get("id") is None or content is None:
+                    print(f"  [Warning] {source}:{line_no} needs 'id' and 'content'")
+                    continue
+                yield {"id": str(record["id"]), "content": content}
+
+    else:
+        case_ids = sorted(f[:-len(".txt")] for f in os.listdir(source) if f.endswith(".txt"))
+        for case_id in case_ids:
+            with open(os.path.join(source, f"{case_id}.txt"), "r", encoding="utf-8") as f:
+                yield {"id": case_id, "content": f.read()}
+
+
+def count_transcripts(source=None):
+    '''
+    Number of transcripts in the source if it is cheap to know, else None (JSONL).
+    '''
+    source = _resolve_source(source)
+    if source.suffix.lower() == ".gpcorpus":
+        from corpus_pack import PackedCorpus
+        with PackedCorpus(source) as corpus:
+            return len(corpus.case_ids())
+    if source.suffix.lower() == ".jsonl":
+        return None
+    return sum(1 for f in os.listdir(source) if f.endswith(".txt"))
+
+
+def transcript_size(text):
+    # The unit of transcript_lengths() and the duration history: UTF-8 bytes, as files and the pack index store them
+    return len(text.encode("utf-8"))
+
+
+def transcript_lengths(source=None):
+    '''
+    {case_id: size in UTF-8 bytes} for the scheduler's history lookup, from file
+    sizes / the pack index so no transcript has to be read. Empty for JSONL
+    sources, which are only known by streaming them.
+    '''
+    source = _resolve_source(source)
+    if source.suffix.lower() == ".gpcorpus":
+        from corpus_pack import PackedCorpus
+        with PackedCorpus(source) as corpus:
+            return {cid: corpus.text_length(cid) for cid in corpus.case_ids()}
+    if source.suffix.lower() == ".jsonl":
+        return {}
+    return {entry.name[:-len(".txt")]: entry.stat().st_size
+            for entry in os.scandir(source) if entry.name.endswith(".txt")}
+
+
 def load_transcripts():
-    files = glob.glob(os.path.join(TRANSCRIPTS_DIR, "*.txt"))
-    transcripts_data = []
-    print(f"Loading transcripts from {TRANSCRIPTS_DIR}...")
+    print(f"Loading transcripts from {_resolve_source()}...")
+    return sorted(iter_transcripts(), key=lambda x: x['id'])
+
+
+def _preflight_fingerprint(model, providers):
+    # A changed model ID, provider or API key invalidates the cached probe result
+    provider = providers.get(model["provider"], {})
+    api_key = os.getenv(provider.get("env_key", ""), "")
+    return f"{model['model_id']}|{model['provider']}|{hashlib.sha256(api_key.encode()).hexdigest()[:12]}"
+
+
+def preflight_models(models, providers, ttl_sec=PREFLIGHT_CACHE_TTL_SEC, cache_file=PREFLIGHT_CACHE_FILE,
+                     fail_ttl_sec=PREFLIGHT_FAIL_TTL_SEC):
+    '''
+    Probe models concurrently (model_tester.test_model) and split them into
+    (healthy, quarantined). Passing results younger than ttl_sec and failures
+    younger than fail_ttl_sec are reused from cache_file.
+    '''
+    import model_tester
+
+    cache = {}
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            cache = {}
 
-    for file_path in files:
-        file_name = os.path.basename(file_path).replace(".txt", "")
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        transcripts_data.append({"id": file_name, "content": content})
-    return sorted(transcripts_data, key=lambda x: x['id'])
+    now = time.time()
+    results = {}
+    to_probe = []
+    for model in models:
+        entry = cache.get(model["name"])
+        if (entry and entry.get("fingerprint") == _preflight_fingerprint(model, providers)
+                and now - entry.get("checked_at", 0) < (ttl_sec if entry.get("ok") else fail_ttl_sec)):
+            results[model["name"]] = (entry["ok"], entry["message"], now - entry["checked_at"])
+        else:
+            to_probe.append(model)
 
+    for model, is_ok, message in model_tester.probe_models(to_probe, providers):
+        results[model["name"]] = (is_ok, message, None)
+        cache[model["name"]] = {
+            "fingerprint": _preflight_fingerprint(model, providers),
+            "ok": is_ok,
+            "message": message,
+            "checked_at": now,
+        }
+
+    if to_probe:
+        try:
+            with open(cache_file, "w", encoding="utf-8") as f:
+                json.dump(cache, f, indent=2)
+        except OSError as e:
+            print(f"  [Warning] Failed to write preflight cache: {e}")
+
+    healthy, quarantined = [], []
+    for model in models:
+        is_ok, message, age = results[model["name"]]
+        tag = "" if age is None else f" (cached {age:.0f}s ago)"
+        if is_ok:
+            print(f"  [Preflight] {model['name']:<25} OK {message}{tag}")
+            healthy.append(model)
+        else:
+            print(f"  [Preflight] {model['name']:<25} QUARANTINED -> {message}{tag}")
+            quarantined.append({"name": model["name"], "model_id": model["model_id"], "error": message})
+    return healthy, quarantined
+
+
+def load_duration_history(summary_dir, transcript_lengths):
+    '''
+    Read previous RQ3_Summary_*.csv files and return seconds per transcript
+    byte (transcript_size), keyed by (model, strategy) and by model alone.
+    '''
+    csv.field_size_limit(2**31 - 1)
+    secs, chars = {}, {}
+    for path in glob.glob(os.path.join(summary_dir, "RQ3_Summary_*.csv")):
+        try:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    # Instant API failures say nothing about generation time
+                    if row.get("Status") == "API_Fail":
+                        continue
+                    length = transcript_lengths.get(row.get("Case_ID"))
+                    try:
+                        duration = float(row.get("Duration_Sec") or "")
+                    except ValueError:
+                        continue
+                    if not length:
+                        continue
+                    for key in ((row["Model_Name"], row["Strategy"]), row["Model_Name"]):
+                        secs[key] = secs.get(key, 0.0) + duration
+                        chars[key] = chars.get(key, 0) + length
+        except (OSError, KeyError) as e:
+            print(f"  [Warning] Skipping history file {path}: {e}")
+    return {key: secs[key] / chars[key] for key in secs}
+
+
+def load_latency_history(summary_dir):
+    '''
+    {(model, strategy): [Duration_Sec, ...]} of successful calls in earlier
+    RQ3_Summary_*.csv files, oldest file first, to seed the hedging thresholds.
+    '''
+    csv.field_size_limit(2**31 - 1)
+    history = {}
+    for path in sorted(glob.glob(os.path.join(summary_dir, "RQ3_Summary_*.csv"))):
+        try:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    if row.get("Status") != "Success":
+                        continue
+                    try:
+                        duration = float(row.get("Duration_Sec") or "")
+                    except ValueError:
+                        continue
+                    history.setdefault((row["Model_Name"], row["Strategy"]), []).append(duration)
+        except (OSError, KeyError) as e:
+            print(f"  [Warning] Skipping history file {path}: {e}")
+    return history
 
-def parse_model_output(text):
 
+def estimate_task_seconds(t_data, model, strategy, rates):
+    rate = rates.get((model["name"], strategy), rates.get(model["name"]))
+    if rate is None:
+        return DEFAULT_TASK_SEC
+    return rate * transcript_size(t_data["content"])
+
+
+def order_tasks(tasks, estimates):
+    '''
+    Longest-processing-time-first, interleaved across providers so a single
+    provider's rate limit is never hit by a burst of its own slow cells.
+    Each round takes the longest remaining task of every provider.
+    '''
+    by_provider = {}
+    for task, est in zip(tasks, estimates):
+        by_provider.setdefault(task[1]["provider"], []).append((est, task))
+    for queue in by_provider.values():
+        queue.sort(key=lambda x: x[0], reverse=True)
+
+    ordered = []
+    while by_provider:
+        heads = sorted(by_provider, key=lambda p: by_provider[p][0][0], reverse=True)
+        for provider in heads:
+            ordered.append(by_provider[provider].pop(0)[1])
+            if not by_provider[provider]:
+                del by_provider[provider]
+    return ordered
+
+
+def iter_task_windows(transcripts, models, strategies, window=SCHEDULE_WINDOW, shard=None):
+    '''
+    Lazily expand transcripts x models x strategies into lists of at most
+    `window` (t_data, model, strategy) tasks, keeping only this shard's tasks.
+    '''
+    batch = []
+    for t_data in transcripts:
+        for model in models:
+            for strategy in strategies:
+                if not in_shard(shard, t_data["id"], model["name"], strategy):
+                    continue
+                batch.append((t_data, model, strategy))
+                if len(batch) >= window:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+class SummaryWriter:
+    '''
+    Appends result rows to <csv>.partial as they complete, so memory stays flat
+    and a crashed run keeps its rows. finalize() sorts into the final CSV.
+    '''
+
+    def __init__(self, output_csv_path):
+        self.output_csv_path = output_csv_path
+        self.partial_path = output_csv_path + ".partial"
+        self._file = open(self.partial_path, "w", encoding="utf-8", newline="")
+        self._writer = None
+        self.rows = 0
+        self.status_counts = Counter()
+        self.cell_counts = Counter()   # (model, strategy) -> tasks
+        self.budget_hits = Counter()   # (model, strategy) -> Truncated tasks
+        self.repairs = Counter()       # repair calls made / notes they fixed
+
+    def write(self, result):
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._file, fieldnames=list(result))
+            self._writer.writeheader()
+        self._writer.writerow(result)
+        self._file.flush()
+        self.rows += 1
+        self.status_counts[result["Status"]] += 1
+        cell = (result["Model_Name"], result["Strategy"])
+        self.cell_counts[cell] += 1
+        if result["Status"] == "Truncated":
+            self.budget_hits[cell] += 1
+        if result.get("Repairs"):
+            self.repairs["calls"] += result["Repairs"]
+            self.repairs["fixed"] += result["Status"] == "Success"
+
+    def finalize(self):
+        self._file.close()
+        if not self.rows:
+            os.remove(self.partial_path)
+            return None
+        if self.rows <= SORT_SUMMARY_MAX_ROWS:
+            import pandas as pd
+            df = pd.read_csv(self.partial_path, keep_default_na=False)
+            # Sort for readability (by Case -> Model -> Strategy)
+            df = df.sort_values(by=["Case_ID", "Model_Name", "Strategy"])
+            df.to_csv(self.output_csv_path, index=False, encoding='utf-8')
+            os.remove(self.partial_path)
+        else:
+            os.replace(self.partial_path, self.output_csv_path)
+        return self.output_csv_path
+
+
+def parse_model_output(text, scanner=None):
+    '''
+    Split a raw model output into (reasoning, json_str, data): the last complete
+    top-level JSON object that parses to a dict (json_str as the model wrote it,
+    data parsed), and the text before it with markdown headers / fences removed.
+    json_str and data are None if there is no valid object. Pass the scanner that
+    consumed a stream to skip scanning the text again.
+    '''
     if not text:
-        return "", None
-
-    reasoning = ""
-    json_str = None
-
-    start = text.find("{")
-    end = text.rfind("}")
-
-    if start != -1 and end != -1:
-        json_str = text[start:end+1]
-
-        if start > 0:
-            pre_text = text[:start]
-            pre_text = re.sub(r"```json", "", pre_text, flags=re.IGNORECASE)
-            pre_text = re.sub(r"```", "", pre_text)
-            pre_text = re.sub(r"### Reasoning", "",
-                              pre_text, flags=re.IGNORECASE)
-            pre_text = re.sub(r"### JSON Output", "",
-                              pre_text, flags=re.IGNORECASE)
-            reasoning = pre_text.strip()
-    else:
+        return "", None, None
 
-        reasoning = text.strip()
+    found = last_json_object(text, scanner)
+    if found is None:
+        return text.strip(), None, None
 
-    return reasoning, json_str
+    start, end, data = found
+    pre_text = text[:start]
+    pre_text = re.sub(r"```json", "", pre_text, flags=re.IGNORECASE)
+    pre_text = re.sub(r"```", "", pre_text)
+    pre_text = re.sub(r"### Reasoning", "", pre_text, flags=re.IGNORECASE)
+    pre_text = re.sub(r"### JSON Output", "", pre_text, flags=re.IGNORECASE)
+    return pre_text.strip(), text[start:end], data
+
+
+def is_soap_object(json_str):
+    '''
+    True if json_str parses to a dict carrying (most of) the SOAP sections.
+    '''
+    try:
+        data = json.loads(json_str)
+    except (json.JSONDecodeError, TypeError):
+        return False
+    if not isinstance(data, dict):
+        return False
+    keys = " ".join(data.keys()).lower()
+    hits = sum(1 for needles in (("subject",), ("object",), ("assess", "evaluati"), ("plan", "beleid"))
+               if any(n in keys for n in needles))
+    return hits >= 3
+
+
+def consume_stream(pieces, strategy, stats, start_time):
+    '''
+    Accumulate streamed text pieces, recording time-to-first-token and
+    time-to-JSON-start in stats. With STREAM_EARLY_STOP, reading stops as soon
+    as the SOAP object has closed; the caller is responsible for closing the stream.
+    '''
+    scanner = JsonObjectScanner()
+    stats["scanner"] = scanner  # Reused by parse_model_output
+    markers = EARLY_STOP_MARKERS.get(strategy, ())
+    marker_pos = None if markers else 0
+    text = ""
+
+    for piece in pieces:
+        if not piece:
+            continue
+        now = time.time()
+        if stats.get("ttft") is None:
+            stats["ttft"] = now - start_time
+
+        prev_len = len(text)
+        text += piece
+        closed = scanner.feed(piece)
+
+        if stats.get("json_start") is None and scanner.first_start != -1:
+            stats["json_start"] = now - start_time
+
+        if marker_pos is None:
+            window_start = max(0, prev_len - 32)
+            window = text[window_start:].upper()
+            for marker in markers:
+                idx = window.find(marker)
+                if idx != -1:
+                    marker_pos = window_start + idx
+                    break
+
+        if closed and STREAM_EARLY_STOP and marker_pos is not None:
+            obj_start, obj_end = scanner.objects[-1]
+            if obj_start >= marker_pos and is_soap_object(text[obj_start:obj_end]):
+                stats["early_stop"] = True
+                break
+
+    return text
+
+
+def token_budget(model_conf, strategy):
+    '''
+    Max output tokens for a (model, strategy): the model's "max_output_tokens"
+    (an int, or per strategy with a "default") else DEFAULT_MAX_OUTPUT_TOKENS.
+    '''
+    budget = model_conf.get("max_output_tokens")
+    if isinstance(budget, dict):
+        budget = budget.get(strategy, budget.get("default"))
+    return budget if budget is not None else DEFAULT_MAX_OUTPUT_TOKENS.get(strategy)
+
+
+def _cancelled(stats):
+    # Set by hedging.HedgePolicy on the losing attempt of a hedged call
+    cancel = stats.get("cancel")
+    if cancel is not None and cancel.is_set():
+        stats["cancelled"] = True
+        return True
+    return False
+
+
+def _gemini_response_schema():
+    # Gemini's schema subset has no anyOf / additionalProperties: plain string sections
+    return {
+        "type": "object",
+        "properties": {section: {"type": "string"} for section in prompts.SOAP_SECTIONS},
+        "required": list(prompts.SOAP_SECTIONS),
+    }
+
+
+def _note_openai_usage(usage, stats):
+    # Cached prompt tokens are only known when the provider reports prompt_tokens_details
+    if usage is None:
+        return
+    stats["output_tokens"] = usage.completion_tokens
+    stats["input_tokens"] = usage.prompt_tokens
+    details = getattr(usage, "prompt_tokens_details", None)
+    if details is not None and getattr(details, "cached_tokens", None) is not None:
+        stats["cached_input_tokens"] = details.cached_tokens
+
+
+def _openai_pieces(response, stats):
+    for chunk in response:
+        if _cancelled(stats):
+            return
+        # With include_usage the last chunk carries the usage and no choices
+        _note_openai_usage(getattr(chunk, "usage", None), stats)
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        if choice.finish_reason:
+            stats["finish_reason"] = choice.finish_reason
+        yield choice.delta.content
+
+
+def _note_gemini_response(response, stats):
+    # MAX_TOKENS is reported as "length", as on the OpenAI-compatible path
+    candidates = getattr(response, "candidates", None) or []
+    reason = getattr(getattr(candidates[0], "finish_reason", None), "name", None) if candidates else None
+    if reason:
+        stats["finish_reason"] = "length" if reason == "MAX_TOKENS" else reason.lower()
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None and getattr(usage, "candidates_token_count", None):
+        stats["output_tokens"] = usage.candidates_token_count + (getattr(usage, "thoughts_token_count", 0) or 0)
+    if usage is not None and getattr(usage, "prompt_token_count", None):
+        stats["input_tokens"] = usage.prompt_token_count
+        stats["cached_input_tokens"] = getattr(usage, "cached_content_token_count", 0) or 0
+
+
+def _gemini_pieces(response, stats):
+    for chunk in response:
+        if _cancelled(stats):
+            return
+        _note_gemini_response(chunk, stats)
+        if chunk.parts:
+            yield chunk.text
 
 
 def save_individual_soap(output_dir, model_name, case_id, strategy, json_content):
@@ -108,12 +621,25 @@ def save_individual_soap(output_dir, model_name, case_id, strategy, json_content
     try:
         with open(file_path, "w", encoding="utf-8") as f:
             f.write(json_content)
+        return file_path
     except Exception as e:
         print(f"  [Warning] Failed to save individual file: {e}")
 
 
 # [MODIFIED] Added 'language' parameter
-def call_model_api(transcript_text, model_conf, providers_conf, strategy, language):
+def call_model_api(transcript_text, model_conf, providers_conf, strategy, language, stats=None,
+                   messages=None, structured=False):
+    '''
+    Call the model and return its raw text. If a stats dict is passed, streamed
+    calls fill in "ttft", "json_start" and "early_stop", and every call fills in
+    "finish_reason" ("length" = cut off by the token budget), "output_tokens",
+    "input_tokens" and "cached_input_tokens" when the provider reports them.
+    messages replaces the strategy's prompt (repair, map and shared-context calls);
+    structured asks for schema-constrained output where supported.
+    '''
+    if stats is None:
+        stats = {}
+    stream = strategy in STREAMING_STRATEGIES
     try:
         provider_name = model_conf["provider"]
         if provider_name not in providers_conf:
@@ -126,35 +652,43 @@ def call_model_api(transcript_text, model_conf, providers_conf, strategy, langua
             return f"Error: Missing API Key for {provider_name}"
 
         # [MODIFIED] Passing 'language' to prompts.construct_messages
-        messages = prompts.construct_messages(strategy, transcript_text, language=language)
+        if messages is None:
+            messages = prompts.construct_messages(strategy, transcript_text, language=language)
+        max_tokens = token_budget(model_conf, strategy)
+        use_schema = structured and strategy in SCHEMA_STRATEGIES
 
         # Google Gemini
         if provider_config["type"] == "gemini_native":
+            import google.generativeai as genai  # Loaded on first Gemini call only
             genai.configure(api_key=api_key)
 
             # CoT need output reasoning text first
-            if strategy == "cot":
-                generation_config = genai.types.GenerationConfig()
-            else:
-                generation_config = genai.types.GenerationConfig(
-                    response_mime_type="application/json")
+            config = {} if strategy == "cot" else {"response_mime_type": "application/json"}
+            if max_tokens:
+                config["max_output_tokens"] = max_tokens
+            if use_schema:
+                config["response_schema"] = _gemini_response_schema()
+            generation_config = genai.types.GenerationConfig(**config)
 
             model = genai.GenerativeModel(
                 model_conf["model_id"],
                 system_instruction=messages[0]["content"]  # System Prompt
             )
 
+            start_time = time.time()
             response = model.generate_content(
                 messages[1]["content"],  # User Prompt
-                generation_config=generation_config
+                generation_config=generation_config,
+                stream=stream
             )
-            return response.text
+            if stream:
+                return consume_stream(_gemini_pieces(response, stats), strategy, stats, start_time)
+            _note_gemini_response(response, stats)
+            # A budget spent on thinking leaves no parts, and .text would raise
+            return response.text if response.parts else ""
 
         elif provider_config["type"] == "openai_compatible":
-            client = OpenAI(
-                base_url=provider_config.get("base_url"),
-                api_key=api_key
-            )
+            client = clients.get_provider_client(provider_name, provider_config, api_key)
 
             api_params = {
                 "model": model_conf["model_id"],
@@ -165,6 +699,14 @@ def call_model_api(transcript_text, model_conf, providers_conf, strategy, langua
             # not CoT not reasoning use JSON
             if strategy != "cot" and strategy != "refine":
                 api_params["response_format"] = {"type": "json_object"}
+                if use_schema and provider_config.get("json_schema"):
+                    # Gemini's OpenAI-compatible endpoint takes the same schema subset as its native API
+                    gemini = provider_config["json_schema"] == "gemini"
+                    api_params["response_format"] = {
+                        "type": "json_schema",
+                        "json_schema": {"name": "soap_note", "strict": not gemini,
+                                        "schema": _gemini_response_schema() if gemini else prompts.SOAP_JSON_SCHEMA},
+                    }
 
             # (o1/QwQ) not support System Role
             is_reasoning_model = "o1" in model_conf["model_id"] or "QwQ" in model_conf["model_id"]
@@ -175,38 +717,182 @@ def call_model_api(transcript_text, model_conf, providers_conf, strategy, langua
                 if "response_format" in api_params:
                     del api_params["response_format"]
 
+            if max_tokens:
+                # o1-style models take max_completion_tokens (reasoning included)
+                api_params["max_completion_tokens" if is_reasoning_model else "max_tokens"] = max_tokens
+
+            if stream:
+                start_time = time.time()
+                response = client.chat.completions.create(**api_params, stream=True,
+                                                          stream_options={"include_usage": True})
+                try:
+                    return consume_stream(_openai_pieces(response, stats), strategy, stats, start_time)
+                finally:
+                    response.close()
+
             response = client.chat.completions.create(**api_params)
+            stats["finish_reason"] = response.choices[0].finish_reason
+            _note_openai_usage(response.usage, stats)
             return response.choices[0].message.content
 
     except Exception as e:
         return f"API Error: {str(e)[:100]}"
 
 
+def map_chunks(t_data, model, providers, language):
+    '''
+    Map step of the long-transcript mode: the facts of every chunk, extracted
+    concurrently. Returns (list of per-chunk dicts, None) or (None, error).
+    '''
+    chunks = chunk_transcript(t_data["content"])
+
+    def extract(index, chunk):
+        stats = {}
+        messages = prompts.construct_chunk_messages(chunk, index, len(chunks), language)
+        raw = call_model_api(chunk, model, providers, "map", language, stats=stats, messages=messages)
+        if "API Error" in str(raw):
+            return None, f"chunk {index}: {raw}"
+        if stats.get("finish_reason") == "length":
+            return None, f"chunk {index}: hit the map token budget"
+        _, _, data = parse_model_output(raw)
+        if data is None:
+            return None, f"chunk {index}: no JSON object in the output"
+        return data, None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(chunks), CHUNK_MAP_WORKERS))) as pool:
+        results = list(pool.map(extract, range(1, len(chunks) + 1), chunks))
+    errors = [error for _, error in results if error]
+    if errors:
+        return None, "; ".join(errors)
+    return [data for data, _ in results], None
+
+
+_map_results = OrderedDict()
+_map_lock = threading.Lock()
+
+
+def shared_map_chunks(t_data, model, providers, language):
+    '''
+    map_chunks once per (transcript, model, language): strategies running at the
+    same time wait for the first one. Failed maps are not kept, so the next
+    strategy retries.
+    '''
+    key = (t_data["id"], model["name"], language)
+    with _map_lock:
+        future = _map_results.get(key)
+        owner = future is None
+        if owner:
+            future = _map_results[key] = Future()
+            while len(_map_results) > MAP_CACHE_MAX:
+                _map_results.popitem(last=False)
+    if owner:
+        try:
+            result = map_chunks(t_data, model, providers, language)
+        except Exception as e:
+            result = None, f"map failed: {e}"
+        if result[1] is not None:
+            with _map_lock:
+                _map_results.pop(key, None)
+        future.set_result(result)
+    return future.result()
+
+
+def _round_or_none(value, ndigits=2):
+    return round(value, ndigits) if value is not None else None
+
+
 # [MODIFIED] Added 'language' parameter
-def execute_task(t_data, model, providers, strategy, output_dir, language):
+def repair_note(t_data, model, providers, language, previous_output, errors):
+    '''
+    Up to STRUCTURED_MAX_REPAIRS repair calls for a note that failed validation.
+    Returns (json_str or None, remaining errors, repair calls made).
+    '''
+    calls = 0
+    while errors and calls < STRUCTURED_MAX_REPAIRS:
+        calls += 1
+        stats = {}
+        messages = prompts.construct_repair_messages(previous_output, errors, language)
+        repaired = call_model_api(t_data["content"], model, providers, "repair", language,
+                                  stats=stats, messages=messages, structured=True)
+        if "API Error" in str(repaired) or stats.get("finish_reason") == "length":
+            break
+        _, json_str, data = parse_model_output(repaired)
+        errors = prompts.validate_soap(data) if data is not None else ["no JSON object found in the output"]
+        if not errors:
+            return json_str, [], calls
+        previous_output = repaired
+    return None, errors, calls
+
+
+def execute_task(t_data, model, providers, strategy, output_dir, language, job_queue=None, hedge=None,
+                 structured=False, shared_context=False, long_threshold=None):
     '''
     Worker function to process a single strategy for a single model and transcript.
+    With a job_queue, the saved SOAP is published for evaluation right away.
+    With a hedging.HedgePolicy, a straggling call gets a duplicate request.
+    With structured, the note is validated and repaired (see STRUCTURED_OUTPUT).
+    With shared_context, the prompt uses the cache-friendly layout (see SHARED_CONTEXT).
+    With long_threshold, longer transcripts go through map-reduce (see LONG_TRANSCRIPT_CHARS).
     '''
     case_id = t_data["id"]
     model_name = model["name"]
 
     start_time = time.time()
+    source_text = t_data["content"]
+    n_chunks, map_sec = 0, None
+    if long_threshold is not None and len(source_text) > long_threshold:
+        chunk_notes, map_error = shared_map_chunks(t_data, model, providers, language)
+        map_sec = time.time() - start_time
+        if map_error is None:
+            source_text, n_chunks = prompts.format_chunk_notes(chunk_notes), len(chunk_notes)
+        else:
+            print(f"  [Warning] Map step failed for {case_id} ({model_name}), single-shot instead: {map_error}")
+
+    messages = None
+    if shared_context:
+        messages = prompts.construct_shared_context_messages(strategy, source_text, language=language)
+    hedge_role = None
     # [MODIFIED] Passing 'language' to call_model_api
-    raw_output = call_model_api(t_data["content"], model, providers, strategy, language=language)
-    duration = time.time() - start_time
-    reasoning_content, cleaned_json = parse_model_output(raw_output)
+    call = lambda stats: call_model_api(source_text, model, providers, strategy, language=language,
+                                        stats=stats, messages=messages, structured=structured)
+    if hedge is None:
+        stream_stats = {}
+        raw_output = call(stream_stats)
+    else:
+        raw_output, stream_stats, hedge_role = hedge.run(
+            (model_name, strategy), call, failed=lambda text: not text or "API Error" in str(text))
+    reasoning_content, cleaned_json, data = parse_model_output(raw_output, stream_stats.get("scanner"))
 
     status = "Success"
     if "API Error" in str(raw_output):
         status = "API_Fail"
+    elif stream_stats.get("finish_reason") == "length":
+        status = "Truncated"  # Hit the token budget; whatever parsed may be a draft
     elif not raw_output:
         status = "Empty_Output"
     elif not cleaned_json:
         status = "JSON_Parse_Fail"
 
-    if cleaned_json:
-        save_individual_soap(output_dir, model_name,
-                             case_id, strategy, cleaned_json)
+    schema_errors = None
+    repairs = 0
+    if structured and status in ("Success", "JSON_Parse_Fail"):
+        errors = prompts.validate_soap(data) if data is not None else ["no JSON object found in the output"]
+        if errors:
+            schema_errors = "; ".join(errors)
+            cleaned_json, errors, repairs = repair_note(t_data, model, providers, language,
+                                                        cleaned_json or raw_output, errors)
+            status = "Schema_Fail" if errors else "Success"
+    duration = time.time() - start_time
+
+    if cleaned_json and status == "Success":
+        saved_path = save_individual_soap(output_dir, model_name,
+                                          case_id, strategy, cleaned_json)
+        if saved_path and job_queue is not None:
+            try:
+                job_queue.publish(language, case_id, os.path.basename(os.path.dirname(saved_path)),
+                                  strategy, saved_path)
+            except Exception as e:
+                print(f"  [Warning] Failed to publish {case_id}/{strategy} to job queue: {e}")
 
     # Return result dict
     return {
@@ -215,6 +901,20 @@ def execute_task(t_data, model, providers, strategy, output_dir, language):
         "Model_Family": model["family"],
         "Strategy": strategy,
         "Duration_Sec": round(duration, 2),
+        "TTFT_Sec": _round_or_none(stream_stats.get("ttft")),
+        "JSON_Start_Sec": _round_or_none(stream_stats.get("json_start")),
+        "Early_Stop": stream_stats.get("early_stop", False),
+        "Max_Output_Tokens": token_budget(model, strategy),
+        "Input_Tokens": stream_stats.get("input_tokens"),
+        "Cached_Input_Tokens": stream_stats.get("cached_input_tokens"),
+        "Output_Tokens": stream_stats.get("output_tokens"),
+        "Finish_Reason": stream_stats.get("finish_reason"),
+        "Hedge": hedge_role,
+        "Schema_Errors": schema_errors,
+        "Repairs": repairs,
+        "Shared_Context": shared_context,
+        "Chunks": n_chunks,
+        "Map_Sec": _round_or_none(map_sec),
         "Status": status,
         "Reasoning_Trace": reasoning_content,
         "Generated_JSON": cleaned_json,
@@ -222,50 +922,268 @@ def execute_task(t_data, model, providers, strategy, output_dir, language):
     }
 
 
+def execute_context_group(t_data, model, providers, strategies, output_dir, language, job_queue=None,
+                          hedge=None, structured=False, long_threshold=None):
+    '''
+    Every strategy of one (transcript, model) in the shared-context layout, one
+    after the other: the first call puts the shared prefix in the provider's
+    cache, the following ones can read it. Returns the list of result dicts.
+    '''
+    return [execute_task(t_data, model, providers, strategy, output_dir, language, job_queue, hedge,
+                         structured, shared_context=True, long_threshold=long_threshold)
+            for strategy in strategies]
+
+
+def task_outcomes(result, seconds=None):
+    '''
+    metrics.RunMetrics outcomes of an execute_task / execute_context_group result.
+    Repair calls and hedged duplicates count as retries.
+    '''
+    return [(row["Status"], row["Duration_Sec"], (row.get("Repairs") or 0) + bool(row.get("Hedge")),
+             row["Status"] == "API_Fail" and is_throttled(row["Raw_Output"]))
+            for row in (result if isinstance(result, list) else [result])]
+
+
+def group_context_tasks(window):
+    '''
+    (t_data, model, strategy) tasks -> (t_data, model, [strategies]) per (transcript, model).
+    '''
+    groups = {}
+    for t_data, model, strategy in window:
+        groups.setdefault((t_data["id"], model["name"]), (t_data, model, []))[2].append(strategy)
+    return list(groups.values())
+
+
+def print_budget_report(cell_counts, budget_hits, models_by_name):
+    '''
+    How often each (model, strategy) ran into its output token budget.
+    '''
+    total = sum(cell_counts.values())
+    hits = sum(budget_hits.values())
+    print(f"Token budget hits: {hits}/{total} tasks ({hits / total * 100 if total else 0:.1f}%)")
+    for (model_name, strategy), n_hits in sorted(budget_hits.items(), key=lambda kv: -kv[1]):
+        n = cell_counts[(model_name, strategy)]
+        budget = token_budget(models_by_name.get(model_name, {}), strategy)
+        print(f"  {model_name:<25} {strategy:<9} {n_hits}/{n} ({n_hits / n * 100:.0f}%) at max {budget} tokens")
+
+
+def merge_shards(shard_dirs=None):
+    '''
+    Combine shard outputs (OUTPUT_DIR/shards/shard<i>of<N>/) into the layout of a
+    single-process run: one RQ3_Summary_<ts>.csv and OUTPUT_DIR/<Model_Name>/ JSONs.
+    The latest summary of each shard is used.
+    '''
+    import pandas as pd
+
+    if not shard_dirs:
+        shard_dirs = sorted(glob.glob(os.path.join(OUTPUT_DIR, SHARDS_DIR_NAME, "shard*of*")))
+    warning = check_complete([os.path.basename(os.path.normpath(d)) for d in shard_dirs])
+    if warning:
+        print(f"[Warning] Incomplete shard set: {warning}")
+
+    frames = []
+    copied = 0
+    for shard_dir in shard_dirs:
+        summaries = sorted(glob.glob(os.path.join(shard_dir, "RQ3_Summary_*.csv")))
+        if summaries:
+            frames.append(pd.read_csv(summaries[-1], keep_default_na=False))
+        else:
+            print(f"[Warning] No summary CSV in {shard_dir}")
+        for model_name in os.listdir(shard_dir):
+            model_dir = os.path.join(shard_dir, model_name)
+            if not os.path.isdir(model_dir):
+                continue
+            target_dir = os.path.join(OUTPUT_DIR, model_name)
+            os.makedirs(target_dir, exist_ok=True)
+            for file_name in os.listdir(model_dir):
+                shutil.copy2(os.path.join(model_dir, file_name), os.path.join(target_dir, file_name))
+                copied += 1
+
+    output_csv_path = None
+    if frames:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M')
+        output_csv_path = os.path.join(OUTPUT_DIR, f"RQ3_Summary_{timestamp}.csv")
+        df = pd.concat(frames, ignore_index=True)
+        df = df.sort_values(by=["Case_ID", "Model_Name", "Strategy"])
+        df.to_csv(output_csv_path, index=False, encoding='utf-8')
+        print(f"Merged {len(shard_dirs)} shards: {len(df)} rows -> {output_csv_path}")
+    print(f"Copied {copied} individual JSON files into {OUTPUT_DIR}/<Model_Name>/")
+    return output_csv_path
+
+
+def print_task_matrix(models, strategies, source, shard=None):
+    '''
+    The (model, strategy) task counts a run would dispatch, without calling any model.
+    Counts are unknown ("?") for JSONL sources, which are only known by streaming them.
+    '''
+    n_transcripts = count_transcripts(source)
+    case_ids = list(transcript_lengths(source))
+    print(f"Transcript Source: {source} ({n_transcripts if n_transcripts is not None else 'unknown'} transcripts)")
+    if shard is not None:
+        print(f"Shard: {shard[0]}/{shard[1]}")
+
+    def cell(model, strategy):
+        if n_transcripts is None:
+            return None
+        if shard is None:
+            return n_transcripts
+        return sum(1 for cid in case_ids if in_shard(shard, cid, model["name"], strategy))
+
+    width = max([len("Model")] + [len(m["name"]) for m in models])
+    print(f"{'Model':<{width}}  {'Provider':<12}" + "".join(f"{s:>10}" for s in strategies) + f"{'Total':>10}")
+    total = 0
+    for m in models:
+        counts = [cell(m, s) for s in strategies]
+        row_total = None if None in counts else sum(counts)
+        total = None if total is None or row_total is None else total + row_total
+        print(f"{m['name']:<{width}}  {m['provider']:<12}"
+              + "".join(f"{'?' if c is None else c:>10}" for c in counts)
+              + f"{'?' if row_total is None else row_total:>10}")
+    print(f"Total Tasks: {total if total is not None else 'unknown (streamed)'} "
+          f"({len(models)} models x {len(strategies)} strategies)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate SOAP notes for transcripts x models x strategies.")
+    parser.add_argument("--shard", help="Only run shard i of N (0-based), e.g. --shard 0/4. "
+                                        "Outputs go to RQ3_output/<lang>/shards/shard<i>of<N>/.")
+    parser.add_argument("--merge", nargs="*", metavar="SHARD_DIR",
+                        help="Merge shard outputs into the normal layout and exit "
+                             "(default: every folder under RQ3_output/<lang>/shards/).")
+    parser.add_argument("--publish", action="store_true", default=PUBLISH_TO_QUEUE,
+                        help="Publish saved SOAPs to the local job queue for concurrent evaluation.")
+    parser.add_argument("--hedge", action="store_true", default=HEDGE_REQUESTS,
+                        help="Send a duplicate request for calls slower than their rolling p95 latency.")
+    parser.add_argument("--structured", action="store_true", default=STRUCTURED_OUTPUT,
+                        help="Schema-constrained output where supported, local validation and repair calls.")
+    parser.add_argument("--shared-context", action="store_true", default=SHARED_CONTEXT,
+                        help="Experimental: cache-friendly prompt layout, strategies of a (transcript, model) "
+                             "run back to back to reuse the provider's prompt cache.")
+    parser.add_argument("--long-threshold", type=int, default=LONG_TRANSCRIPT_CHARS, metavar="CHARS",
+                        help="Map-reduce transcripts longer than CHARS: per-chunk fact extraction, then one merge call.")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Also serve the live run status as JSON on http://127.0.0.1:<port>/.")
+    parser.add_argument("--preflight", action="store_true", default=PREFLIGHT_ENABLED,
+                        help="Probe every model first and leave out the ones that fail (a shard run aborts instead).")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="List the task matrix (models x strategies x transcripts) and exit without calling any model.")
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
+    if args.merge is not None:
+        merge_shards(args.merge)
+        return
+
+    shard = parse_shard(args.shard)
+    if args.dry_run:
+        config = load_config()
+        print_task_matrix(config["models"], ACTIVE_STRATEGIES, _resolve_source(), shard)
+        print("Token, cost and wall-clock estimate: python planner.py")
+        return
+
+    from tqdm import tqdm
+    output_dir = str(OUTPUT_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+    if shard is not None:
+        output_dir = os.path.join(OUTPUT_DIR, SHARDS_DIR_NAME, shard_tag(shard))
+        os.makedirs(output_dir, exist_ok=True)
+
     print("=== Starting SOAP Note Generation Pipeline (Parallel) ===")
     print(f"Time: {datetime.now()}")
 
     config = load_config()
     providers = config["providers"]
     models = config["models"]
-    transcripts = load_transcripts()
+    source = _resolve_source()
+    transcripts = iter_transcripts(source)
+    n_transcripts = count_transcripts(source)
+
+    if args.preflight:
+        print(f"Preflight: probing {len(models)} models (cache TTL {PREFLIGHT_CACHE_TTL_SEC}s, "
+              f"{PREFLIGHT_FAIL_TTL_SEC}s for failures)...")
+        models, quarantined = preflight_models(models, providers)
+        if quarantined and shard is not None:
+            print(f"[Error] Preflight failed for {', '.join(m['name'] for m in quarantined)}. Not starting shard "
+                  f"{shard_tag(shard)} with fewer models than the other shards; fix or remove them in models.json.")
+            return
+        if quarantined:
+            print(f"Preflight: excluded {len(quarantined)} model(s) from this sweep: "
+                  f"{', '.join(m['name'] for m in quarantined)}")
+        if not models:
+            print("Preflight: no healthy models left, aborting.")
+            return
 
     timestamp = datetime.now().strftime('%Y%m%d_%H%M')
     csv_filename = f"RQ3_Summary_{timestamp}.csv"
-    output_csv_path = os.path.join(OUTPUT_DIR, csv_filename)
+    output_csv_path = os.path.join(output_dir, csv_filename)
 
+    print(f"Transcript Source: {source}")
+    if shard is not None:
+        print(f"Shard: {shard[0]}/{shard[1]}")
     print(f"Summary CSV: {output_csv_path}")
-    print(f"Individual JSONs Folder: {OUTPUT_DIR}/<Model_Name>/")
+    print(f"Individual JSONs Folder: {output_dir}/<Model_Name>/")
     print(f"Active Strategies: {ACTIVE_STRATEGIES}")
     print(f"Target Language: {LANGUAGE_DIR}")
-    print(f"Max Workers: {MAX_WORKERS}")
+    print(f"Max Workers: {MAX_WORKERS} (max in flight: {MAX_IN_FLIGHT})")
+    print(f"Streaming Strategies: {STREAMING_STRATEGIES} (early stop: {STREAM_EARLY_STOP})")
+    if args.structured:
+        print(f"Structured output: schema for {[s for s in ACTIVE_STRATEGIES if s in SCHEMA_STRATEGIES]}, "
+              f"validation + up to {STRUCTURED_MAX_REPAIRS} repair call(s) for all")
+    if args.shared_context:
+        print("Shared context: one prompt prefix per (transcript, model), strategies run back to back")
 
-    all_results = []
+    lengths = transcript_lengths(source)
+    if args.long_threshold is not None:
+        n_long = sum(1 for n in lengths.values() if n > args.long_threshold) if lengths else "?"
+        print(f"Long-transcript mode: map-reduce above {args.long_threshold} chars ({n_long} transcripts)")
+    total_tasks = None
+    if n_transcripts is not None:
+        if shard is None:
+            total_tasks = n_transcripts * len(models) * len(ACTIVE_STRATEGIES)
+        else:
+            total_tasks = sum(1 for cid in lengths for m in models for s in ACTIVE_STRATEGIES
+                              if in_shard(shard, cid, m["name"], s))
+    print(f"Total Tasks: {total_tasks if total_tasks is not None else 'unknown (streamed)'}")
 
-    # Prepare all tasks
-    tasks = []
-    for t_data in transcripts:
-        for model in models:
-            for strategy in ACTIVE_STRATEGIES:
-                tasks.append((t_data, model, providers, strategy))
-
-    total_tasks = len(tasks)
-    print(f"Total Tasks Queued: {total_tasks}")
-
-    # Execute in parallel
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        # [MODIFIED] Passing 'LANGUAGE_DIR' to execute_task
-        future_to_task = {
-            executor.submit(execute_task, t, m, p, s, OUTPUT_DIR, LANGUAGE_DIR): (t["id"], m["name"], s)
-            for t, m, p, s in tasks
-        }
+    rates = {}
+    if SCHEDULE_LONGEST_FIRST:
+        rates = load_duration_history(OUTPUT_DIR, lengths)
+        if not lengths:
+            print("Scheduler: no transcript sizes for a JSONL source, so no duration history; "
+                  "tasks are only interleaved across providers")
+
+    job_queue = None
+    if args.publish:
+        from job_queue import JobQueue
+        job_queue = JobQueue()
+        job_queue.open_producer(f"pipeline-{LANGUAGE_DIR}-{os.getpid()}", LANGUAGE_DIR)
+        print(f"Publishing to job queue: {job_queue.path}")
+
+    hedge = None
+    if args.hedge:
+        from hedging import HedgePolicy
+        hedge = HedgePolicy(MAX_WORKERS)
+        hedge.seed(load_latency_history(OUTPUT_DIR))
+        print(f"Hedging: duplicate after p{hedge.percentile} latency (max {hedge.max_rate * 100:.0f}% of calls)")
 
-        for future in tqdm(as_completed(future_to_task), total=total_tasks, desc="Processing"):
-            case_id, model_name, strategy = future_to_task[future]
+    live = RunMetrics(f"pipeline {LANGUAGE_DIR}", total=total_tasks,
+                      status_file=os.path.join(output_dir, STATUS_FILE_NAME), port=args.metrics_port).start()
+    print(f"Live status: {live.status_file}" + (f", http://127.0.0.1:{live.port}/" if live.port else ""))
+
+    summary = SummaryWriter(output_csv_path)
+    in_flight = {}
+    progress = tqdm(total=total_tasks, desc="Processing")
+
+    def collect(done):
+        for future in done:
+            case_id, model_name, strategy = in_flight.pop(future)
+            n_tasks = len(strategy) if isinstance(strategy, list) else 1
             try:
                 result = future.result()
-                all_results.append(result)
+                for row in result if isinstance(result, list) else [result]:
+                    summary.write(row)
 
                 # Optional: Log completion
                 # tqdm.write(f"Done: {model_name} | {case_id} | {strategy} [{result['Status']}]")
@@ -273,14 +1191,59 @@ def main():
             except Exception as exc:
                 print(
                     f"\n[Exception] Task {model_name}-{case_id}-{strategy} generated an exception: {exc}")
+            progress.update(n_tasks)
+
+    # Execute in parallel, pulling tasks from the transcript stream as slots free up
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            for window in iter_task_windows(transcripts, models, ACTIVE_STRATEGIES, shard=shard):
+                if args.shared_context:
+                    window = group_context_tasks(window)
+                if SCHEDULE_LONGEST_FIRST:
+                    if args.shared_context:
+                        estimates = [sum(estimate_task_seconds(t, m, s, rates) for s in group) for t, m, group in window]
+                    else:
+                        estimates = [estimate_task_seconds(t, m, s, rates) for t, m, s in window]
+                    window = order_tasks(window, estimates)
+                    total_work = sum(estimates)
+                    units = "(transcript, model) groups" if args.shared_context else "tasks"
+                    tqdm.write(f"Scheduled {len(window)} {units}, estimated work {total_work / 60:.1f} min "
+                               f"(makespan lower bound ~{max(total_work / MAX_WORKERS, max(estimates)) / 60:.1f} min)")
+
+                for t, m, s in window:
+                    if len(in_flight) >= MAX_IN_FLIGHT:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    # [MODIFIED] Passing 'LANGUAGE_DIR' to execute_task
+                    worker = execute_context_group if args.shared_context else execute_task
+                    live.submitted(m["provider"])
+                    future = executor.submit(live.run, m["provider"], f"{m['name']} | {t['id']} | {s}", worker,
+                                             t, m, providers, s, output_dir, LANGUAGE_DIR, job_queue, hedge,
+                                             args.structured, long_threshold=args.long_threshold,
+                                             outcomes=task_outcomes)
+                    in_flight[future] = (t["id"], m["name"], s)
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+    finally:
+        if job_queue is not None:
+            job_queue.close_producer(job_queue.producer)
+        live.close()
+    progress.close()
 
     # Save summary
-    if all_results:
-        df = pd.DataFrame(all_results)
-        # Sort for readability (by Case -> Model -> Strategy)
-        df = df.sort_values(by=["Case_ID", "Model_Name", "Strategy"])
-        df.to_csv(output_csv_path, index=False, encoding='utf-8')
+    summary.finalize()
+    print(f"Status counts: {dict(summary.status_counts)}")
+    if args.structured:
+        print(f"Schema repairs: {summary.repairs['calls']} call(s), {summary.repairs['fixed']} note(s) fixed, "
+              f"{summary.status_counts['Schema_Fail']} still invalid")
+    print_budget_report(summary.cell_counts, summary.budget_hits, {m["name"]: m for m in models})
 
+    if hedge is not None:
+        print(f"Hedging: {json.dumps(hedge.summary())}")
+        hedge.close()
+    print(f"Connection pools: {json.dumps(clients.pool_stats())}")
     print(f"\n=== Pipeline Completed! ===")
     print(f"Summary saved to: {output_csv_path}")
 
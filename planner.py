@@ -0,0 +1,222 @@
+import os
+import csv
+import sys
+import glob
+import math
+import heapq
+import argparse
+
+import prompts
+import pipeline
+
+# Offline token counting: characters per token of each model family's tokenizer
+# on this corpus (English clinical text; Dutch splits into more tokens).
+CHARS_PER_TOKEN = {
+    "Llama": 4.0,           # Llama 3 tiktoken-style BPE, 128k vocab
+    "DeepSeek-Llama": 4.0,  # Distilled onto the Llama 3 tokenizer
+    "Gemini": 4.2,          # SentencePiece, 256k vocab
+}
+DEFAULT_CHARS_PER_TOKEN = 3.8
+LANGUAGE_TOKEN_FACTOR = {"EN": 1.0, "NL": 1.25}
+
+# Output tokens per call when a (model, strategy) has no history yet (means over earlier summaries)
+DEFAULT_OUTPUT_TOKENS = {"standard": 200, "few_shot": 150, "cot": 370, "refine": 310}
+FALLBACK_OUTPUT_TOKENS = 300
+
+
+def chars_per_token(family, language=None):
+    return CHARS_PER_TOKEN.get(family, DEFAULT_CHARS_PER_TOKEN) / LANGUAGE_TOKEN_FACTOR.get(language, 1.0)
+
+
+def prompt_chars(strategy, transcript_text, language):
+    '''
+    Characters sent for one call: the rendered prompt of construct_messages().
+    Reasoning models get the same text merged into one user message.
+    '''
+    return sum(len(m["content"]) for m in prompts.construct_messages(strategy, transcript_text, language=language))
+
+
+def load_output_history(summary_dir):
+    '''
+    Mean Raw_Output length (chars) per (model, strategy) from earlier RQ3_Summary_*.csv
+    runs. Hidden reasoning tokens (Gemini thinking) are billed but not in Raw_Output,
+    so estimates for those models are a lower bound.
+    '''
+    csv.field_size_limit(2**31 - 1)
+    chars, counts = {}, {}
+    for path in glob.glob(os.path.join(summary_dir, "RQ3_Summary_*.csv")):
+        try:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    raw = row.get("Raw_Output") or ""
+                    if row.get("Status") == "API_Fail" or not raw:
+                        continue
+                    key = (row["Model_Name"], row["Strategy"])
+                    chars[key] = chars.get(key, 0) + len(raw)
+                    counts[key] = counts.get(key, 0) + 1
+        except (OSError, KeyError) as e:
+            print(f"  [Warning] Skipping history file {path}: {e}")
+    return {key: chars[key] / counts[key] for key in chars}
+
+
+def output_tokens(model, strategy, history, language):
+    mean_chars = history.get((model["name"], strategy))
+    if mean_chars is None:
+        tokens = DEFAULT_OUTPUT_TOKENS.get(strategy, FALLBACK_OUTPUT_TOKENS)
+    else:
+        tokens = math.ceil(mean_chars / chars_per_token(model["family"], language))
+    budget = pipeline.token_budget(model, strategy)
+    return min(tokens, budget) if budget else tokens
+
+
+def call_cost(model, input_tokens, output_tokens_):
+    price_in, price_out = model.get("price_input_per_mtok"), model.get("price_output_per_mtok")
+    if price_in is None or price_out is None:
+        return None
+    return (input_tokens * price_in + output_tokens_ * price_out) / 1_000_000
+
+
+def simulate_wall_clock(tasks, workers, providers):
+    '''
+    Makespan of (case_id, model, strategy, seconds, tokens) tasks dispatched like pipeline.main:
+    longest first, interleaved by provider, on `workers` threads. A provider's
+    "requests_per_minute" / "tokens_per_minute" in models.json spaces out its
+    request starts. Returns (seconds, {provider: seconds waited on its rate limit}).
+    '''
+    ordered = pipeline.order_tasks(tasks, [task[3] for task in tasks])
+    free_at = [0.0] * max(workers, 1)
+    next_start = {}
+    throttled = {}
+    end = 0.0
+    for _, model, _, seconds, tokens in ordered:
+        provider = model["provider"]
+        limits = providers.get(provider, {})
+        worker_free = heapq.heappop(free_at)
+        start = max(worker_free, next_start.get(provider, 0.0))
+        throttled[provider] = throttled.get(provider, 0.0) + start - worker_free
+        gap = 0.0
+        if limits.get("requests_per_minute"):
+            gap = max(gap, 60.0 / limits["requests_per_minute"])
+        if limits.get("tokens_per_minute"):
+            gap = max(gap, 60.0 * tokens / limits["tokens_per_minute"])
+        next_start[provider] = start + gap
+        heapq.heappush(free_at, start + seconds)
+        end = max(end, start + seconds)
+    return end, throttled
+
+
+def plan_sweep(transcripts, models, strategies, providers, language, workers, shard=None, summary_dir=None):
+    '''
+    Estimate every (model, strategy) cell of a sweep without calling any model.
+    Returns (cells, totals): per cell the task count, input/output tokens, cost (USD,
+    None without prices in models.json) and summed task seconds.
+    '''
+    summary_dir = summary_dir or pipeline.OUTPUT_DIR
+    history = load_output_history(summary_dir)
+    transcripts = list(transcripts)
+    rates = pipeline.load_duration_history(summary_dir, {t["id"]: pipeline.transcript_size(t["content"]) for t in transcripts})
+
+    cells = {}
+    tasks = []
+    for t_data in transcripts:
+        for strategy in strategies:
+            n_chars = prompt_chars(strategy, t_data["content"], language)
+            for model in models:
+                if not pipeline.in_shard(shard, t_data["id"], model["name"], strategy):
+                    continue
+                tokens_in = math.ceil(n_chars / chars_per_token(model["family"], language))
+                tokens_out = output_tokens(model, strategy, history, language)
+                seconds = pipeline.estimate_task_seconds(t_data, model, strategy, rates)
+                cost = call_cost(model, tokens_in, tokens_out)
+
+                cell = cells.setdefault((model["name"], strategy), {
+                    "Model": model["name"], "Provider": model["provider"], "Strategy": strategy,
+                    "Tasks": 0, "Input_Tokens": 0, "Output_Tokens": 0, "Cost_USD": 0.0, "Work_Sec": 0.0,
+                    "History": (model["name"], strategy) in history,
+                })
+                cell["Tasks"] += 1
+                cell["Input_Tokens"] += tokens_in
+                cell["Output_Tokens"] += tokens_out
+                cell["Cost_USD"] = None if cost is None or cell["Cost_USD"] is None else cell["Cost_USD"] + cost
+                cell["Work_Sec"] += seconds
+                tasks.append((t_data["id"], model, strategy, seconds, tokens_in + tokens_out))
+
+    wall_sec, throttled = simulate_wall_clock(tasks, workers, providers)
+    costs = [c["Cost_USD"] for c in cells.values()]
+    totals = {
+        "Tasks": len(tasks),
+        "Input_Tokens": sum(c["Input_Tokens"] for c in cells.values()),
+        "Output_Tokens": sum(c["Output_Tokens"] for c in cells.values()),
+        "Cost_USD": None if None in costs else sum(costs),
+        "Work_Sec": sum(c["Work_Sec"] for c in cells.values()),
+        "Wall_Sec": wall_sec,
+        "Rate_Limit_Wait_Sec": throttled,
+    }
+    return list(cells.values()), totals
+
+
+def _money(value):
+    return "?" if value is None else f"{value:.3f}"
+
+
+def print_plan(cells, totals, workers):
+    width = max([len("Model")] + [len(c["Model"]) for c in cells])
+    print(f"{'Model':<{width}}  {'Strategy':<9}{'Tasks':>7}{'In tok':>11}{'Out tok':>10}{'USD':>9}{'Work min':>10}")
+    by_model = {}
+    for c in sorted(cells, key=lambda c: (c["Model"], c["Strategy"])):
+        mark = "" if c["History"] else "  (no history: default output tokens)"
+        print(f"{c['Model']:<{width}}  {c['Strategy']:<9}{c['Tasks']:>7}{c['Input_Tokens']:>11,}"
+              f"{c['Output_Tokens']:>10,}{_money(c['Cost_USD']):>9}{c['Work_Sec'] / 60:>10.1f}{mark}")
+        model_cost = by_model.get(c["Model"], 0.0)
+        by_model[c["Model"]] = None if model_cost is None or c["Cost_USD"] is None else model_cost + c["Cost_USD"]
+
+    print("\nCost per model (USD): " + ", ".join(f"{m} {_money(v)}" for m, v in
+                                                 sorted(by_model.items(), key=lambda kv: -(kv[1] or 0))))
+    print(f"Total: {totals['Tasks']} tasks, {totals['Input_Tokens']:,} input + {totals['Output_Tokens']:,} "
+          f"output tokens, USD {_money(totals['Cost_USD'])}")
+    print(f"Work: {totals['Work_Sec'] / 60:.1f} min; projected wall clock with {workers} workers: "
+          f"{totals['Wall_Sec'] / 60:.1f} min")
+    waits = {p: s for p, s in totals["Rate_Limit_Wait_Sec"].items() if s > 0}
+    if waits:
+        print("Waiting on rate limits: " + ", ".join(f"{p} {s / 60:.1f} worker-min" for p, s in waits.items()))
+
+
+def save_plan(cells, output_file):
+    fields = ["Model", "Provider", "Strategy", "Tasks", "Input_Tokens", "Output_Tokens", "Cost_USD", "Work_Sec", "History"]
+    with open(output_file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for c in sorted(cells, key=lambda c: (c["Model"], c["Strategy"])):
+            writer.writerow({**c, "Cost_USD": "" if c["Cost_USD"] is None else round(c["Cost_USD"], 6),
+                             "Work_Sec": round(c["Work_Sec"], 1)})
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Estimate tokens, cost and wall clock of a pipeline.py sweep "
+                                                 "without calling any model.")
+    parser.add_argument("--models", nargs="+", help="Only these model names (default: all in models.json).")
+    parser.add_argument("--strategies", nargs="+", default=pipeline.ACTIVE_STRATEGIES)
+    parser.add_argument("--workers", type=int, default=pipeline.MAX_WORKERS)
+    parser.add_argument("--shard", help="Plan only shard i of N, e.g. 0/4.")
+    parser.add_argument("--output", help="Also write the per-cell plan to this CSV file.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = pipeline.load_config()
+    models = [m for m in config["models"] if not args.models or m["name"] in args.models]
+    source = pipeline._resolve_source()
+    print(f"Planning {pipeline.LANGUAGE_DIR} sweep from {source} ({len(models)} models, strategies {args.strategies})")
+
+    cells, totals = plan_sweep(pipeline.iter_transcripts(source), models, args.strategies, config["providers"],
+                               pipeline.LANGUAGE_DIR, args.workers, shard=pipeline.parse_shard(args.shard))
+    print_plan(cells, totals, args.workers)
+    if args.output:
+        save_plan(cells, args.output)
+        print(f"[Saved] {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
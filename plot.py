@@ -1,23 +1,11 @@
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 from math import pi
+from stats import average_rows, AGGREGATES_FILE_NAME
 
 
 Base_folder_path = "RQ1/rq3_evaluation_results/"
 Output_Directory = "graphical_outputs_paper"
 
-if not os.path.exists(Output_Directory):
-    os.makedirs(Output_Directory)
-
-plt.rcParams['font.family'] = 'sans-serif'
-plt.rcParams['font.sans-serif'] = ['Arial', 'DejaVu Sans']
-plt.rcParams['axes.unicode_minus'] = False
-plt.rcParams['figure.dpi'] = 300
-plt.rcParams['savefig.dpi'] = 300
-
 Languages = ["EN", "NL"]
 Strategies = ["standard", "few_shot", "cot", "refine"]
 Strategy_Labels = {s: s.replace("_", " ").title() for s in Strategies}
@@ -36,38 +24,57 @@ Model_Names = [
 ]
 
 
-records = []
-for lang in Languages:
-    for model in Model_Names:
-        for strategy in Strategies:
-            for metric in Metric_Types:
-                try:
-                    file_name = f"{model}_{strategy}_{metric}.csv"
-                    path = f"{Base_folder_path}{lang}/{file_name}"
-                    df_raw = pd.read_csv(path)
-                    if 'Case_ID' in df_raw.columns:
-                        df_raw.set_index('Case_ID', inplace=True)
-                    for case_id, row_data in df_raw.iterrows():
-                        records.append({
-                            "Language": lang, "Model": model, "Strategy": strategy,
-                            "Metric": metric, "Case": case_id,
-                            "Overall": row_data.get("Overall_Score", 0),
-                            "Subjective": row_data.get("Subjective", 0),
-                            "Objective": row_data.get("Objective", 0),
-                            "Assessment": row_data.get("Assessment", 0),
-                            "Plan": row_data.get("Plan", 0)
-                        })
-                except FileNotFoundError:
-                    continue
-
-df_all = pd.DataFrame(records)
-
-
-print(f"Data Loaded: {len(df_all)} records.")
-
+def setup_matplotlib():
+    import matplotlib.pyplot as plt
+    plt.rcParams['font.family'] = 'sans-serif'
+    plt.rcParams['font.sans-serif'] = ['Arial', 'DejaVu Sans']
+    plt.rcParams['axes.unicode_minus'] = False
+    plt.rcParams['figure.dpi'] = 300
+    plt.rcParams['savefig.dpi'] = 300
+
+
+def load_records():
+    import pandas as pd
+
+    # Averages come from the aggregates file (stats.py); CSVs written before it carry an 'Average' row instead
+    aggregates = average_rows(f"{Base_folder_path}{AGGREGATES_FILE_NAME}")
+
+    records = []
+    for lang in Languages:
+        for model in Model_Names:
+            for strategy in Strategies:
+                for metric in Metric_Types:
+                    try:
+                        file_name = f"{model}_{strategy}_{metric}.csv"
+                        path = f"{Base_folder_path}{lang}/{file_name}"
+                        df_raw = pd.read_csv(path)
+                        if 'Case_ID' in df_raw.columns:
+                            df_raw.set_index('Case_ID', inplace=True)
+                        averages = aggregates.get((lang, model, strategy, metric))
+                        if averages is not None:
+                            df_raw = df_raw[df_raw.index != 'Average'].copy()
+                            df_raw.loc['Average'] = {col: averages.get(col) for col in df_raw.columns}
+                        for case_id, row_data in df_raw.iterrows():
+                            records.append({
+                                "Language": lang, "Model": model, "Strategy": strategy,
+                                "Metric": metric, "Case": case_id,
+                                "Overall": row_data.get("Overall_Score", 0),
+                                "Subjective": row_data.get("Subjective", 0),
+                                "Objective": row_data.get("Objective", 0),
+                                "Assessment": row_data.get("Assessment", 0),
+                                "Plan": row_data.get("Plan", 0)
+                            })
+                    except FileNotFoundError:
+                        continue
+
+    df_all = pd.DataFrame(records)
+    print(f"Data Loaded: {len(df_all)} records.")
+    return df_all
 
 
 def plot_hero_matplotlib(data, metric_name, title_suffix):
+    import numpy as np
+    import matplotlib.pyplot as plt
     df_view = data[(data['Case'] == 'Average') & 
                    (data['Language'] == 'EN') & 
                    (data['Metric'] == metric_name)].copy()
@@ -103,6 +110,8 @@ def plot_hero_matplotlib(data, metric_name, title_suffix):
 
 
 def plot_heatmap_seaborn(data, case_name, metric_name, strategy="cot", lang="EN"):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     df_heat = data[(data['Case'] == case_name) & 
                    (data['Metric'] == metric_name) &
                    (data['Strategy'] == strategy) & 
@@ -130,6 +139,7 @@ def plot_heatmap_seaborn(data, case_name, metric_name, strategy="cot", lang="EN"
 
 
 def plot_radar_language_comparison(data, metric="fact_checking"):
+    import matplotlib.pyplot as plt
     df_radar = data[(data['Case'] == 'Average') & 
                     (data['Metric'] == metric)].copy()
 
@@ -176,29 +186,31 @@ def plot_radar_language_comparison(data, metric="fact_checking"):
 
 
 
+def main():
+    # pandas / matplotlib / seaborn are imported by the functions that use them, not at module import
+    if not os.path.exists(Output_Directory):
+        os.makedirs(Output_Directory)
+    setup_matplotlib()
+    df_all = load_records()
 
+    plot_hero_matplotlib(df_all, "fact_checking", "Fact Checking")
+    plot_hero_matplotlib(df_all, "fact_alignment", "Fact Alignment")
+    plot_hero_matplotlib(df_all, "conciseness", "Conciseness")
 
+    plot_radar_language_comparison(df_all, metric="fact_checking")
+    plot_radar_language_comparison(df_all, metric="fact_alignment")
+    plot_radar_language_comparison(df_all, metric="conciseness")
 
+    unique_cases = [c for c in df_all['Case'].unique() if c != 'Average']
+    print(f"Generating heatmaps for {len(unique_cases)} cases...")
 
+    for case in unique_cases:
+        plot_heatmap_seaborn(df_all, case, "fact_checking", strategy="cot")
+        plot_heatmap_seaborn(df_all, case, "fact_alignment", strategy="cot")
+        plot_heatmap_seaborn(df_all, case, "conciseness", strategy="cot")
 
-
-plot_hero_matplotlib(df_all, "fact_checking", "Fact Checking")
-plot_hero_matplotlib(df_all, "fact_alignment", "Fact Alignment")
-plot_hero_matplotlib(df_all, "conciseness", "Conciseness")
-
-
-plot_radar_language_comparison(df_all, metric="fact_checking")
-plot_radar_language_comparison(df_all, metric="fact_alignment")
-plot_radar_language_comparison(df_all, metric="conciseness")
-
-
-unique_cases = [c for c in df_all['Case'].unique() if c != 'Average']
-print(f"Generating heatmaps for {len(unique_cases)} cases...")
-
-for case in unique_cases:
-    plot_heatmap_seaborn(df_all, case, "fact_checking", strategy="cot")
-    plot_heatmap_seaborn(df_all, case, "fact_alignment", strategy="cot")
-    plot_heatmap_seaborn(df_all, case, "conciseness", strategy="cot")
+    print(f"Output dic: {Output_Directory}")
 
 
-print(f"Output dic: {Output_Directory}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
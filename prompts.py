@@ -19,6 +19,19 @@ SOAP_JSON_STRUCTURE = """
 }
 """
 
+SOAP_SECTIONS = ["Subjective", "Objective", "Assessment", "Plan"]
+
+# The structure above as a strict JSON Schema, for schema-constrained decoding
+# (OpenAI-compatible "json_schema") and local validation. A section is a string,
+# or a list of strings (models often write the Plan as a list, as the prompt allows).
+SOAP_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {section: {"anyOf": [{"type": "string"}, {"type": "array", "items": {"type": "string"}}]}
+                   for section in SOAP_SECTIONS},
+    "required": list(SOAP_SECTIONS),
+    "additionalProperties": False,
+}
+
 FEW_SHOT_EN = """
 [Example Transcript]
 Doctor: Well, what can I do for you today?
@@ -308,4 +321,108 @@ Output ONLY the JSON object within a code block.
             {"role": "user", "content": user_content}
         ]
 
-    return messages
\ No newline at end of file
+    return messages
+
+
+def construct_shared_context_messages(strategy, transcript_text, language="EN"):
+    """
+    The prompts of construct_messages, laid out for provider prompt caching: the
+    system message (instructions + transcript) is the same for every strategy, and
+    the strategy-specific text follows in the user message.
+    """
+    base_system_instruction = get_base_system_instruction(language)
+    transcript_block = f"Transcript:\n{transcript_text}\n"
+    system_content, user_content = (m["content"] for m in construct_messages(strategy, transcript_text, language))
+    # cot / refine extend the system instruction; that part moves to the user message
+    strategy_instruction = system_content[len(base_system_instruction):].strip()
+    user_content = user_content.replace(transcript_block, "Transcript: see the system message.\n")
+    if strategy_instruction:
+        user_content = f"{strategy_instruction}\n\n{user_content}"
+    return [
+        {"role": "system", "content": f"{base_system_instruction}\n{transcript_block}"},
+        {"role": "user", "content": user_content}
+    ]
+
+
+def construct_chunk_messages(chunk_text, index, n_chunks, language="EN"):
+    """
+    Map step of the long-transcript mode: list the facts of one excerpt per SOAP
+    section, without writing the note itself.
+    """
+    lang_label = "DUTCH (Nederlands)" if language == "NL" else "ENGLISH"
+    system_content = f"""You are an expert Medical Scribe.
+You receive one excerpt of a long GP consultation transcript. The facts of all excerpts are merged into one SOAP note afterwards.
+List EVERY clinically relevant fact stated in this excerpt: symptoms, pertinent negatives, social history, the patient's request or concern, examination findings, diagnoses discussed, medication, advice and safety netting.
+Use TELEGRAPHIC STYLE (short fragments). Do not guess what is said outside this excerpt.
+{ANTI_HALLUCINATION_RULES}
+LANGUAGE CONSTRAINT: Write the facts strictly in {lang_label}.
+
+Output ONLY a JSON object with the keys {", ".join(SOAP_SECTIONS)}, each a list of short fact strings (an empty list when the excerpt has none).
+"""
+    user_content = f"""Excerpt {index} of {n_chunks}:
+{chunk_text}
+
+Instruction: List the facts of this excerpt as JSON. Output ONLY the JSON string.
+"""
+    return [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": user_content}
+    ]
+
+
+def format_chunk_notes(chunk_notes):
+    """
+    Reduce step input: the per-excerpt fact lists, in transcript order, as the
+    text that replaces the transcript in construct_messages().
+    """
+    parts = [f"[Facts extracted from {len(chunk_notes)} consecutive excerpts of one consultation. "
+             "Consecutive excerpts overlap, so a fact may be listed twice; when excerpts disagree, "
+             "the later one is what was finally said.]"]
+    for i, notes in enumerate(chunk_notes, 1):
+        lines = [f"Excerpt {i}:"]
+        for section in SOAP_SECTIONS:
+            facts = notes.get(section) or []
+            if isinstance(facts, str):
+                facts = [facts]
+            lines.append(f"{section}: " + ("; ".join(str(fact) for fact in facts) if facts else "-"))
+        parts.append("\n".join(lines))
+    return "\n\n".join(parts)
+
+
+def validate_soap(data):
+    """
+    Violations of SOAP_JSON_SCHEMA in a parsed note, as a list of messages (empty if valid).
+    """
+    if not isinstance(data, dict):
+        return ["the output is not a JSON object"]
+    errors = [f'missing key "{section}"' for section in SOAP_SECTIONS if section not in data]
+    errors += [f'unexpected key "{key}"' for key in data if key not in SOAP_SECTIONS]
+    for section in SOAP_SECTIONS:
+        value = data.get(section)
+        if section in data and not (isinstance(value, str) or
+                                    (isinstance(value, list) and all(isinstance(v, str) for v in value))):
+            errors.append(f'"{section}" must be a string or a list of strings, not {type(value).__name__}')
+    return errors
+
+
+def construct_repair_messages(previous_output, errors, language="EN"):
+    """
+    Ask the model to fix the format of its own note. The transcript is not sent
+    again: the content is already in the previous output.
+    """
+    problems = "\n".join(f"- {error}" for error in errors)
+    user_content = f"""Your previous output did not match the required JSON schema.
+
+Problems:
+{problems}
+
+Previous output:
+{previous_output}
+
+Instruction: Return ONLY the corrected JSON object with exactly the keys {", ".join(SOAP_SECTIONS)} (spelled in English), each value a string.
+Keep the clinical content of the previous output; do not add or remove findings.
+"""
+    return [
+        {"role": "system", "content": get_base_system_instruction(language)},
+        {"role": "user", "content": user_content}
+    ]
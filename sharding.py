@@ -0,0 +1,60 @@
+import re
+import zlib
+
+SHARDS_DIR_NAME = "shards"
+
+
+def parse_shard(spec):
+    '''
+    Parse "i/N" (0 <= i < N) into (i, N). None or "" means no sharding.
+    '''
+    if not spec:
+        return None
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec)
+    if not match:
+        raise ValueError(f"Invalid shard '{spec}', expected i/N (e.g. 0/4)")
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{spec}', need 0 <= i < N")
+    return index, count
+
+
+def in_shard(shard, *key_parts):
+    '''
+    Deterministic assignment of a task key to a shard. The same key maps to the
+    same shard on every host and Python version (crc32, not hash()).
+    '''
+    if shard is None:
+        return True
+    index, count = shard
+    key = "|".join(str(part) for part in key_parts)
+    return zlib.crc32(key.encode("utf-8")) % count == index
+
+
+def shard_tag(shard):
+    index, count = shard
+    return f"shard{index}of{count}"
+
+
+def parse_shard_tag(tag):
+    match = re.fullmatch(r"shard(\d+)of(\d+)", tag)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def check_complete(tags):
+    '''
+    Given the shard folder names found, return a warning string if the set
+    does not cover every shard of a single N, else None.
+    '''
+    shards = [parse_shard_tag(t) for t in tags]
+    shards = [s for s in shards if s]
+    if not shards:
+        return "no shard folders found"
+    counts = {count for _, count in shards}
+    if len(counts) > 1:
+        return f"mixed shard counts {sorted(counts)}"
+    count = counts.pop()
+    missing = sorted(set(range(count)) - {index for index, _ in shards})
+    if missing:
+        return f"missing shards {missing} of {count}"
+    return None
@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Import-time budgets (ms) per entry point, measured with `python -X importtime`.
+# Heavy dependencies (openai, httpx, google.generativeai, pandas, matplotlib,
+# seaborn, bokeh) must be imported on first use, not at module load.
+IMPORT_BUDGETS_MS = {
+    ("", "pipeline"): 150,
+    ("", "model_tester"): 150,
+    ("", "plot"): 50,
+    ("", "charts"): 50,
+    ("", "stats"): 50,
+    ("RQ1", "test_rq3"): 200,
+    ("RQ1", "run_sanity_check"): 200,
+    ("RQ1", "judge_benchmark"): 150,
+    ("RQ1", "prefilter"): 50,
+}
+# Wall-clock budgets (ms) for whole commands, interpreter start-up included
+COMMAND_BUDGETS_MS = {
+    "pipeline.py --dry-run": 1000,
+}
+REPEATS = 3  # Best of N, to keep disk cache / scheduler noise out of the numbers
+TOP_IMPORTS = 3
+
+
+def parse_importtime(stderr, module):
+    '''
+    (cumulative ms, [(cumulative ms, name)] of its direct imports) of a top-level
+    import in `-X importtime` output. Children are printed before their parent.
+    '''
+    pending = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # Header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 0:
+            if name == module:
+                return int(cumulative) / 1000, sorted(pending, reverse=True)
+            pending = []
+        elif depth == 1:
+            pending.append((int(cumulative) / 1000, name))
+    return None, []
+
+
+def measure_import(directory, module):
+    '''
+    Best-of-REPEATS import time of a module, run in a fresh interpreter from its own folder.
+    '''
+    best = None
+    for _ in range(REPEATS):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                cwd=os.path.join(PROJECT_ROOT, directory),
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        ms, children = parse_importtime(result.stderr, module)
+        if result.returncode != 0 or ms is None:
+            return None, [], (result.stderr.strip().splitlines() or ["failed"])[-1]
+        if best is None or ms < best[0]:
+            best = (ms, children)
+    return best[0], best[1], None
+
+
+def measure_command(command):
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable] + command.split(), cwd=PROJECT_ROOT,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        if result.returncode != 0:
+            return None, (result.stderr.strip().splitlines() or ["failed"])[-1]
+        best = elapsed if best is None else min(best, elapsed)
+    return best, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start-up time of each entry point against its budget.")
+    parser.add_argument("--only", nargs="*", help="Only these modules / commands (e.g. pipeline test_rq3).")
+    args = parser.parse_args()
+
+    over = 0
+    print(f"{'Entry point':<28}{'ms':>9}{'budget':>9}  heaviest imports")
+    for (directory, module), budget in IMPORT_BUDGETS_MS.items():
+        if args.only and module not in args.only:
+            continue
+        label = f"import {os.path.join(directory, module)}"
+        ms, children, error = measure_import(directory, module)
+        if error:
+            print(f"{label:<28}{'error':>9}{budget:>9}  {error}")
+            over += 1
+            continue
+        flag = "" if ms <= budget else "  OVER BUDGET"
+        over += ms > budget
+        heaviest = ", ".join(f"{name} {child_ms:.0f}" for child_ms, name in children[:TOP_IMPORTS])
+        print(f"{label:<28}{ms:>9.1f}{budget:>9}  {heaviest}{flag}")
+
+    for command, budget in COMMAND_BUDGETS_MS.items():
+        if args.only and command.split()[0].replace(".py", "") not in args.only:
+            continue
+        ms, error = measure_command(command)
+        if error:
+            print(f"{command:<28}{'error':>9}{budget:>9}  {error}")
+            over += 1
+            continue
+        flag = "" if ms <= budget else "  OVER BUDGET"
+        over += ms > budget
+        print(f"{command:<28}{ms:>9.1f}{budget:>9}  (wall clock){flag}")
+
+    print(f"{over} entry point(s) over budget." if over else "All entry points within budget.")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import os
+import csv
+import math
+import time
+import zlib
+import random
+import threading
+
+SECTIONS = ["Overall_Score", "Subjective", "Objective", "Assessment", "Plan"]
+AGGREGATES_FILE_NAME = "aggregates.csv"
+FIELDS = ["Language", "Model", "Strategy", "Metric", "Section", "N", "Mean", "Std", "CI_Low", "CI_High", "Updated"]
+
+BOOTSTRAP_SAMPLES = 1000
+CI_LEVEL = 0.95
+# Rewrite the aggregates file at most this often while results stream in
+FLUSH_INTERVAL_SEC = 5.0
+
+
+def _as_number(value):
+    # "N/A" (no facts / claims in a section), empty cells and NaN do not count
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+class RunningStat:
+    '''
+    Mean and variance of one series, updated per case (Welford). A case that is
+    added again replaces its previous value.
+    '''
+
+    def __init__(self):
+        self.values = {}  # case_id -> value, kept for the bootstrap
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def _add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (x - self.mean)
+
+    def _remove(self, x):
+        if self.n == 1:
+            self.n, self.mean, self._m2 = 0, 0.0, 0.0
+            return
+        old_mean = self.mean
+        self.mean = (self.n * old_mean - x) / (self.n - 1)
+        self._m2 -= (x - old_mean) * (x - self.mean)
+        self.n -= 1
+
+    def update(self, case_id, value):
+        if case_id in self.values:
+            self._remove(self.values.pop(case_id))
+        if value is not None:
+            self.values[case_id] = value
+            self._add(value)
+
+    @property
+    def std(self):
+        return math.sqrt(max(self._m2, 0.0) / (self.n - 1)) if self.n > 1 else 0.0
+
+    def bootstrap_ci(self, seed=0, samples=BOOTSTRAP_SAMPLES, level=CI_LEVEL):
+        '''
+        Percentile bootstrap CI of the mean; deterministic for a given seed and set of cases.
+        '''
+        values = [self.values[case_id] for case_id in sorted(self.values)]
+        n = len(values)
+        if n == 0:
+            return None, None
+        if n == 1:
+            return values[0], values[0]
+        rng = random.Random(seed)
+        means = sorted(sum(rng.choices(values, k=n)) / n for _ in range(samples))
+        tail = (1 - level) / 2
+        return means[int(tail * (samples - 1))], means[int(math.ceil((1 - tail) * (samples - 1)))]
+
+
+class StatsBook:
+    '''
+    Running aggregates per (language, model, strategy, metric, section), kept
+    apart from the per-case CSVs in one aggregates file.
+
+    add() folds in one case row as it arrives; the file is rewritten (atomically,
+    throttled) by maybe_flush() / flush(). Series not touched in this run are
+    carried over from the existing file. The first row of a (language, model,
+    strategy, metric) in a run restarts its series, as the run rewrites that CSV.
+    '''
+
+    def __init__(self, path, flush_interval_sec=FLUSH_INTERVAL_SEC):
+        self.path = str(path)
+        self.flush_interval_sec = flush_interval_sec
+        self._series = {}    # (lang, model, strategy, metric, section) -> RunningStat
+        self._reset = set()  # (lang, model, strategy, metric) restarted in this run
+        self._dirty = set()
+        self._rows = {}      # output rows by series key, incl. carried-over ones
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+        for row in read_aggregates(self.path):
+            key = (row["Language"], row["Model"], row["Strategy"], row["Metric"], row["Section"])
+            self._rows[key] = row
+
+    def add(self, lang, model, strategy, metric, case_id, row):
+        group = (lang, model, strategy, metric)
+        with self._lock:
+            if group not in self._reset:
+                self._reset.add(group)
+                for key in [k for k in self._rows if k[:4] == group]:
+                    del self._rows[key]
+                for key in [k for k in self._series if k[:4] == group]:
+                    del self._series[key]
+            for section in SECTIONS:
+                key = group + (section,)
+                self._series.setdefault(key, RunningStat()).update(case_id, _as_number(row.get(section)))
+                self._dirty.add(key)
+
+    def add_rows(self, lang, model, strategy, metric, rows):
+        for row in rows:
+            self.add(lang, model, strategy, metric, row["Case_ID"], row)
+
+    def mean(self, lang, model, strategy, metric, section="Overall_Score"):
+        stat = self._series.get((lang, model, strategy, metric, section))
+        return stat.mean if stat and stat.n else None
+
+    def _summarize(self, key):
+        stat = self._series[key]
+        low, high = stat.bootstrap_ci(seed=zlib.crc32("|".join(key).encode("utf-8")))
+        fmt = lambda v: "" if v is None else round(v, 4)
+        return {
+            "Language": key[0], "Model": key[1], "Strategy": key[2], "Metric": key[3], "Section": key[4],
+            "N": stat.n, "Mean": fmt(stat.mean if stat.n else None), "Std": fmt(stat.std if stat.n else None),
+            "CI_Low": fmt(low), "CI_High": fmt(high), "Updated": round(time.time(), 1),
+        }
+
+    def maybe_flush(self):
+        if time.time() - self._last_flush >= self.flush_interval_sec:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            for key in self._dirty:
+                self._rows[key] = self._summarize(key)
+            self._dirty.clear()
+            rows = [self._rows[key] for key in sorted(self._rows)]
+            self._last_flush = time.time()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, self.path)
+
+
+def read_aggregates(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def average_rows(path):
+    '''
+    {(lang, model, strategy, metric): {section: mean}} from an aggregates file,
+    the shape of the legacy 'Average' row of the per-case CSVs.
+    '''
+    averages = {}
+    for row in read_aggregates(path):
+        mean = _as_number(row.get("Mean"))
+        if mean is None:
+            continue
+        averages.setdefault((row["Language"], row["Model"], row["Strategy"], row["Metric"]), {})[row["Section"]] = mean
+    return averages